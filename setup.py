@@ -19,8 +19,8 @@ setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/yourusername/adaptive-neuromodulation-dbs",
-    packages=find_packages(where="src"),
-    package_dir={"": "src"},
+    # Modules import each other as src.*, so install src itself as the package
+    packages=find_packages(include=["src", "src.*"]),
     classifiers=[
         "Development Status :: 4 - Beta",
         "Intended Audience :: Science/Research",
@@ -0,0 +1,368 @@
+"""
+Controller Auto-Tuning
+Parallel gain optimization over an ensemble of virtual patients
+"""
+
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .lqr_controller import BatchLQRController, beta_state_space, design_lqr
+from .pid_controller import BatchPIDController
+from src.models.brain_dynamics import PatientPopulation
+from src.simulation.checkpoint import fingerprint
+from src.simulation.closed_loop import METRICS, simulate_batch
+
+
+PID_BOUNDS = {
+    'kp': (0.0, 20.0),
+    'ki': (0.0, 10.0),
+    'kd': (0.0, 0.5),
+}
+
+LQR_BOUNDS = {
+    'q_error': (1.0, 1e4),
+    'q_derror': (0.01, 100.0),
+    'r': (1e-3, 1.0),
+}
+
+DEFAULT_WEIGHTS = {
+    'beta': 1.0,
+    'energy': 0.2,
+    'settling': 0.1,
+}
+
+
+def _evaluate_chunk(kind: str, params: np.ndarray,
+                    population_config: Dict[str, Any],
+                    duration_sec: float, target_ratio: float,
+                    max_stim: float, A: np.ndarray,
+                    B: np.ndarray) -> Dict[str, np.ndarray]:
+    """Simulate one chunk of candidates and return patient-averaged metrics"""
+    population = PatientPopulation(**population_config)
+
+    if kind == 'pid':
+        controller = BatchPIDController(params[:, 0], params[:, 1], params[:, 2],
+                                        dt=population.dt, max_stim=max_stim)
+    elif kind == 'lqr':
+        gains = [design_lqr(A, B, np.diag(p[:2]), np.array([[p[2]]]))[0][0]
+                 for p in params]
+        controller = BatchLQRController(np.array(gains), dt=population.dt,
+                                        max_stim=max_stim)
+    else:
+        raise ValueError(f"Unknown controller kind: {kind}")
+
+    metrics = simulate_batch(controller, population, duration_sec=duration_sec,
+                             target_ratio=target_ratio, replicas=len(params))
+    return {name: metrics[name].mean(axis=1) for name in METRICS}
+
+
+class AutoTuner:
+    """
+    Auto-tuner for PID gains and LQR Q/R weights
+
+    Candidates are scored by a weighted cost averaged over a population of
+    virtual patients:
+
+        J = w_beta * residual_beta + w_energy * energy / (T * u_max^2)
+            + w_settling * settling_time / T
+
+    Each batch of candidates is simulated as one vectorized
+    candidates-by-patients closed loop, split into chunks that run on a
+    process pool. Successive halving provides early stopping: all candidates
+    are first scored on short runs, and only the best 1/eta advance to
+    longer ones. Evaluated points are cached (optionally on disk) so repeated
+    or resumed tuning jobs skip them.
+
+    Parameters
+    ----------
+    population : PatientPopulation, optional
+        Virtual patients (default: ``PatientPopulation.sample(n_patients)``)
+    n_patients : int
+        Population size when no population is given
+    duration_sec : float
+        Full evaluation length in seconds
+    target_ratio : float
+        Target beta as a fraction of each patient's open-loop level
+    weights : dict, optional
+        Cost weights for 'beta', 'energy' and 'settling'
+    max_stim : float
+        Stimulation limit in mA
+    n_workers : int, optional
+        Worker processes (default: CPU count, 1 runs in-process)
+    chunk_size : int
+        Candidates per worker task
+    cache_path : str or Path, optional
+        JSON file for persisting evaluated points
+    A, B : np.ndarray, optional
+        State-space model for LQR design (default: ``beta_state_space()``)
+    seed : int
+        Seed for the default population and candidate sampling
+    """
+
+    def __init__(self,
+                 population: Optional[PatientPopulation] = None,
+                 n_patients: int = 16,
+                 duration_sec: float = 10.0,
+                 target_ratio: float = 0.3,
+                 weights: Optional[Dict[str, float]] = None,
+                 max_stim: float = 5.0,
+                 n_workers: Optional[int] = None,
+                 chunk_size: int = 16,
+                 cache_path: Optional[Union[str, Path]] = None,
+                 A: Optional[np.ndarray] = None,
+                 B: Optional[np.ndarray] = None,
+                 seed: int = 0):
+        if population is None:
+            population = PatientPopulation.sample(n_patients, seed=seed)
+        if A is None or B is None:
+            A, B = beta_state_space()
+
+        self.population = population
+        self.duration_sec = duration_sec
+        self.target_ratio = target_ratio
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.max_stim = max_stim
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.A = A
+        self.B = B
+        self.rng = np.random.default_rng(seed)
+
+        self.cache_path = Path(cache_path) if cache_path is not None else None
+        self.cache: Dict[str, Dict[str, float]] = {}
+        if self.cache_path is not None and self.cache_path.exists():
+            self.cache = json.loads(self.cache_path.read_text())
+
+        self.n_evaluations = 0
+        self.cache_hits = 0
+        self._executor = None
+
+    def _setup_key(self, kind: str) -> str:
+        # Hash of everything besides the gains that changes the metrics, so a
+        # shared cache file never serves results of another cohort, target,
+        # stimulation limit or (for LQR) plant model
+        setup = {
+            'population': self.population.get_config(),
+            'target_ratio': self.target_ratio,
+            'max_stim': self.max_stim,
+        }
+        if kind == 'lqr':
+            setup.update(A=self.A, B=self.B)
+        return fingerprint(setup)
+
+    def _cache_key(self, kind: str, setup_key: str, params: Sequence[float],
+                   duration_sec: float) -> str:
+        values = ','.join(f'{v:.10g}' for v in params)
+        return f'{kind}|{setup_key}|{duration_sec:.6g}|{values}'
+
+    def cost(self, metrics: Dict[str, np.ndarray],
+             duration_sec: float) -> np.ndarray:
+        """
+        Scalar cost of patient-averaged metrics (lower is better)
+
+        Parameters
+        ----------
+        metrics : dict
+            Arrays of beta_reduction, energy and settling_time
+        duration_sec : float
+            Length of the evaluated runs
+
+        Returns
+        -------
+        np.ndarray
+            Cost per candidate
+        """
+        residual = 1.0 - np.asarray(metrics['beta_reduction']) / 100.0
+        energy = np.asarray(metrics['energy']) / (duration_sec * self.max_stim**2)
+        settling = np.asarray(metrics['settling_time']) / duration_sec
+        return (self.weights['beta'] * residual
+                + self.weights['energy'] * energy
+                + self.weights['settling'] * settling)
+
+    def evaluate(self, kind: str, candidates: np.ndarray,
+                 duration_sec: Optional[float] = None) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        Score candidates, reusing cached results
+
+        Parameters
+        ----------
+        kind : str
+            'pid' (rows are kp, ki, kd) or 'lqr' (rows are q_error,
+            q_derror, r)
+        candidates : np.ndarray
+            Array of shape (n_candidates, 3)
+        duration_sec : float, optional
+            Run length (default: full duration)
+
+        Returns
+        -------
+        tuple
+            (costs, metrics) with one entry per candidate
+        """
+        duration_sec = duration_sec or self.duration_sec
+        candidates = np.atleast_2d(np.asarray(candidates, dtype=float))
+        setup_key = self._setup_key(kind)
+        keys = [self._cache_key(kind, setup_key, c, duration_sec) for c in candidates]
+
+        missing = [i for i, key in enumerate(keys) if key not in self.cache]
+        self.cache_hits += len(candidates) - len(missing)
+
+        if missing:
+            todo = candidates[missing]
+            chunks = [todo[i:i + self.chunk_size]
+                      for i in range(0, len(todo), self.chunk_size)]
+            args = (self.population.get_config(), duration_sec,
+                    self.target_ratio, self.max_stim, self.A, self.B)
+
+            if self.n_workers == 1 or len(chunks) == 1:
+                results = [_evaluate_chunk(kind, chunk, *args) for chunk in chunks]
+            else:
+                executor = self._get_executor()
+                futures = [executor.submit(_evaluate_chunk, kind, chunk, *args)
+                           for chunk in chunks]
+                results = [f.result() for f in futures]
+
+            offset = 0
+            for result in results:
+                for j in range(len(result['energy'])):
+                    key = keys[missing[offset + j]]
+                    self.cache[key] = {name: float(result[name][j]) for name in METRICS}
+                offset += len(result['energy'])
+            self.n_evaluations += len(missing)
+            self.save_cache()
+
+        metrics = {name: np.array([self.cache[k][name] for k in keys])
+                   for name in METRICS}
+        return self.cost(metrics, duration_sec), metrics
+
+    def sample_candidates(self, bounds: Dict[str, Tuple[float, float]],
+                          n_candidates: int,
+                          log_scale: Sequence[str] = ()) -> np.ndarray:
+        """
+        Latin hypercube sample inside ``bounds``
+
+        Parameters listed in ``log_scale`` are sampled uniformly in log space.
+        """
+        samples = np.empty((n_candidates, len(bounds)))
+        for j, (name, (lo, hi)) in enumerate(bounds.items()):
+            u = (self.rng.permutation(n_candidates)
+                 + self.rng.random(n_candidates)) / n_candidates
+            if name in log_scale:
+                samples[:, j] = np.exp(np.log(lo) + u * (np.log(hi) - np.log(lo)))
+            else:
+                samples[:, j] = lo + u * (hi - lo)
+        return samples
+
+    def tune(self, kind: str,
+             bounds: Dict[str, Tuple[float, float]],
+             n_candidates: int = 81,
+             eta: int = 3,
+             min_duration: Optional[float] = None,
+             log_scale: Sequence[str] = (),
+             initial: Optional[Sequence[Sequence[float]]] = None) -> Dict[str, Any]:
+        """
+        Successive-halving search
+
+        Parameters
+        ----------
+        kind : str
+            'pid' or 'lqr'
+        bounds : dict
+            Search range per parameter, in controller order
+        n_candidates : int
+            Candidates in the first rung
+        eta : int
+            Halving rate; the best 1/eta of each rung run eta times longer
+        min_duration : float, optional
+            Run length of the first rung (default: duration / eta**2)
+        log_scale : sequence of str
+            Parameters searched in log space
+        initial : sequence, optional
+            Extra candidates to include (e.g. current hand-tuned gains)
+
+        Returns
+        -------
+        dict
+            params, cost, metrics, rungs, n_evaluations and cache_hits
+        """
+        if eta < 2:
+            raise ValueError("eta must be at least 2")
+
+        min_duration = min_duration or self.duration_sec / eta**2
+        n_rungs = max(int(math.floor(math.log(self.duration_sec / min_duration, eta) + 1e-9)) + 1, 1)
+        durations = [self.duration_sec / eta**(n_rungs - 1 - r) for r in range(n_rungs)]
+
+        candidates = self.sample_candidates(bounds, n_candidates, log_scale)
+        if initial is not None:
+            candidates = np.vstack([np.atleast_2d(initial), candidates])
+
+        rungs = []
+        for r, duration in enumerate(durations):
+            costs, metrics = self.evaluate(kind, candidates, duration)
+            order = np.argsort(costs)
+            rungs.append({'duration_sec': duration, 'n_candidates': len(candidates),
+                          'best_cost': float(costs[order[0]])})
+            if r < n_rungs - 1:
+                keep = max(1, int(math.ceil(len(candidates) / eta)))
+                candidates = candidates[order[:keep]]
+
+        best = int(np.argmin(costs))
+        result = {
+            'params': dict(zip(bounds, candidates[best].tolist())),
+            'cost': float(costs[best]),
+            'metrics': {name: float(metrics[name][best]) for name in METRICS},
+            'rungs': rungs,
+            'n_evaluations': self.n_evaluations,
+            'cache_hits': self.cache_hits,
+        }
+        if kind == 'lqr':
+            q_error, q_derror, r = candidates[best]
+            K, _ = design_lqr(self.A, self.B, np.diag([q_error, q_derror]),
+                              np.array([[r]]))
+            result['K'] = K
+        return result
+
+    def tune_pid(self, bounds: Optional[Dict[str, Tuple[float, float]]] = None,
+                 **kwargs) -> Dict[str, Any]:
+        """Tune kp, ki, kd; ``result['params']`` can be passed to PIDController"""
+        return self.tune('pid', bounds or PID_BOUNDS, **kwargs)
+
+    def tune_lqr(self, bounds: Optional[Dict[str, Tuple[float, float]]] = None,
+                 **kwargs) -> Dict[str, Any]:
+        """Tune Q = diag(q_error, q_derror) and R = r; ``result['K']`` is the gain"""
+        bounds = bounds or LQR_BOUNDS
+        kwargs.setdefault('log_scale', tuple(bounds))
+        return self.tune('lqr', bounds, **kwargs)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.n_workers)
+        return self._executor
+
+    def save_cache(self):
+        """Write evaluated points to ``cache_path`` (if set)"""
+        if self.cache_path is not None:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            self.cache_path.write_text(json.dumps(self.cache))
+
+    def close(self):
+        """Shut down the worker pool"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self) -> 'AutoTuner':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self) -> str:
+        return (f"AutoTuner(n_patients={self.population.n_patients}, "
+                f"duration_sec={self.duration_sec}, n_workers={self.n_workers})")
@@ -7,8 +7,10 @@ from abc import ABC, abstractmethod
 from typing import Dict, Any, Tuple
 import numpy as np
 
+from src.simulation.checkpoint import Stateful
 
-class BaseController(ABC):
+
+class BaseController(Stateful, ABC):
     """
     Abstract base class for DBS controllers
     
@@ -16,7 +18,17 @@ class BaseController(ABC):
     - compute_control(): Calculate stimulation amplitude
     - reset(): Reset internal state
     - get_params(): Return controller parameters
+
+    Internal state listed in ``STATE_ATTRS`` can be snapshotted with
+    get_state() and restored with set_state() for checkpointing.
+    
+    control() wraps compute_control() with optional event-triggered
+    execution (see set_event_trigger()); subclasses use ``step_dt``, the
+    time since their previous evaluation, instead of ``dt``.
     """
+
+    STATE_ATTRS = ('time', 'step_dt', 'held_ticks', 'held_control',
+                   'trigger_measurement', 'trigger_counts')
     
     def __init__(self, dt: float = 0.001, **kwargs):
         """
@@ -35,6 +47,9 @@ class BaseController(ABC):
         self.error_history = []
         self.params = kwargs
         
+        self.event_trigger = None
+        self.reset_trigger()
+        
     @abstractmethod
     def compute_control(self, measurement: float, setpoint: float) -> float:
         """
@@ -74,9 +89,139 @@ class BaseController(ABC):
             **self.params
         }
     
+    def get_config(self) -> Dict[str, Any]:
+        """Parameters that define the control law (no state or time)"""
+        return {'dt': self.dt, **self.params}
+
     def update_time(self):
         """Increment internal time counter"""
-        self.time += self.dt
+        self.time += self.step_dt
+    
+    def set_event_trigger(self,
+                          error_threshold: float = None,
+                          estimate_threshold: float = None,
+                          max_hold_time: float = 0.1):
+        """
+        Enable event-triggered execution of compute_control()
+        
+        At each tick control() re-evaluates the control law only if
+        
+        - |measurement - setpoint| > error_threshold (beta outside the band),
+        - the measurement moved by more than estimate_threshold since the
+          last evaluation, or
+        - the output has been held for max_hold_time;
+        
+        otherwise the previous output is returned at O(1) cost.
+        
+        Parameters
+        ----------
+        error_threshold : float, optional
+            Error band (beta units) inside which the output may be held
+        estimate_threshold : float, optional
+            Change of the measurement that forces re-evaluation
+        max_hold_time : float
+            Longest time (s) between evaluations
+        """
+        if error_threshold is None and estimate_threshold is None:
+            raise ValueError("Set error_threshold and/or estimate_threshold")
+        
+        self.event_trigger = {
+            'error_threshold': error_threshold,
+            'estimate_threshold': estimate_threshold,
+            'max_hold_time': max_hold_time,
+        }
+        self.max_hold_ticks = max(int(round(max_hold_time / self.dt)), 1)
+        self.params['event_trigger'] = dict(self.event_trigger)
+        self.reset_trigger()
+    
+    def disable_event_trigger(self):
+        """Evaluate the control law at every tick again"""
+        self.event_trigger = None
+        self.params.pop('event_trigger', None)
+        self.reset_trigger()
+    
+    def reset_trigger(self):
+        """Clear held output and trigger statistics"""
+        self.step_dt = self.dt
+        self.held_ticks = 0
+        self.held_control = None
+        self.trigger_measurement = 0.0
+        self.trigger_counts = {'ticks': 0, 'initial': 0, 'error': 0,
+                               'estimate': 0, 'max_hold': 0}
+    
+    def on_hold(self, measurement: float):
+        """Hook called on ticks where the output is held (default: no-op)"""
+        pass
+    
+    def control(self, measurement: float, setpoint: float) -> float:
+        """
+        compute_control() with optional event-triggered execution
+        
+        Parameters
+        ----------
+        measurement : float
+            Current measured value
+        setpoint : float
+            Desired target value
+            
+        Returns
+        -------
+        float
+            Control signal (stimulation amplitude in mA)
+        """
+        trigger = self.event_trigger
+        if trigger is None:
+            return self.compute_control(measurement, setpoint)
+        
+        counts = self.trigger_counts
+        counts['ticks'] += 1
+        error = measurement - setpoint
+        
+        if self.held_control is None:
+            reason = 'initial'
+        elif trigger['error_threshold'] is not None and abs(error) > trigger['error_threshold']:
+            reason = 'error'
+        elif (trigger['estimate_threshold'] is not None
+              and abs(measurement - self.trigger_measurement) > trigger['estimate_threshold']):
+            reason = 'estimate'
+        elif self.held_ticks + 1 >= self.max_hold_ticks:
+            reason = 'max_hold'
+        else:
+            self.held_ticks += 1
+            self.on_hold(measurement)
+            self.log_control(self.held_control, error)
+            return self.held_control
+        
+        counts[reason] += 1
+        self.step_dt = (self.held_ticks + 1) * self.dt
+        control = self.compute_control(measurement, setpoint)
+        self.step_dt = self.dt
+        
+        self.held_ticks = 0
+        self.held_control = control
+        self.trigger_measurement = measurement
+        return control
+    
+    def get_trigger_stats(self) -> Dict[str, Any]:
+        """
+        Evaluation statistics of event-triggered execution
+        
+        Returns
+        -------
+        dict
+            ticks, evaluations, skipped, skip_ratio and the number of
+            evaluations caused by each trigger
+        """
+        counts = dict(self.trigger_counts)
+        ticks = counts.pop('ticks')
+        evaluations = sum(counts.values())
+        return {
+            'ticks': ticks,
+            'evaluations': evaluations,
+            'skipped': ticks - evaluations,
+            'skip_ratio': (ticks - evaluations) / ticks if ticks else 0.0,
+            'triggers': counts,
+        }
     
     def log_control(self, control: float, error: float):
         """
@@ -134,6 +279,11 @@ class BaseController(ABC):
         """
         Apply rate limiting to control signal
         
+        The limit is per tick (``dt``), also after an event-triggered hold:
+        ``prev_control`` is the output held on the previous tick, so the
+        applied stimulation never changes by more than ``max_rate * dt``
+        between consecutive ticks.
+        
         Parameters
         ----------
         control : float
@@ -0,0 +1,292 @@
+"""
+LQR Controller Implementation
+Linear Quadratic Regulator for DBS beta suppression
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+from scipy.linalg import solve_continuous_are
+
+from .base_controller import BaseController
+from src.precision import get_dtype
+from src.simulation.checkpoint import Stateful
+
+
+def beta_state_space(omega: float = 2 * np.pi * 20,
+                     zeta: float = 0.2,
+                     k_stim: float = 10.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Damped-oscillator model of beta dynamics around the operating point
+
+    States: x1 = beta_error, x2 = d(beta_error)/dt
+
+    Parameters
+    ----------
+    omega : float
+        Natural frequency (rad/s, default 20 Hz)
+    zeta : float
+        Damping ratio
+    k_stim : float
+        Stimulation effectiveness
+
+    Returns
+    -------
+    tuple
+        (A, B) continuous-time state-space matrices
+    """
+    A = np.array([
+        [0, 1],
+        [-omega**2, -2 * zeta * omega]
+    ])
+    B = np.array([
+        [0],
+        [-k_stim]
+    ])
+    return A, B
+
+
+def design_lqr(A: np.ndarray, B: np.ndarray,
+               Q: np.ndarray, R: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Design a continuous-time LQR controller
+
+    Returns
+    -------
+    tuple
+        (K, P) optimal feedback gain and Riccati solution
+    """
+    P = solve_continuous_are(A, B, Q, R)
+    K = np.linalg.inv(R) @ B.T @ P
+    return K, P
+
+
+def check_plant(A: np.ndarray, B: np.ndarray) -> Optional[str]:
+    """
+    Reason (A, B) is unfit for LQR design, or None
+
+    Expects the companion form of :func:`beta_state_space`; the model must
+    be finite, stable (both characteristic coefficients positive) and have
+    stimulation lower beta (B[1] < 0).
+    """
+    A = np.asarray(A, dtype=float)
+    B = np.asarray(B, dtype=float)
+    if A.shape != (2, 2) or B.shape != (2, 1):
+        return "expected A of shape (2, 2) and B of shape (2, 1)"
+    if not (np.all(np.isfinite(A)) and np.all(np.isfinite(B))):
+        return "non-finite model"
+    if A[1, 0] >= 0.0 or A[1, 1] >= 0.0:
+        return "unstable model"
+    if B[1, 0] >= 0.0:
+        return "stimulation does not reduce beta"
+    return None
+
+
+class LQRController(BaseController):
+    """
+    LQR Controller for Deep Brain Stimulation
+
+    Control law: u = -K x with x = [beta_error, d(beta_error)/dt]
+
+    Parameters
+    ----------
+    K : np.ndarray
+        Feedback gain of shape (1, 2)
+    dt : float
+        Time step in seconds
+    min_stim, max_stim : float
+        Saturation limits in mA
+    max_rate : float, optional
+        Maximum rate of change of the output in mA/s (disabled if None)
+    Q, R : np.ndarray, optional
+        Cost weights, kept for re-design in :meth:`update_model`
+    """
+
+    # K is included because update_model() can change it during a run
+    STATE_ATTRS = BaseController.STATE_ATTRS + ('K', 'x', 'prev_error', 'prev_control')
+
+    def __init__(self,
+                 K: np.ndarray,
+                 dt: float = 0.001,
+                 min_stim: float = 0.0,
+                 max_stim: float = 5.0,
+                 max_rate: float = None,
+                 Q: np.ndarray = None,
+                 R: np.ndarray = None,
+                 **kwargs):
+        super().__init__(dt=dt, **kwargs)
+
+        self.dtype = get_dtype()
+        self.K = np.atleast_2d(np.asarray(K, dtype=self.dtype))
+        self.min_stim = min_stim
+        self.max_stim = max_stim
+        self.max_rate = max_rate
+        self.Q = None if Q is None else np.atleast_2d(Q)
+        self.R = None if R is None else np.atleast_2d(R)
+
+        self.model_rejection = None
+
+        # Internal state
+        self.x = np.zeros((2, 1), dtype=self.dtype)
+        self.prev_error = 0.0
+        self.prev_control = 0.0
+
+        self.params.update({
+            'K': self.K.tolist(),
+            'min_stim': min_stim,
+            'max_stim': max_stim,
+            'max_rate': max_rate
+        })
+
+    @classmethod
+    def from_weights(cls, Q: np.ndarray, R: np.ndarray,
+                     A: np.ndarray = None, B: np.ndarray = None,
+                     **kwargs) -> 'LQRController':
+        """
+        Build a controller by solving the Riccati equation
+
+        A and B default to :func:`beta_state_space`.
+        """
+        if A is None or B is None:
+            A, B = beta_state_space()
+        K, _ = design_lqr(A, B, np.atleast_2d(Q), np.atleast_2d(R))
+        return cls(K, Q=Q, R=R, **kwargs)
+
+    def update_model(self, A: np.ndarray, B: np.ndarray,
+                     Q: np.ndarray = None, R: np.ndarray = None) -> np.ndarray:
+        """
+        Re-design the gain for new plant matrices
+
+        Intended for A/B estimates from
+        :class:`~src.models.system_identification.OnlineBetaIdentifier`
+        (check :meth:`~src.models.system_identification.OnlineBetaIdentifier.check_model`
+        first). Internal state (previous error) is kept, so the switch is
+        bumpless apart from the gain change. A model that is not a stable
+        companion-form plant in which stimulation lowers beta is rejected:
+        K is left unchanged and the reason is stored in ``model_rejection``.
+
+        Parameters
+        ----------
+        A, B : np.ndarray
+            Continuous-time model in coordinates [beta_error, d(beta_error)/dt]
+        Q, R : np.ndarray, optional
+            New cost weights (default: the ones used at construction)
+
+        Returns
+        -------
+        np.ndarray
+            Updated (or, if rejected, unchanged) feedback gain K
+        """
+        if Q is not None:
+            self.Q = np.atleast_2d(Q)
+        if R is not None:
+            self.R = np.atleast_2d(R)
+        if self.Q is None or self.R is None:
+            raise ValueError("Q and R are required to re-design the LQR gain")
+
+        self.model_rejection = check_plant(A, B)
+        if self.model_rejection is not None:
+            return self.K
+
+        K, _ = design_lqr(A, B, self.Q, self.R)
+        self.K = K.astype(self.dtype)
+        self.params['K'] = self.K.tolist()
+        return self.K
+
+    def compute_control(self, measurement: float, setpoint: float) -> float:
+        """
+        Compute optimal control signal
+
+        Parameters
+        ----------
+        measurement : float
+            Current measured beta power
+        setpoint : float
+            Target beta power
+
+        Returns
+        -------
+        float
+            Control signal (stimulation amplitude in mA)
+        """
+        error = measurement - setpoint
+        derror = (error - self.prev_error) / self.step_dt
+
+        self.x = np.array([[error], [derror]], dtype=self.dtype)
+
+        u = -self.K @ self.x
+        control = self.apply_saturation(u[0, 0], self.min_stim, self.max_stim)
+        if self.max_rate is not None:
+            control = self.apply_rate_limit(control, self.prev_control, self.max_rate)
+
+        self.prev_error = error
+        self.prev_control = control
+        self.update_time()
+        self.log_control(control, error)
+
+        return control
+
+    def reset(self):
+        """Reset controller state"""
+        self.x = np.zeros((2, 1), dtype=self.dtype)
+        self.prev_error = 0.0
+        self.prev_control = 0.0
+        self.time = 0.0
+        self.control_history = []
+        self.error_history = []
+        self.reset_trigger()
+
+    def __repr__(self) -> str:
+        return f"LQRController(K={self.K.ravel().round(4).tolist()})"
+
+
+class BatchLQRController(Stateful):
+    """
+    Vectorized LQR law for many gain sets and patients at once
+
+    Parameters
+    ----------
+    K : np.ndarray
+        Gains of shape (n_candidates, 2); broadcast against measurements of
+        shape (n_candidates, n_patients)
+    dt : float
+        Time step in seconds
+    min_stim, max_stim : float
+        Saturation limits in mA
+    max_rate : float, optional
+        Maximum rate of change of the output in mA/s (disabled if None)
+    """
+
+    STATE_ATTRS = ('prev_error', 'prev_control')
+
+    def __init__(self, K: np.ndarray, dt: float = 0.001,
+                 min_stim: float = 0.0, max_stim: float = 5.0,
+                 max_rate: float = None):
+        K = np.atleast_2d(np.asarray(K, dtype=get_dtype()))
+        self.k_error = K[:, 0:1]
+        self.k_derror = K[:, 1:2]
+        self.dt = dt
+        self.min_stim = min_stim
+        self.max_stim = max_stim
+        self.max_rate = max_rate
+        self.reset()
+
+    def reset(self):
+        """Reset controller state"""
+        self.prev_error = 0.0
+        self.prev_control = 0.0
+
+    def compute_control(self, measurement: np.ndarray,
+                        setpoint: np.ndarray) -> np.ndarray:
+        """Vectorized equivalent of :meth:`LQRController.compute_control`"""
+        error = measurement - setpoint
+        derror = (error - self.prev_error) / self.dt
+        self.prev_error = error
+        control = np.clip(-(self.k_error * error + self.k_derror * derror),
+                          self.min_stim, self.max_stim)
+        if self.max_rate is not None:
+            max_change = self.max_rate * self.dt
+            control = np.clip(control, self.prev_control - max_change,
+                              self.prev_control + max_change)
+        self.prev_control = control
+        return control
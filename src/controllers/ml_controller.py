@@ -0,0 +1,90 @@
+"""
+ML-Enhanced Controller
+LQR control on beta power denoised by an LSTM state estimator
+"""
+
+from collections import deque
+
+import numpy as np
+import torch
+
+from .lqr_controller import LQRController
+
+
+class MLEnhancedController(LQRController):
+    """
+    LQR controller with LSTM state estimator
+
+    The last ``seq_length`` noisy measurements are passed through the LSTM
+    and the LQR law acts on its estimate. Until enough history is available
+    the raw measurement is used.
+
+    Parameters
+    ----------
+    K : np.ndarray
+        Feedback gain of shape (1, 2)
+    lstm_model : torch.nn.Module
+        Trained :class:`~src.models.lstm_estimator.BetaPowerLSTM`
+    seq_length : int
+        Measurements per LSTM input window
+    **kwargs
+        Passed to :class:`LQRController` (dt, limits, Q, R)
+    """
+
+    STATE_ATTRS = LQRController.STATE_ATTRS + ('measurement_buffer',)
+
+    def __init__(self, K: np.ndarray, lstm_model, seq_length: int = 50,
+                 **kwargs):
+        super().__init__(K, **kwargs)
+
+        self.lstm = lstm_model.eval()
+        self.seq_length = seq_length
+        self.measurement_buffer = deque(maxlen=seq_length)
+        self.estimate_history = []
+
+        self.params['seq_length'] = seq_length
+
+    def estimate(self, noisy_measurement: float) -> float:
+        """Add a measurement and return the denoised beta power"""
+        self.measurement_buffer.append(noisy_measurement)
+        if len(self.measurement_buffer) < self.seq_length:
+            return noisy_measurement
+
+        seq = torch.as_tensor(np.fromiter(self.measurement_buffer, dtype=np.float32,
+                                          count=self.seq_length))
+        with torch.no_grad():
+            return float(self.lstm(seq.view(1, self.seq_length, 1)).item())
+
+    def on_hold(self, measurement: float):
+        """Keep the LSTM input sequence complete while the output is held"""
+        self.measurement_buffer.append(measurement)
+
+    def compute_control(self, measurement: float, setpoint: float) -> float:
+        """
+        Compute control using ML-denoised state estimate
+
+        Parameters
+        ----------
+        measurement : float
+            Noisy measured beta power
+        setpoint : float
+            Target beta power
+
+        Returns
+        -------
+        float
+            Control signal (stimulation amplitude in mA)
+        """
+        clean_measurement = self.estimate(measurement)
+        self.estimate_history.append(clean_measurement)
+        return super().compute_control(clean_measurement, setpoint)
+
+    def reset(self):
+        """Reset controller state and measurement buffer"""
+        super().reset()
+        self.measurement_buffer.clear()
+        self.estimate_history = []
+
+    def __repr__(self) -> str:
+        return (f"MLEnhancedController(K={self.K.ravel().round(4).tolist()}, "
+                f"seq_length={self.seq_length})")
@@ -3,8 +3,15 @@ PID Controller Implementation
 Proportional-Integral-Derivative controller for DBS
 """
 
+import logging
+
 import numpy as np
 from .base_controller import BaseController
+from src.precision import get_dtype
+from src.simulation.checkpoint import Stateful
+
+
+logger = logging.getLogger(__name__)
 
 
 class PIDController(BaseController):
@@ -27,8 +34,14 @@ class PIDController(BaseController):
         Enable anti-windup for integral term
     windup_limit : float
         Maximum absolute value for integral term
+    min_stim, max_stim : float
+        Saturation limits in mA
+    max_rate : float, optional
+        Maximum rate of change of the output in mA/s (disabled if None)
     """
     
+    STATE_ATTRS = BaseController.STATE_ATTRS + ('integral', 'prev_error', 'prev_control')
+
     def __init__(self, 
                  kp: float = 2.0, 
                  ki: float = 0.5, 
@@ -36,6 +49,9 @@ class PIDController(BaseController):
                  dt: float = 0.001,
                  anti_windup: bool = True,
                  windup_limit: float = 10.0,
+                 min_stim: float = 0.0,
+                 max_stim: float = 5.0,
+                 max_rate: float = None,
                  **kwargs):
         super().__init__(dt=dt, **kwargs)
         
@@ -44,6 +60,9 @@ class PIDController(BaseController):
         self.kd = kd
         self.anti_windup = anti_windup
         self.windup_limit = windup_limit
+        self.min_stim = min_stim
+        self.max_stim = max_stim
+        self.max_rate = max_rate
         
         # Internal state
         self.integral = 0.0
@@ -56,7 +75,10 @@ class PIDController(BaseController):
             'ki': ki,
             'kd': kd,
             'anti_windup': anti_windup,
-            'windup_limit': windup_limit
+            'windup_limit': windup_limit,
+            'min_stim': min_stim,
+            'max_stim': max_stim,
+            'max_rate': max_rate
         })
     
     def compute_control(self, measurement: float, setpoint: float) -> float:
@@ -82,8 +104,11 @@ class PIDController(BaseController):
         # Proportional term
         p_term = self.kp * error
         
+        # Elapsed time since the previous evaluation (> dt when event-triggered)
+        dt = self.step_dt
+        
         # Integral term with anti-windup
-        self.integral += error * self.dt
+        self.integral += error * dt
         if self.anti_windup:
             self.integral = np.clip(self.integral, 
                                    -self.windup_limit, 
@@ -91,17 +116,18 @@ class PIDController(BaseController):
         i_term = self.ki * self.integral
         
         # Derivative term
-        derivative = (error - self.prev_error) / self.dt
+        derivative = (error - self.prev_error) / dt
         d_term = self.kd * derivative
         
         # Compute raw control signal
         control = p_term + i_term + d_term
         
-        # Apply saturation limits (0-5 mA)
-        control = self.apply_saturation(control, min_val=0.0, max_val=5.0)
+        # Apply saturation limits (default 0-5 mA)
+        control = self.apply_saturation(control, min_val=self.min_stim, max_val=self.max_stim)
         
         # Optional: Apply rate limiting
-        # control = self.apply_rate_limit(control, self.prev_control, max_rate=2.0)
+        if self.max_rate is not None:
+            control = self.apply_rate_limit(control, self.prev_control, max_rate=self.max_rate)
         
         # Update state
         self.prev_error = error
@@ -119,6 +145,7 @@ class PIDController(BaseController):
         self.time = 0.0
         self.control_history = []
         self.error_history = []
+        self.reset_trigger()
     
     def tune_ziegler_nichols(self, ku: float, tu: float, method: str = 'classic'):
         """
@@ -155,10 +182,8 @@ class PIDController(BaseController):
         # Update params dict
         self.params.update({'kp': self.kp, 'ki': self.ki, 'kd': self.kd})
         
-        print(f"PID tuned using {method} Ziegler-Nichols:")
-        print(f"  Kp = {self.kp:.4f}")
-        print(f"  Ki = {self.ki:.4f}")
-        print(f"  Kd = {self.kd:.4f}")
+        logger.info("PID tuned using %s Ziegler-Nichols: Kp = %.4f, Ki = %.4f, Kd = %.4f",
+                    method, self.kp, self.ki, self.kd)
     
     def get_tuning_recommendations(self) -> dict:
         """
@@ -198,3 +223,81 @@ class PIDController(BaseController):
     
     def __repr__(self) -> str:
         return f"PIDController(Kp={self.kp}, Ki={self.ki}, Kd={self.kd})"
+
+
+class BatchPIDController(Stateful):
+    """
+    Vectorized PID law for many gain sets and patients at once
+
+    Same control law, anti-windup and saturation as :class:`PIDController`,
+    evaluated on arrays so that a whole candidate-by-patient grid advances
+    in one NumPy operation.
+
+    Parameters
+    ----------
+    kp, ki, kd : float or np.ndarray
+        Gains of shape (n_candidates,); broadcast against measurements of
+        shape (n_candidates, n_patients)
+    dt : float
+        Time step in seconds
+    anti_windup : bool
+        Enable anti-windup for integral term
+    windup_limit : float
+        Maximum absolute value for integral term
+    min_stim, max_stim : float
+        Saturation limits in mA
+    max_rate : float, optional
+        Maximum rate of change of the output in mA/s (disabled if None)
+    """
+
+    STATE_ATTRS = ('integral', 'prev_error', 'prev_control')
+
+    def __init__(self,
+                 kp: np.ndarray,
+                 ki: np.ndarray,
+                 kd: np.ndarray,
+                 dt: float = 0.001,
+                 anti_windup: bool = True,
+                 windup_limit: float = 10.0,
+                 min_stim: float = 0.0,
+                 max_stim: float = 5.0,
+                 max_rate: float = None):
+        self.kp = np.asarray(kp, dtype=get_dtype()).reshape(-1, 1)
+        self.ki = np.asarray(ki, dtype=get_dtype()).reshape(-1, 1)
+        self.kd = np.asarray(kd, dtype=get_dtype()).reshape(-1, 1)
+        self.dt = dt
+        self.anti_windup = anti_windup
+        self.windup_limit = windup_limit
+        self.min_stim = min_stim
+        self.max_stim = max_stim
+        self.max_rate = max_rate
+        self.reset()
+
+    def reset(self):
+        """Reset controller state"""
+        self.integral = 0.0
+        self.prev_error = 0.0
+        self.prev_control = 0.0
+
+    def compute_control(self, measurement: np.ndarray,
+                        setpoint: np.ndarray) -> np.ndarray:
+        """Vectorized equivalent of :meth:`PIDController.compute_control`"""
+        error = measurement - setpoint
+
+        self.integral = self.integral + error * self.dt
+        if self.anti_windup:
+            self.integral = np.clip(self.integral,
+                                    -self.windup_limit,
+                                    self.windup_limit)
+
+        derivative = (error - self.prev_error) / self.dt
+        control = self.kp * error + self.ki * self.integral + self.kd * derivative
+
+        self.prev_error = error
+        control = np.clip(control, self.min_stim, self.max_stim)
+        if self.max_rate is not None:
+            max_change = self.max_rate * self.dt
+            control = np.clip(control, self.prev_control - max_change,
+                              self.prev_control + max_change)
+        self.prev_control = control
+        return control
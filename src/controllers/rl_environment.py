@@ -0,0 +1,307 @@
+"""
+RL Environment
+Batched beta-control environment over the virtual patient population
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.models.brain_dynamics import PatientPopulation
+from src.simulation.checkpoint import Stateful
+
+try:
+    from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+except ImportError:  # optional 'ml' extra
+    VecEnv = object
+
+try:
+    from gymnasium import spaces
+except ImportError:
+    try:
+        from gym import spaces  # stable-baselines3 < 2.0
+    except ImportError:
+        spaces = None
+
+
+DEFAULT_REWARD_WEIGHTS = {
+    'beta': 1.0,
+    'energy': 0.05,
+}
+
+
+class BatchBetaEnv(Stateful):
+    """
+    Beta suppression task for N virtual patients stepped as one array
+
+    Every environment instance is one patient of a
+    :class:`PatientPopulation`; ``step`` advances all of them with a single
+    vectorized plant update, so the Python overhead per call is constant
+    rather than proportional to N.
+
+    Actions are stimulation amplitudes in mA. The safety limits are part of
+    the environment: actions are clipped to ``[min_stim, max_stim]`` and,
+    if ``max_rate`` is set, to ``prev_stim +- max_rate * dt`` per plant step,
+    whatever the policy outputs.
+
+    Observation per patient (float32): the last ``n_history`` beta
+    measurements and the target, both relative to the patient's beta0,
+    followed by the previous stimulation relative to ``max_stim``.
+
+    Reward per control step:
+
+        r = -(w_beta * ((beta - target) / beta0)^2 + w_energy * (u / max_stim)^2)
+
+    All patients run episodes of ``episode_steps`` in lockstep and are reset
+    together with fresh disturbance noise.
+
+    Parameters
+    ----------
+    population : PatientPopulation
+        Virtual patients, one per environment
+    target_ratio : float
+        Target beta as a fraction of each patient's beta0
+    episode_steps : int
+        Control steps per episode
+    action_repeat : int
+        Plant steps each action is held for
+    min_stim, max_stim : float
+        Stimulation limits in mA
+    max_rate : float, optional
+        Maximum rate of change of stimulation in mA/s
+    n_history : int
+        Beta measurements in the observation
+    reward_weights : dict, optional
+        Weights for 'beta' and 'energy'
+    seed : int, optional
+        Seed for per-episode disturbance seeds
+    """
+
+    STATE_ATTRS = ('population', 'rng', 'step_idx', 'prev_stim', 'episode_return', 'obs')
+
+    def __init__(self,
+                 population: PatientPopulation,
+                 target_ratio: float = 0.3,
+                 episode_steps: int = 1000,
+                 action_repeat: int = 1,
+                 min_stim: float = 0.0,
+                 max_stim: float = 5.0,
+                 max_rate: Optional[float] = None,
+                 n_history: int = 4,
+                 reward_weights: Optional[Dict[str, float]] = None,
+                 seed: Optional[int] = None):
+        if action_repeat < 1:
+            raise ValueError("action_repeat must be at least 1")
+        if n_history < 1:
+            raise ValueError("n_history must be at least 1")
+
+        self.population = population
+        self.num_envs = population.n_patients
+        self.dt = population.dt
+        self.target_ratio = target_ratio
+        self.episode_steps = episode_steps
+        self.action_repeat = action_repeat
+        self.min_stim = min_stim
+        self.max_stim = max_stim
+        self.max_rate = max_rate
+        self.n_history = n_history
+        self.reward_weights = {**DEFAULT_REWARD_WEIGHTS, **(reward_weights or {})}
+        self.obs_dim = n_history + 2
+
+        self.rng = np.random.default_rng(seed)
+        self.target = target_ratio * population.beta0
+        self.obs = np.zeros((self.num_envs, self.obs_dim), dtype=np.float32)
+        self.reset()
+
+    def seed(self, seed: Optional[int] = None):
+        """Reseed the per-episode disturbance seeds"""
+        self.rng = np.random.default_rng(seed)
+
+    def reset(self) -> np.ndarray:
+        """
+        Start a new episode for every patient
+
+        Returns
+        -------
+        np.ndarray
+            Observations of shape (num_envs, obs_dim)
+        """
+        self.population.seed = int(self.rng.integers(2**63))
+        measurement = self.population.reset()
+
+        self.step_idx = 0
+        self.prev_stim = np.zeros(self.num_envs)
+        self.episode_return = np.zeros(self.num_envs)
+
+        self.obs[:, :self.n_history] = (measurement / self.population.beta0)[:, None]
+        self.obs[:, -2] = self.target_ratio
+        self.obs[:, -1] = 0.0
+        return self.obs.copy()
+
+    def clip_action(self, action: np.ndarray) -> np.ndarray:
+        """Apply amplitude and rate limits to a batch of actions"""
+        stim = np.clip(np.asarray(action, dtype=float).reshape(self.num_envs),
+                       self.min_stim, self.max_stim)
+        if self.max_rate is not None:
+            max_change = self.max_rate * self.dt
+            stim = np.clip(stim, self.prev_stim - max_change,
+                           self.prev_stim + max_change)
+        return stim
+
+    def step(self, action: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+        """
+        Apply one stimulation command per patient
+
+        Parameters
+        ----------
+        action : np.ndarray
+            Stimulation amplitudes of shape (num_envs,) or (num_envs, 1)
+
+        Returns
+        -------
+        tuple
+            (obs, reward, done, info); obs of the finished episode when done
+            is True (the caller decides when to reset), info holds the
+            applied stimulation and the true beta
+        """
+        beta0 = self.population.beta0
+        w_beta = self.reward_weights['beta']
+        w_energy = self.reward_weights['energy']
+        reward = np.zeros(self.num_envs)
+
+        for _ in range(self.action_repeat):
+            stim = self.clip_action(action)
+            measurement = self.population.step(stim)
+            beta = self.population.beta
+            reward -= w_beta * ((beta - self.target) / beta0)**2 \
+                + w_energy * (stim / self.max_stim)**2
+            self.prev_stim = stim
+
+        reward /= self.action_repeat
+        self.episode_return += reward
+        self.step_idx += 1
+
+        history = self.obs[:, :self.n_history]
+        history[:, 1:] = history[:, :-1]
+        history[:, 0] = measurement / beta0
+        self.obs[:, -1] = self.prev_stim / self.max_stim
+
+        done = np.full(self.num_envs, self.step_idx >= self.episode_steps)
+        info = {'stimulation': self.prev_stim, 'beta': beta}
+        return self.obs.copy(), reward.astype(np.float32), done, info
+
+    def __repr__(self) -> str:
+        return (f"BatchBetaEnv(num_envs={self.num_envs}, "
+                f"episode_steps={self.episode_steps}, max_stim={self.max_stim})")
+
+
+class BetaControlVecEnv(VecEnv):
+    """
+    stable-baselines3 ``VecEnv`` adapter for :class:`BatchBetaEnv`
+
+    Follows the VecEnv protocol (auto-reset, ``terminal_observation`` and
+    ``episode`` in the info of finished environments) while every step
+    remains one batched NumPy update. The action space is the Box
+    ``[min_stim, max_stim]``, so policies sample only safe amplitudes.
+
+    Parameters
+    ----------
+    env : BatchBetaEnv
+        Batched environment to expose
+    """
+
+    metadata = {'render_modes': []}
+
+    def __init__(self, env: BatchBetaEnv):
+        if VecEnv is object or spaces is None:
+            raise ImportError("BetaControlVecEnv requires the 'ml' extra: "
+                              "pip install stable-baselines3 gym")
+
+        self.env = env
+        self.render_mode = None
+        observation_space = spaces.Box(low=-np.inf, high=np.inf,
+                                       shape=(env.obs_dim,), dtype=np.float32)
+        action_space = spaces.Box(low=env.min_stim, high=env.max_stim,
+                                  shape=(1,), dtype=np.float32)
+        super().__init__(env.num_envs, observation_space, action_space)
+        self._actions = None
+
+    def reset(self) -> np.ndarray:
+        seeds = getattr(self, '_seeds', None)
+        if seeds and seeds[0] is not None:
+            self.env.seed(seeds[0])
+            self._seeds = [None] * self.num_envs
+        return self.env.reset()
+
+    def step_async(self, actions: np.ndarray):
+        self._actions = actions
+
+    def step_wait(self):
+        obs, reward, done, _ = self.env.step(self._actions)
+        infos: List[Dict[str, Any]] = [{} for _ in range(self.num_envs)]
+
+        if done[0]:
+            for i, info in enumerate(infos):
+                info['terminal_observation'] = obs[i]
+                info['TimeLimit.truncated'] = True
+                info['episode'] = {'r': float(self.env.episode_return[i]),
+                                   'l': self.env.step_idx}
+            obs = self.env.reset()
+        return obs, reward, done, infos
+
+    def seed(self, seed: Optional[int] = None) -> List[Optional[int]]:
+        self.env.seed(seed)
+        return [seed] * self.num_envs
+
+    def close(self):
+        pass
+
+    def _indices(self, indices) -> Sequence[int]:
+        if indices is None:
+            return range(self.num_envs)
+        if isinstance(indices, int):
+            return [indices]
+        return indices
+
+    def get_attr(self, attr_name: str, indices=None) -> List[Any]:
+        value = getattr(self.env, attr_name, getattr(self, attr_name, None))
+        return [value for _ in self._indices(indices)]
+
+    def set_attr(self, attr_name: str, value: Any, indices=None):
+        setattr(self.env, attr_name, value)
+
+    def env_method(self, method_name: str, *method_args, indices=None,
+                   **method_kwargs) -> List[Any]:
+        result = getattr(self.env, method_name)(*method_args, **method_kwargs)
+        return [result for _ in self._indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None) -> List[bool]:
+        return [False for _ in self._indices(indices)]
+
+
+def make_vec_env(n_envs: int = 256, variability: float = 0.3,
+                 seed: int = 0, population_kwargs: Optional[Dict[str, Any]] = None,
+                 **env_kwargs) -> BetaControlVecEnv:
+    """
+    Sample a patient population and wrap it as a VecEnv
+
+    Parameters
+    ----------
+    n_envs : int
+        Number of virtual patients (parallel environments)
+    variability : float
+        Log-normal spread of patient parameters
+    seed : int
+        Seed for the population and the episodes
+    population_kwargs : dict, optional
+        Nominal :class:`PatientPopulation` arguments
+    **env_kwargs
+        Passed to :class:`BatchBetaEnv` (limits, episode length, ...)
+
+    Returns
+    -------
+    BetaControlVecEnv
+    """
+    population = PatientPopulation.sample(n_envs, variability=variability,
+                                          seed=seed, **(population_kwargs or {}))
+    return BetaControlVecEnv(BatchBetaEnv(population, seed=seed, **env_kwargs))
@@ -0,0 +1,321 @@
+"""
+Brain Dynamics Models
+Beta-power plant models used for closed-loop controller testing
+"""
+
+from typing import Any, Dict, Optional, Union
+
+import numpy as np
+
+from src.precision import get_dtype
+from src.simulation.checkpoint import Stateful
+
+
+ArrayLike = Union[float, np.ndarray]
+
+
+class SimpleBrainModel(Stateful):
+    """
+    Simplified brain model driven by a recorded baseline beta trace
+
+    Beta power is the open-loop baseline scaled down by stimulation:
+    beta = natural * (1 - stim_gain * stimulation), as used in the LQR and
+    ML-enhanced notebooks.
+
+    Parameters
+    ----------
+    baseline_beta : np.ndarray
+        Open-loop beta power trace
+    stim_gain : float
+        Fractional beta reduction per mA of stimulation
+    dt : float
+        Time step in seconds
+    """
+
+    STATE_ATTRS = ('time_idx',)
+
+    def __init__(self, baseline_beta: np.ndarray, stim_gain: float = 0.25,
+                 dt: float = 0.001):
+        self.baseline_beta = np.array(baseline_beta, dtype=get_dtype())
+        self.stim_gain = stim_gain
+        self.dt = dt
+        self.time_idx = 0
+
+    def step(self, stimulation: float) -> float:
+        """
+        Advance one time step
+
+        Parameters
+        ----------
+        stimulation : float
+            Stimulation amplitude in mA
+
+        Returns
+        -------
+        float
+            Beta power after stimulation
+        """
+        if self.time_idx >= len(self.baseline_beta):
+            self.time_idx = len(self.baseline_beta) - 1
+
+        natural = self.baseline_beta[self.time_idx]
+        beta = max(0.001, natural * (1 - self.stim_gain * stimulation))
+
+        self.time_idx += 1
+        return beta
+
+    def reset(self):
+        """Rewind to the start of the baseline trace"""
+        self.time_idx = 0
+
+
+class PatientPopulation(Stateful):
+    """
+    Vectorized beta-power plant for an ensemble of virtual patients
+
+    Each patient has its own open-loop beta level, stimulation sensitivity,
+    response time constant and stimulation delay. The natural (unstimulated)
+    beta power is either a recorded drive trace scaled to the patient's
+    level or an Ornstein-Uhlenbeck fluctuation around it:
+
+        natural  = beta0 * (1 + fluctuation)
+        beta_ss  = natural * max(1 - stim_gain * u(t - delay), floor)
+        beta    += dt / tau * (beta_ss - beta)
+
+    All patients advance in one NumPy operation, in the precision set by
+    :func:`src.precision.set_precision` at construction. ``reset(replicas=C)`` gives
+    every state array a leading axis of size C so that C controller
+    candidates can be simulated against identical patients and identical
+    disturbance realizations.
+
+    Parameters
+    ----------
+    n_patients : int
+        Number of virtual patients
+    beta0 : float or np.ndarray
+        Open-loop mean beta power per patient
+    stim_gain : float or np.ndarray
+        Fractional beta reduction per mA of stimulation
+    tau : float or np.ndarray
+        Beta response time constant (s)
+    delay_steps : int or np.ndarray
+        Stimulation transport delay in samples
+    fluctuation : float or np.ndarray
+        Relative standard deviation of natural beta fluctuations
+    fluctuation_tau : float
+        Correlation time of the fluctuations (s)
+    measurement_noise : float or np.ndarray
+        Measurement noise standard deviation, relative to beta0
+    drive : np.ndarray, optional
+        Recorded open-loop beta trace; replaces the synthetic fluctuation
+        (normalized to unit mean and looped)
+    floor : float
+        Minimum fraction of natural beta that stimulation can leave
+    dt : float
+        Time step in seconds
+    seed : int, optional
+        Seed for the disturbance and measurement noise
+    """
+
+    STATE_ATTRS = ('seed', 'rng', 'step_idx', 'ou', 'beta', 'stim_buffer', 'buffer_pos')
+
+    def __init__(self,
+                 n_patients: int = 1,
+                 beta0: ArrayLike = 1.0,
+                 stim_gain: ArrayLike = 0.25,
+                 tau: ArrayLike = 0.02,
+                 delay_steps: ArrayLike = 0,
+                 fluctuation: ArrayLike = 0.2,
+                 fluctuation_tau: float = 0.1,
+                 measurement_noise: ArrayLike = 0.0,
+                 drive: Optional[np.ndarray] = None,
+                 floor: float = 0.001,
+                 dt: float = 0.001,
+                 seed: Optional[int] = None):
+        self.n_patients = int(n_patients)
+        self.dtype = get_dtype()
+        self.dt = dt
+        self.fluctuation_tau = fluctuation_tau
+        self.floor = floor
+        self.seed = seed
+
+        self.beta0 = self._per_patient(beta0)
+        self.stim_gain = self._per_patient(stim_gain)
+        self.tau = self._per_patient(tau)
+        self.delay_steps = self._per_patient(delay_steps).astype(int)
+        self.fluctuation = self._per_patient(fluctuation)
+        self.measurement_noise = self._per_patient(measurement_noise)
+
+        if np.any(self.tau < dt):
+            raise ValueError("tau must be at least one time step")
+        if np.any(self.delay_steps < 0):
+            raise ValueError("delay_steps must be non-negative")
+
+        self.drive = None
+        if drive is not None:
+            drive = np.asarray(drive, dtype=self.dtype)
+            self.drive = drive / np.mean(drive, dtype=np.float64).astype(self.dtype)
+
+        self.reset()
+
+    def _per_patient(self, value: ArrayLike) -> np.ndarray:
+        value = np.asarray(value, dtype=self.dtype)
+        if value.ndim == 0:
+            return np.full(self.n_patients, value, dtype=self.dtype)
+        if value.shape != (self.n_patients,):
+            raise ValueError(
+                f"Expected scalar or shape ({self.n_patients},), got {value.shape}"
+            )
+        return value.copy()
+
+    def _standard_normal(self) -> np.ndarray:
+        # Drawn in float64 so every precision sees the same noise sequence
+        return self.rng.standard_normal(self.n_patients).astype(self.dtype, copy=False)
+
+    @classmethod
+    def sample(cls, n_patients: int, variability: float = 0.3,
+               seed: Optional[Union[int, np.random.SeedSequence]] = None,
+               **nominal) -> 'PatientPopulation':
+        """
+        Draw a population with log-normally spread patient parameters
+
+        Parameters and simulation noise come from independent streams
+        spawned from ``seed``, so the disturbances are not correlated with
+        the sampled patients.
+
+        Parameters
+        ----------
+        n_patients : int
+            Number of patients
+        variability : float
+            Log-normal sigma applied to beta0, stim_gain and tau
+        seed : int or np.random.SeedSequence, optional
+            Root seed for parameter sampling and the simulation noise
+        **nominal
+            Nominal constructor arguments (beta0, stim_gain, tau, ...)
+
+        Returns
+        -------
+        PatientPopulation
+        """
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        param_seq, noise_seq = seed.spawn(2)
+        rng = np.random.default_rng(param_seq)
+        params = dict(nominal)
+        for name, default in (('beta0', 1.0), ('stim_gain', 0.25), ('tau', 0.02)):
+            centre = params.get(name, default)
+            params[name] = centre * rng.lognormal(0.0, variability, n_patients)
+        dt = params.get('dt', 0.001)
+        params['tau'] = np.maximum(params['tau'], dt)
+        noise_seed = int(noise_seq.generate_state(1, np.uint64)[0])
+        return cls(n_patients=n_patients, seed=noise_seed, **params)
+
+    def get_config(self) -> Dict[str, Any]:
+        """Constructor arguments that recreate this population"""
+        return {
+            'n_patients': self.n_patients,
+            'beta0': self.beta0.copy(),
+            'stim_gain': self.stim_gain.copy(),
+            'tau': self.tau.copy(),
+            'delay_steps': self.delay_steps.copy(),
+            'fluctuation': self.fluctuation.copy(),
+            'fluctuation_tau': self.fluctuation_tau,
+            'measurement_noise': self.measurement_noise.copy(),
+            'drive': self.drive,
+            'floor': self.floor,
+            'dt': self.dt,
+            'seed': self.seed,
+        }
+
+    def reset(self, replicas: Optional[int] = None) -> np.ndarray:
+        """
+        Reset all patients to their open-loop operating point
+
+        Parameters
+        ----------
+        replicas : int, optional
+            Leading batch size for simulating several controllers at once;
+            state arrays get shape (replicas, n_patients)
+
+        Returns
+        -------
+        np.ndarray
+            Initial beta measurement
+        """
+        self.replicas = replicas
+        shape = (self.n_patients,) if replicas is None else (replicas, self.n_patients)
+        self.state_shape = shape
+
+        self.rng = np.random.default_rng(self.seed)
+        self.step_idx = 0
+        self.ou = np.zeros(self.n_patients, dtype=self.dtype)
+        self.beta = np.broadcast_to(self.beta0, shape).copy()
+
+        self.buffer_len = int(self.delay_steps.max()) + 1
+        self.stim_buffer = np.zeros(shape + (self.buffer_len,), dtype=self.dtype)
+        self.buffer_pos = 0
+        return self.measure()
+
+    def set_state(self, state: Dict[str, Any]):
+        """Restore a snapshot, including its replica layout"""
+        self.reset(replicas=state['replicas'])
+        super().set_state(state)
+
+    def get_state(self) -> Dict[str, Any]:
+        """Integrator, OU, delay-buffer and RNG state"""
+        return {'replicas': self.replicas, **super().get_state()}
+
+    @property
+    def natural_beta(self) -> np.ndarray:
+        """Unstimulated beta power of each patient at the current step"""
+        if self.drive is not None:
+            return self.beta0 * self.drive[self.step_idx % len(self.drive)]
+        return self.beta0 * np.maximum(1.0 + self.fluctuation * self.ou, 0.0)
+
+    def delayed_stimulation(self) -> np.ndarray:
+        """Stimulation that reaches tissue now, after each patient's delay"""
+        idx = (self.buffer_pos - self.delay_steps) % self.buffer_len
+        idx = np.broadcast_to(idx, self.state_shape)
+        return np.take_along_axis(self.stim_buffer, idx[..., None], axis=-1)[..., 0]
+
+    def measure(self) -> np.ndarray:
+        """Current (noisy) beta measurement"""
+        if not np.any(self.measurement_noise):
+            return self.beta.copy()
+        noise = self._standard_normal()
+        return self.beta + self.measurement_noise * self.beta0 * noise
+
+    def step(self, stimulation: ArrayLike) -> np.ndarray:
+        """
+        Apply stimulation to every patient and advance one time step
+
+        Parameters
+        ----------
+        stimulation : float or np.ndarray
+            Stimulation amplitude in mA, broadcastable to the state shape
+
+        Returns
+        -------
+        np.ndarray
+            Beta measurement after the step
+        """
+        self.buffer_pos = (self.buffer_pos + 1) % self.buffer_len
+        self.stim_buffer[..., self.buffer_pos] = stimulation
+        u = self.delayed_stimulation()
+
+        if self.drive is None:
+            decay = self.dt / self.fluctuation_tau
+            noise = self._standard_normal()
+            self.ou += -decay * self.ou + np.sqrt(2 * decay) * noise
+
+        suppression = np.maximum(1.0 - self.stim_gain * u, self.floor)
+        beta_ss = self.natural_beta * suppression
+        self.beta += self.dt / self.tau * (beta_ss - self.beta)
+        self.step_idx += 1
+
+        return self.measure()
+
+    def __repr__(self) -> str:
+        return (f"PatientPopulation(n_patients={self.n_patients}, "
+                f"beta0={np.mean(self.beta0):.3f}, stim_gain={np.mean(self.stim_gain):.3f})")
@@ -0,0 +1,120 @@
+"""
+LSTM State Estimator
+Neural network for denoising beta power measurements
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+
+class BetaPowerLSTM(nn.Module):
+    """
+    LSTM neural network for denoising beta power measurements
+
+    Parameters
+    ----------
+    input_size : int
+        Features per time step
+    hidden_size : int
+        LSTM hidden units
+    num_layers : int
+        Stacked LSTM layers
+    dropout : float
+        Dropout between LSTM layers
+    """
+
+    def __init__(self, input_size: int = 1, hidden_size: int = 32,
+                 num_layers: int = 2, dropout: float = 0.2):
+        super(BetaPowerLSTM, self).__init__()
+
+        self.hidden_size = hidden_size
+        self.num_layers = num_layers
+
+        self.lstm = nn.LSTM(
+            input_size=input_size,
+            hidden_size=hidden_size,
+            num_layers=num_layers,
+            dropout=dropout,
+            batch_first=True
+        )
+        self.fc = nn.Linear(hidden_size, 1)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        # x shape: (batch, seq_len, input_size)
+        lstm_out, _ = self.lstm(x)
+        last_output = lstm_out[:, -1, :]
+        return self.fc(last_output)
+
+
+def load_lstm(path: str, **kwargs) -> BetaPowerLSTM:
+    """
+    Load a trained model saved with ``torch.save(model.state_dict(), path)``
+
+    Parameters
+    ----------
+    path : str
+        State-dict file (e.g. data/simulation_results/lstm_model.pth)
+    **kwargs
+        Architecture arguments for :class:`BetaPowerLSTM`
+    """
+    model = BetaPowerLSTM(**kwargs)
+    model.load_state_dict(torch.load(path, map_location='cpu'))
+    model.eval()
+    return model
+
+
+def generate_noisy_data(clean_signal: np.ndarray, noise_level: float = 0.3,
+                        n_samples: int = 5,
+                        rng: Optional[np.random.Generator] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Generate multiple noisy versions of clean signal
+
+    Parameters
+    ----------
+    clean_signal : np.ndarray
+        Clean beta power signal
+    noise_level : float
+        Standard deviation of noise (fraction of signal std)
+    n_samples : int
+        Number of noisy versions to generate
+    rng : np.random.Generator, optional
+        Random generator (default: global numpy state, as in the notebook)
+
+    Returns
+    -------
+    tuple
+        (noisy_data, clean_data) arrays of shape (n_samples, time_steps)
+    """
+    noise_std = noise_level * np.std(clean_signal)
+    randn = rng.standard_normal if rng is not None else np.random.randn
+    noise = np.stack([randn(len(clean_signal)) for _ in range(n_samples)]) * noise_std
+    clean = np.tile(clean_signal, (n_samples, 1))
+    return clean + noise, clean
+
+
+def create_sequences(noisy_data: np.ndarray, clean_data: np.ndarray,
+                     seq_length: int = 50) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Create sliding window sequences for LSTM
+
+    Parameters
+    ----------
+    noisy_data : np.ndarray
+        Noisy input signals (n_samples, time_steps)
+    clean_data : np.ndarray
+        Clean target signals (n_samples, time_steps)
+    seq_length : int
+        Length of each sequence
+
+    Returns
+    -------
+    tuple
+        X of shape (n_sequences, seq_length, 1) and y of shape (n_sequences, 1)
+    """
+    windows = np.lib.stride_tricks.sliding_window_view(noisy_data, seq_length, axis=1)
+    X = windows[:, :-1].reshape(-1, seq_length, 1)
+    y = clean_data[:, seq_length:].reshape(-1, 1)
+    return X, y
@@ -0,0 +1,330 @@
+"""
+Online System Identification
+Recursive least-squares estimation of the beta response to stimulation
+"""
+
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from src.precision import get_dtype
+from src.simulation.checkpoint import Stateful
+
+
+class RecursiveLeastSquares(Stateful):
+    """
+    Recursive least squares with exponential forgetting
+
+    Tracks theta minimizing sum_k lambda^(n-k) (y_k - phi_k' theta)^2 with a
+    fixed O(p^2) cost per sample, independent of how many samples were seen.
+
+    Parameters
+    ----------
+    n_params : int
+        Number of regression parameters p
+    forgetting : float
+        Forgetting factor lambda in (0, 1]; 1 weights all samples equally
+    delta : float
+        Initial covariance scale (large = weak prior on theta0)
+    theta0 : np.ndarray, optional
+        Initial parameter estimate
+    """
+
+    STATE_ATTRS = ('theta', 'P', 'n_updates')
+
+    def __init__(self, n_params: int, forgetting: float = 0.999,
+                 delta: float = 1e3, theta0: Optional[np.ndarray] = None):
+        if not 0.0 < forgetting <= 1.0:
+            raise ValueError("forgetting must be in (0, 1]")
+
+        self.n_params = n_params
+        self.forgetting = forgetting
+        self.delta = delta
+        self.dtype = get_dtype()
+        self.theta0 = np.zeros(n_params, dtype=self.dtype) if theta0 is None \
+            else np.asarray(theta0, dtype=self.dtype)
+        self.reset()
+
+    def reset(self):
+        """Reset estimate and covariance"""
+        self.theta = self.theta0.copy()
+        self.P = np.eye(self.n_params, dtype=self.dtype) * self.delta
+        self.n_updates = 0
+
+    def update(self, phi: np.ndarray, y: float) -> float:
+        """
+        Incorporate one observation
+
+        Parameters
+        ----------
+        phi : np.ndarray
+            Regressor vector of length p
+        y : float
+            Observed output
+
+        Returns
+        -------
+        float
+            A-priori prediction error y - phi' theta
+        """
+        Pphi = self.P @ phi
+        gain = Pphi / (self.forgetting + phi @ Pphi)
+        error = y - phi @ self.theta
+
+        self.theta = self.theta + gain * error
+        self.P = (self.P - np.outer(gain, Pphi)) / self.forgetting
+        self.n_updates += 1
+        return error
+
+    def __repr__(self) -> str:
+        return f"RecursiveLeastSquares(n_params={self.n_params}, forgetting={self.forgetting})"
+
+
+def arx_to_state_space(theta: np.ndarray, dt: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Convert ARX(2,1) coefficients to state-space models
+
+    The model y_k = a1 y_{k-1} + a2 y_{k-2} + b u_{k-d} + c is written in
+    discrete state z = [y_k, y_{k-1}]. Its transfer function
+    b z / (z^2 - a1 z - a2) is mapped to continuous time with the inverse
+    bilinear (Tustin) transform and realized in companion form in the
+    coordinates used by the LQR design and measured by
+    :class:`~src.controllers.lqr_controller.LQRController`,
+    x = [beta_error, d(beta_error)/dt]. The continuous poles and static gain
+    are exact; the numerator zeros at s = +-2/dt that Tustin introduces lie
+    at the Nyquist rate and are dropped so that x2 stays dx1/dt.
+
+    Parameters
+    ----------
+    theta : np.ndarray
+        [a1, a2, b, c]
+    dt : float
+        Sampling interval in seconds
+
+    Returns
+    -------
+    tuple
+        (Ad, Bd, A, B) discrete matrices in z and continuous matrices in x
+    """
+    a1, a2, b = theta[0], theta[1], theta[2]
+    Ad = np.array([[a1, a2], [1.0, 0.0]])
+    Bd = np.array([[b], [0.0]])
+
+    # z = (1 + s h) / (1 - s h) turns the denominator into c2 s^2 + c1 s + c0
+    h = 0.5 * dt
+    c2 = h * h * (1.0 + a1 - a2)
+    c1 = 2.0 * h * (1.0 + a2)
+    c0 = 1.0 - a1 - a2
+
+    A = np.array([[0.0, 1.0], [-c0 / c2, -c1 / c2]])
+    B = np.array([[0.0], [b / c2]])
+    return Ad, Bd, A, B
+
+
+class OnlineBetaIdentifier(Stateful):
+    """
+    Streaming identification of the beta response to stimulation
+
+    Fits the ARX(2,1) model
+
+        beta_k = a1 beta_{k-1} + a2 beta_{k-2} + b stim_{k-d} + c
+
+    with :class:`RecursiveLeastSquares` from (stimulation, beta) pairs and
+    converts it to A/B matrices for :meth:`LQRController.update_model`, in
+    place of the hard-coded omega, zeta and k_stim.
+
+    Parameters
+    ----------
+    dt : float
+        Sampling interval in seconds
+    forgetting : float
+        RLS forgetting factor (0.999 at 1 kHz ~ 1 s memory)
+    delay_steps : int
+        Samples between a stimulation command and its effect on beta
+    delta : float
+        Initial RLS covariance scale
+    min_excitation : float
+        Smallest stimulation variance (mA^2, with the same forgetting as
+        RLS) for which :meth:`check_model` trusts the estimate
+    """
+
+    N_PARAMS = 4
+    STATE_ATTRS = ('rls', 'beta_hist', 'stim_hist', 'n_samples', 'last_error',
+                   'stim_mean', 'stim_var')
+
+    def __init__(self, dt: float = 0.001, forgetting: float = 0.999,
+                 delay_steps: int = 1, delta: float = 1e3,
+                 min_excitation: float = 1e-2):
+        if delay_steps < 1:
+            raise ValueError("delay_steps must be at least 1")
+
+        self.dt = dt
+        self.delay_steps = delay_steps
+        self.min_excitation = min_excitation
+        self.rls = RecursiveLeastSquares(self.N_PARAMS, forgetting=forgetting,
+                                         delta=delta)
+        self.reset()
+
+    def reset(self):
+        """Forget all data"""
+        self.rls.reset()
+        self.beta_hist = deque([0.0, 0.0], maxlen=2)
+        self.stim_hist = deque([0.0] * self.delay_steps, maxlen=self.delay_steps)
+        self.n_samples = 0
+        self.last_error = 0.0
+        self.stim_mean = 0.0
+        self.stim_var = 0.0
+
+    def update(self, stimulation: float, beta: float) -> np.ndarray:
+        """
+        Add one (stimulation, beta) pair
+
+        ``stimulation`` is the command issued at this step and ``beta`` the
+        measurement taken at this step, as in the closed-loop simulation.
+
+        Returns
+        -------
+        np.ndarray
+            Current estimate [a1, a2, b, c]
+        """
+        if self.n_samples >= 2:
+            phi = np.array([self.beta_hist[0], self.beta_hist[1],
+                            self.stim_hist[0], 1.0], dtype=self.rls.dtype)
+            self.last_error = self.rls.update(phi, beta)
+
+        # Exponentially weighted stimulation variance, same memory as RLS
+        weight = max(1.0 - self.rls.forgetting, 1.0 / (self.n_samples + 1))
+        delta = stimulation - self.stim_mean
+        self.stim_mean += weight * delta
+        self.stim_var = (1.0 - weight) * (self.stim_var + weight * delta * delta)
+
+        self.beta_hist.appendleft(beta)
+        self.stim_hist.append(stimulation)
+        self.n_samples += 1
+        return self.rls.theta
+
+    @property
+    def theta(self) -> np.ndarray:
+        """Current ARX estimate [a1, a2, b, c]"""
+        return self.rls.theta
+
+    def state_space(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Continuous (A, B) in LQR coordinates [beta_error, d(beta_error)/dt]
+        """
+        _, _, A, B = arx_to_state_space(self.theta, self.dt)
+        return A, B
+
+    def check_model(self) -> Optional[str]:
+        """
+        Reason the current estimate is unfit for LQR design, or None
+
+        Rejects estimates fitted without enough stimulation variation, ARX
+        poles outside the unit circle, a bilinear map with non-positive
+        leading coefficient (1 + a1 - a2 <= 0), and a static gain that says
+        stimulation raises beta. Callers keep their previous model when a
+        reason is returned.
+        """
+        a1, a2, b = (float(v) for v in self.theta[:3])
+        if self.stim_var < self.min_excitation:
+            return "insufficient excitation"
+        if not np.all(np.isfinite(self.theta)):
+            return "non-finite estimate"
+        if np.any(np.abs(np.roots([1.0, -a1, -a2])) >= 1.0):
+            return "unstable poles"
+        if 1.0 + a1 - a2 <= 0.0:
+            return "non-positive c2"
+        if b >= 0.0:
+            return "stimulation does not reduce beta"
+        return None
+
+    def discrete_state_space(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Discrete (Ad, Bd) in state z = [beta_k, beta_{k-1}]"""
+        Ad, Bd, _, _ = arx_to_state_space(self.theta, self.dt)
+        return Ad, Bd
+
+    def physical_parameters(self) -> Dict[str, float]:
+        """
+        Equivalent omega, zeta and k_stim of the damped-oscillator model
+
+        NaN where the identified dynamics are not oscillatory.
+        """
+        A, B = self.state_space()
+        omega_sq = -A[1, 0]
+        omega = np.sqrt(omega_sq) if omega_sq > 0 else np.nan
+        return {
+            'omega': float(omega),
+            'zeta': float(-A[1, 1] / (2 * omega)) if omega_sq > 0 else np.nan,
+            'k_stim': float(-B[1, 0]),
+            'static_gain': float(self.theta[2] / (1 - self.theta[0] - self.theta[1])),
+        }
+
+    def __repr__(self) -> str:
+        return f"OnlineBetaIdentifier(theta={np.round(self.theta, 4).tolist()})"
+
+
+def identify_sessions(stimulation: np.ndarray, beta: np.ndarray,
+                      delay_steps: int = 1, forgetting: float = 1.0,
+                      ridge: float = 1e-9,
+                      chunk_size: int = 65536) -> Dict[str, np.ndarray]:
+    """
+    Batch ARX identification of many recorded sessions at once
+
+    Solves the (exponentially weighted) least-squares problem that RLS
+    tracks online, for every session in one vectorized pass. Normal
+    equations are accumulated chunk by chunk, so memory is bounded by
+    ``n_sessions * chunk_size``.
+
+    Parameters
+    ----------
+    stimulation, beta : np.ndarray
+        Arrays of shape (n_sessions, n_samples)
+    delay_steps : int
+        Stimulation-to-beta delay in samples
+    forgetting : float
+        Weight lambda^(n-1-k) of sample k; 1.0 gives ordinary least squares
+    ridge : float
+        Tikhonov regularization added to the normal equations
+    chunk_size : int
+        Samples per accumulation chunk
+
+    Returns
+    -------
+    dict
+        theta (n_sessions, 4) and residual_std (n_sessions,)
+    """
+    stimulation = np.atleast_2d(np.asarray(stimulation, dtype=float))
+    beta = np.atleast_2d(np.asarray(beta, dtype=float))
+    if stimulation.shape != beta.shape:
+        raise ValueError("stimulation and beta must have the same shape")
+
+    n_sessions, n_samples = beta.shape
+    start = max(2, delay_steps)
+    p = OnlineBetaIdentifier.N_PARAMS
+
+    gram = np.zeros((n_sessions, p, p))
+    cross = np.zeros((n_sessions, p))
+    y_sq = np.zeros(n_sessions)
+    weight_sum = 0.0
+
+    for k0 in range(start, n_samples, chunk_size):
+        k = np.arange(k0, min(k0 + chunk_size, n_samples))
+        phi = np.stack([beta[:, k - 1], beta[:, k - 2],
+                        stimulation[:, k - delay_steps],
+                        np.ones((n_sessions, len(k)))], axis=-1)
+        y = beta[:, k]
+        w = forgetting ** (n_samples - 1 - k) if forgetting < 1.0 else np.ones(len(k))
+
+        gram += np.einsum('skp,k,skq->spq', phi, w, phi)
+        cross += np.einsum('skp,k,sk->sp', phi, w, y)
+        y_sq += (y * y) @ w
+        weight_sum += w.sum()
+
+    theta = np.linalg.solve(gram + ridge * np.eye(p), cross[..., None])[..., 0]
+    sse = y_sq - 2 * np.einsum('sp,sp->s', theta, cross) \
+        + np.einsum('sp,spq,sq->s', theta, gram, theta)
+    return {
+        'theta': theta,
+        'residual_std': np.sqrt(np.maximum(sse, 0.0) / max(weight_sum, 1.0)),
+    }
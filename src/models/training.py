@@ -0,0 +1,313 @@
+"""
+LSTM Training
+Multi-worker training of the beta estimator on data from training_data
+"""
+
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import BatchSampler, DataLoader, Dataset, RandomSampler, SequentialSampler
+
+from .lstm_estimator import BetaPowerLSTM
+from .training_data import generate_training_data  # noqa: F401
+
+
+class SequenceDataset(Dataset):
+    """
+    Sliding-window view over noisy/clean traces without materializing windows
+
+    :func:`~src.models.lstm_estimator.create_sequences` copies every window,
+    which costs ``seq_length`` times the trace memory. Here a window is
+    gathered only when its batch is requested. Indexing takes a list of
+    indices and returns the whole batch, so use the dataset with
+    ``DataLoader(dataset, sampler=BatchSampler(...), batch_size=None)``.
+
+    Parameters
+    ----------
+    noisy_data : np.ndarray
+        Noisy input signals (n_samples, time_steps)
+    clean_data : np.ndarray
+        Clean target signals (n_samples, time_steps)
+    seq_length : int
+        Length of each sequence
+    """
+
+    def __init__(self, noisy_data: np.ndarray, clean_data: np.ndarray,
+                 seq_length: int = 50):
+        noisy_data = np.ascontiguousarray(noisy_data, dtype=np.float32)
+        self.clean = np.ascontiguousarray(clean_data, dtype=np.float32)
+        self.seq_length = seq_length
+        self.windows = np.lib.stride_tricks.sliding_window_view(
+            noisy_data, seq_length, axis=1)[:, :-1]
+        self.n_windows = self.windows.shape[1]
+
+    def __len__(self) -> int:
+        return self.windows.shape[0] * self.n_windows
+
+    def __getitem__(self, indices) -> Tuple[torch.Tensor, torch.Tensor]:
+        sample, start = np.divmod(np.asarray(indices), self.n_windows)
+        X = self.windows[sample, start][..., None]
+        y = self.clean[sample, start + self.seq_length][:, None]
+        return torch.from_numpy(X), torch.from_numpy(y)
+
+
+def _init_loader_worker(worker_id: int):
+    # Loader workers only gather windows; leave the cores to the training threads
+    torch.set_num_threads(1)
+
+
+def make_loader(dataset: SequenceDataset, batch_size: int = 64,
+                shuffle: bool = True, num_workers: int = 0,
+                prefetch_factor: int = 4, pin_memory: bool = False,
+                generator: Optional[torch.Generator] = None) -> DataLoader:
+    """
+    Batched, prefetching loader for a :class:`SequenceDataset`
+
+    Whole batches are sampled as index lists, so a worker produces one batch
+    per call instead of collating ``batch_size`` single windows.
+
+    Parameters
+    ----------
+    dataset : SequenceDataset
+        Windows to serve
+    batch_size : int
+        Sequences per batch
+    shuffle : bool
+        Random order (otherwise sequential)
+    num_workers : int
+        Loader processes (0 loads in the training process)
+    prefetch_factor : int
+        Batches prepared in advance by each worker
+    pin_memory : bool
+        Return page-locked tensors for asynchronous host-to-GPU copies
+    generator : torch.Generator, optional
+        Generator for the shuffle order
+
+    Returns
+    -------
+    DataLoader
+    """
+    base = RandomSampler(dataset, generator=generator) if shuffle else SequentialSampler(dataset)
+    kwargs = {}
+    if num_workers > 0:
+        kwargs = {'prefetch_factor': prefetch_factor, 'persistent_workers': True,
+                  'worker_init_fn': _init_loader_worker}
+    return DataLoader(dataset, sampler=BatchSampler(base, batch_size, drop_last=False),
+                      batch_size=None, num_workers=num_workers,
+                      pin_memory=pin_memory, **kwargs)
+
+
+def save_training_checkpoint(path: Union[str, Path], model: nn.Module,
+                             optimizer: torch.optim.Optimizer, epoch: int,
+                             history: Dict[str, List[float]],
+                             generator: torch.Generator):
+    """Write model, optimizer and loop state to ``path`` atomically"""
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    torch.save({
+        'model': model.state_dict(),
+        'optimizer': optimizer.state_dict(),
+        'epoch': epoch,
+        'history': history,
+        'generator': generator.get_state(),
+        'torch_rng': torch.get_rng_state(),
+    }, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def evaluate(model: nn.Module, loader: DataLoader,
+             device: Union[str, torch.device] = 'cpu') -> float:
+    """Mean MSE of ``model`` over all windows served by ``loader``"""
+    model.eval()
+    total = 0.0
+    count = 0
+    with torch.no_grad():
+        for batch_X, batch_y in loader:
+            batch_X = batch_X.to(device, non_blocking=True)
+            batch_y = batch_y.to(device, non_blocking=True)
+            total += nn.functional.mse_loss(model(batch_X), batch_y,
+                                            reduction='sum').item()
+            count += len(batch_y)
+    return total / max(count, 1)
+
+
+def train_lstm(noisy_data: np.ndarray, clean_data: np.ndarray,
+               model: Optional[BetaPowerLSTM] = None,
+               seq_length: int = 50,
+               epochs: int = 50,
+               batch_size: int = 64,
+               accumulation_steps: int = 1,
+               lr: float = 0.001,
+               val_fraction: float = 0.2,
+               num_workers: Optional[int] = None,
+               num_threads: Optional[int] = None,
+               prefetch_factor: int = 4,
+               device: Optional[str] = None,
+               checkpoint_dir: Optional[Union[str, Path]] = None,
+               checkpoint_every: int = 5,
+               resume: bool = False,
+               seed: int = 42,
+               verbose: bool = True) -> Tuple[BetaPowerLSTM, Dict[str, List[float]]]:
+    """
+    Train the LSTM beta estimator with the notebook 04 objective
+
+    Same model, MSE loss and Adam optimizer as the notebook, with:
+
+    - Validation on whole held-out patients (the last ``val_fraction`` of
+      the rows) instead of the tail of one long sequence array
+    - A :func:`make_loader` pipeline with ``num_workers`` loader processes,
+      prefetching, and pinned memory when training on CUDA
+    - ``torch.set_num_threads`` set to the cores not used by loader workers
+    - Gradient accumulation: the optimizer steps every ``accumulation_steps``
+      batches, giving an effective batch of ``batch_size * accumulation_steps``
+    - A checkpoint every ``checkpoint_every`` epochs in ``checkpoint_dir``
+      (``checkpoint.pt``) that ``resume=True`` continues from with the same
+      shuffle order, and the final weights in ``lstm_model.pth``, readable
+      by :func:`~src.models.lstm_estimator.load_lstm`
+
+    Parameters
+    ----------
+    noisy_data, clean_data : np.ndarray
+        Traces of shape (n_samples, time_steps), e.g. from
+        :func:`generate_training_data`
+    model : BetaPowerLSTM, optional
+        Model to train (default: ``BetaPowerLSTM()``)
+    seq_length : int
+        Measurements per input window
+    epochs : int
+        Training epochs
+    batch_size : int
+        Sequences per forward pass
+    accumulation_steps : int
+        Batches per optimizer step
+    lr : float
+        Adam learning rate
+    val_fraction : float
+        Fraction of traces held out for validation
+    num_workers : int, optional
+        Loader processes (default: a quarter of the cores)
+    num_threads : int, optional
+        Intra-op threads for training (default: the remaining cores)
+    prefetch_factor : int
+        Batches prepared in advance by each loader worker
+    device : str, optional
+        'cuda' or 'cpu' (default: CUDA if available)
+    checkpoint_dir : str or Path, optional
+        Directory for checkpoints and the final model
+    checkpoint_every : int
+        Epochs between checkpoints
+    resume : bool
+        Continue from ``checkpoint_dir/checkpoint.pt`` if it exists
+    seed : int
+        Seed for model initialization and shuffling
+    verbose : bool
+        Print progress every 10 epochs
+
+    Returns
+    -------
+    tuple
+        (model, history) with per-epoch 'train_loss', 'val_loss' and
+        'epoch_time' lists
+    """
+    if accumulation_steps < 1:
+        raise ValueError("accumulation_steps must be at least 1")
+
+    n_cores = os.cpu_count() or 1
+    if num_workers is None:
+        num_workers = n_cores // 4
+    torch.set_num_threads(num_threads or max(n_cores - num_workers, 1))
+
+    device = torch.device(device or ('cuda' if torch.cuda.is_available() else 'cpu'))
+    pin_memory = device.type == 'cuda'
+
+    torch.manual_seed(seed)
+    model = (model or BetaPowerLSTM()).to(device)
+    criterion = nn.MSELoss()
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    generator = torch.Generator().manual_seed(seed)
+
+    n_val = int(round(val_fraction * len(noisy_data)))
+    n_train = len(noisy_data) - n_val
+    if n_train < 1:
+        raise ValueError("val_fraction leaves no training traces")
+    train_set = SequenceDataset(noisy_data[:n_train], clean_data[:n_train], seq_length)
+    train_loader = make_loader(train_set, batch_size, shuffle=True,
+                               num_workers=num_workers, prefetch_factor=prefetch_factor,
+                               pin_memory=pin_memory, generator=generator)
+    val_loader = None
+    if n_val:
+        val_set = SequenceDataset(noisy_data[n_train:], clean_data[n_train:], seq_length)
+        val_loader = make_loader(val_set, batch_size * 16, shuffle=False,
+                                 num_workers=min(num_workers, 1),
+                                 prefetch_factor=prefetch_factor, pin_memory=pin_memory)
+
+    history: Dict[str, List[float]] = {'train_loss': [], 'val_loss': [], 'epoch_time': []}
+    start_epoch = 0
+    checkpoint_path = None
+    if checkpoint_dir is not None:
+        checkpoint_dir = Path(checkpoint_dir)
+        checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        checkpoint_path = checkpoint_dir / 'checkpoint.pt'
+        if resume and checkpoint_path.exists():
+            # RNG states must stay on the CPU; load_state_dict moves the rest
+            state = torch.load(checkpoint_path, map_location='cpu')
+            model.load_state_dict(state['model'])
+            optimizer.load_state_dict(state['optimizer'])
+            generator.set_state(state['generator'])
+            torch.set_rng_state(state['torch_rng'])
+            history = state['history']
+            start_epoch = state['epoch']
+
+    n_total = len(train_loader)
+    last_group = n_total - n_total % accumulation_steps
+
+    for epoch in range(start_epoch, epochs):
+        start = time.perf_counter()
+        model.train()
+        optimizer.zero_grad()
+        epoch_loss = 0.0
+        n_batches = 0
+
+        for batch_X, batch_y in train_loader:
+            batch_X = batch_X.to(device, non_blocking=pin_memory)
+            batch_y = batch_y.to(device, non_blocking=pin_memory)
+
+            loss = criterion(model(batch_X), batch_y)
+            # Average over the batches of this step; the last group may be short
+            group = accumulation_steps if n_batches < last_group else n_total - last_group
+            (loss / group).backward()
+            n_batches += 1
+            if n_batches % accumulation_steps == 0:
+                optimizer.step()
+                optimizer.zero_grad()
+            epoch_loss += loss.item()
+
+        if n_batches % accumulation_steps:
+            optimizer.step()
+            optimizer.zero_grad()
+
+        history['train_loss'].append(epoch_loss / max(n_batches, 1))
+        history['val_loss'].append(evaluate(model, val_loader, device)
+                                   if val_loader is not None else float('nan'))
+        history['epoch_time'].append(time.perf_counter() - start)
+
+        if verbose and (epoch + 1) % 10 == 0:
+            print(f"Epoch {epoch+1}/{epochs} | Train Loss: {history['train_loss'][-1]:.6f} "
+                  f"| Val Loss: {history['val_loss'][-1]:.6f} "
+                  f"| {history['epoch_time'][-1]:.1f} s")
+
+        if checkpoint_path is not None and ((epoch + 1) % checkpoint_every == 0
+                                            or epoch + 1 == epochs):
+            save_training_checkpoint(checkpoint_path, model, optimizer, epoch + 1,
+                                     history, generator)
+
+    model.eval()
+    if checkpoint_dir is not None:
+        torch.save(model.state_dict(), checkpoint_dir / 'lstm_model.pth')
+    return model, history
+
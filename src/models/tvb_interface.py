@@ -0,0 +1,81 @@
+"""
+TVB Interface
+Baseline Parkinsonian network simulation with The Virtual Brain
+"""
+
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from src.precision import as_float
+
+
+def simulate_baseline(duration_sec: float = 10.0,
+                      sampling_rate: float = 1000.0,
+                      coupling_strength: float = 0.0152,
+                      noise_sigma: float = 0.01,
+                      motor_regions: Sequence[int] = (0, 1, 2, 3, 4),
+                      seed: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Run the notebook 01 baseline: Generic2dOscillator on the default atlas
+
+    TVB is imported here rather than at module level because loading it
+    takes several seconds and only baseline runs need it.
+
+    Parameters
+    ----------
+    duration_sec : float
+        Simulated time in seconds
+    sampling_rate : float
+        Integration and monitor rate in Hz
+    coupling_strength : float
+        Linear coupling coefficient
+    noise_sigma : float
+        Additive noise strength of the Heun integrator
+    motor_regions : sequence of int
+        Regions averaged into the motor network signal
+    seed : int, optional
+        Noise seed
+
+    Returns
+    -------
+    dict
+        time (s) and motor_signal arrays in the current precision
+    """
+    try:
+        from tvb.simulator import coupling, integrators, models, monitors, noise, simulator
+        from tvb.datatypes.connectivity import Connectivity
+    except ImportError as e:
+        raise ImportError("Baseline simulation requires TVB: "
+                          "pip install tvb-library tvb-data") from e
+
+    dt_ms = 1000.0 / sampling_rate
+
+    oscillator = models.Generic2dOscillator(
+        a=np.array([-0.5]), b=np.array([-10.0]), c=np.array([0.0]),
+        d=np.array([0.02]), e=np.array([3.0]), f=np.array([1.0]),
+        g=np.array([0.0]), alpha=np.array([1.0]), beta=np.array([1.0]),
+        tau=np.array([1.0]),
+    )
+    additive = noise.Additive(nsig=np.array([noise_sigma]))
+    if seed is not None:
+        additive.noise_seed = seed
+
+    sim = simulator.Simulator(
+        model=oscillator,
+        connectivity=Connectivity.from_file(),
+        coupling=coupling.Linear(a=np.array([coupling_strength])),
+        integrator=integrators.HeunStochastic(dt=dt_ms, noise=additive),
+        monitors=[monitors.Raw()],
+        simulation_length=duration_sec * 1000.0,
+    )
+    sim.configure()
+    (time_raw, data_raw), = sim.run()
+
+    # TVB returns (time, state_vars, regions, modes)
+    neural_activity = data_raw[:, 0, :, 0]
+    regions = [r for r in motor_regions if r < neural_activity.shape[1]] or [0]
+    return {
+        'time': as_float(time_raw / 1000.0),
+        'motor_signal': as_float(neural_activity[:, regions].mean(axis=1)),
+    }
@@ -0,0 +1,66 @@
+"""
+Numerical Precision
+Global floating-point precision for simulation, signal processing and storage
+"""
+
+import os
+from contextlib import contextmanager
+from typing import Any, Iterator, Union
+
+import numpy as np
+
+
+PRECISIONS = {
+    'float64': np.float64,
+    'float32': np.float32,
+}
+
+_dtype = PRECISIONS[os.environ.get('DBS_PRECISION', 'float64')]
+
+
+def set_precision(precision: Union[str, type, np.dtype]):
+    """
+    Set the floating-point type used by newly created objects
+
+    Models, estimators, batch controllers and result stores read the
+    precision when they are constructed and keep all array state in it,
+    so precision should be chosen before building a pipeline. The default
+    is float64 or the ``DBS_PRECISION`` environment variable.
+
+    Parameters
+    ----------
+    precision : str or dtype
+        'float64' or 'float32'
+    """
+    global _dtype
+    name = np.dtype(precision).name
+    if name not in PRECISIONS:
+        raise ValueError(f"Unsupported precision: {name} (choose from {list(PRECISIONS)})")
+    _dtype = PRECISIONS[name]
+
+
+def get_dtype() -> type:
+    """Current real floating-point type"""
+    return _dtype
+
+
+def get_complex_dtype() -> type:
+    """Complex type matching :func:`get_dtype`"""
+    return np.complex64 if _dtype is np.float32 else np.complex128
+
+
+def as_float(value: Any, dtype: Any = None) -> np.ndarray:
+    """Array in the current (or given) precision, without copying if possible"""
+    return np.asarray(value, dtype=dtype or _dtype)
+
+
+@contextmanager
+def use_precision(value: Union[str, type, np.dtype]) -> Iterator[type]:
+    """Temporarily switch precision: ``with use_precision('float32'): ...``"""
+    previous = _dtype
+    set_precision(value)
+    try:
+        yield _dtype
+    finally:
+        set_precision(previous)
+
@@ -0,0 +1,382 @@
+"""
+DBS Simulation Command-Line Interface
+Headless baseline, closed-loop and ensemble runs driven by config.ini
+
+Heavy dependencies (TVB, torch, matplotlib, scipy) are imported only inside
+the code path that needs them, so a PID closed-loop run starts with little
+more than NumPy loaded.
+"""
+
+import argparse
+import configparser
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.precision import set_precision
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG: Dict[str, Dict[str, Any]] = {
+    'simulation': {
+        'duration': 10.0,
+        'sampling_rate': 1000,
+        'dt': 0.001,
+        'measurement_noise': 0.0,
+        'checkpoint_every': 60.0,
+        'precision': 'float64',
+    },
+    'controller': {
+        'type': 'PID',
+        'target_beta_power': 0.3,
+        # Event-triggered execution, thresholds relative to the target
+        'event_error_threshold': None,
+        'event_estimate_threshold': None,
+        'event_max_hold': 0.1,
+    },
+    'pid_params': {
+        'kp': 2.0,
+        'ki': 0.5,
+        'kd': 0.1,
+    },
+    'lqr_params': {
+        'q_error': 500.0,
+        'q_derror': 5.0,
+        'r': 0.05,
+    },
+    'ml_params': {
+        'model_path': 'data/simulation_results/lstm_model.pth',
+        'seq_length': 50,
+    },
+    'safety': {
+        'max_stimulation': 5.0,
+        'min_stimulation': 0.0,
+        'max_rate': None,
+    },
+    'ensemble': {
+        'n_patients': 256,
+        'job_size': 64,
+        'variability': 0.3,
+        'seed': 0,
+    },
+    'visualization': {
+        'save_figures': True,
+        'output_dir': 'data/simulation_results',
+    },
+}
+
+CONTROLLER_TYPES = ('PID', 'LQR', 'ML')
+
+
+def _parse_value(raw: str) -> Any:
+    """Convert a config string to bool, int, float or unquoted str"""
+    value = raw.strip().strip('"\'')
+    lowered = value.lower()
+    if lowered in ('true', 'yes', 'on'):
+        return True
+    if lowered in ('false', 'no', 'off'):
+        return False
+    if lowered in ('none', ''):
+        return None
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def load_config(path: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Read config.ini on top of the built-in defaults
+
+    Parameters
+    ----------
+    path : str, optional
+        Config file written by ``scripts/setup_project.py``; missing files
+        fall back to the defaults
+
+    Returns
+    -------
+    dict
+        section -> {key: value}
+    """
+    config = {section: dict(values) for section, values in DEFAULT_CONFIG.items()}
+    if path is None or not Path(path).exists():
+        return config
+
+    parser = configparser.ConfigParser(inline_comment_prefixes=('#',))
+    parser.read(path)
+    for section in parser.sections():
+        values = config.setdefault(section, {})
+        for key, raw in parser.items(section):
+            values[key] = _parse_value(raw)
+    return config
+
+
+def load_baseline(output_dir: Path) -> Dict[str, Any]:
+    """Open the baseline written by ``--mode baseline`` or notebook 01"""
+    from src.simulation.result_store import open_results
+
+    for candidate in (output_dir / 'baseline_data.npz', output_dir / 'baseline_data'):
+        if candidate.exists():
+            return open_results(candidate)
+    raise FileNotFoundError(
+        f"No baseline in {output_dir}; run with --mode baseline first"
+    )
+
+
+def safety_limits(config: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Controller keyword arguments from the [safety] section"""
+    safety = config['safety']
+    return {
+        'min_stim': float(safety['min_stimulation']),
+        'max_stim': float(safety['max_stimulation']),
+        'max_rate': safety.get('max_rate'),
+    }
+
+
+def _lqr_weights(config: Dict[str, Dict[str, Any]]):
+    lqr = config['lqr_params']
+    Q = np.diag([float(lqr['q_error']), float(lqr['q_derror'])])
+    R = np.array([[float(lqr['r'])]])
+    return Q, R
+
+
+def build_controller(config: Dict[str, Dict[str, Any]], dt: float):
+    """Single-patient controller selected by [controller] type"""
+    kind = str(config['controller']['type']).upper()
+    limits = safety_limits(config)
+
+    if kind == 'PID':
+        from src.controllers.pid_controller import PIDController
+
+        pid = config['pid_params']
+        return PIDController(kp=float(pid['kp']), ki=float(pid['ki']),
+                             kd=float(pid['kd']), dt=dt, **limits)
+
+    if kind in ('LQR', 'ML'):
+        from src.controllers.lqr_controller import LQRController
+
+        Q, R = _lqr_weights(config)
+        lqr = LQRController.from_weights(Q, R, dt=dt, **limits)
+        if kind == 'LQR':
+            return lqr
+
+        try:
+            from src.controllers.ml_controller import MLEnhancedController
+            from src.models.lstm_estimator import load_lstm
+        except ImportError as e:
+            raise ImportError("The ML controller requires PyTorch: "
+                              "pip install torch") from e
+
+        ml = config['ml_params']
+        model = load_lstm(ml['model_path'])
+        return MLEnhancedController(lqr.K, model, seq_length=int(ml['seq_length']),
+                                    dt=dt, Q=Q, R=R, **limits)
+
+    raise ValueError(f"Controller type {kind!r} is not available from the CLI "
+                     f"(choose from {', '.join(CONTROLLER_TYPES)})")
+
+
+def build_batch_controller_factory(config: Dict[str, Dict[str, Any]]):
+    """Factory for the vectorized controller used by ensemble runs"""
+    kind = str(config['controller']['type']).upper()
+    limits = safety_limits(config)
+
+    if kind == 'PID':
+        from src.controllers.pid_controller import BatchPIDController
+
+        pid = config['pid_params']
+        gains = [float(pid['kp'])], [float(pid['ki'])], [float(pid['kd'])]
+        return lambda dt: BatchPIDController(*gains, dt=dt, **limits)
+
+    if kind == 'LQR':
+        from src.controllers.lqr_controller import (BatchLQRController,
+                                                    beta_state_space, design_lqr)
+
+        Q, R = _lqr_weights(config)
+        K, _ = design_lqr(*beta_state_space(), Q, R)
+        return lambda dt: BatchLQRController(K, dt=dt, **limits)
+
+    raise ValueError(f"Ensemble runs support PID and LQR, not {kind!r}")
+
+
+def run_baseline(config: Dict[str, Dict[str, Any]], output_dir: Path,
+                 seed: Optional[int] = None) -> Path:
+    """Simulate the open-loop network with TVB and save baseline_data.npz"""
+    from src.models.tvb_interface import simulate_baseline
+    from src.signal_processing.bandpower_estimator import offline_beta_power
+
+    sim = config['simulation']
+    fs = float(sim['sampling_rate'])
+    baseline = simulate_baseline(duration_sec=float(sim['duration']),
+                                 sampling_rate=fs, seed=seed)
+    beta_power = offline_beta_power(baseline['motor_signal'], fs=fs)
+
+    path = output_dir / 'baseline_data.npz'
+    dtype = beta_power.dtype
+    np.savez(path, time=baseline['time'], motor_signal=baseline['motor_signal'],
+             beta_power=beta_power, sampling_rate=fs,
+             mean_beta_power=np.mean(beta_power, dtype=np.float64).astype(dtype),
+             std_beta_power=np.std(beta_power, dtype=np.float64).astype(dtype))
+    logger.info("Baseline: mean beta power %.4f -> %s", np.mean(beta_power), path)
+    return path
+
+
+def run_closed_loop_job(config: Dict[str, Dict[str, Any]], output_dir: Path,
+                        seed: Optional[int] = None, plot: bool = False,
+                        resume: bool = False) -> Dict[str, Any]:
+    """Closed-loop run of one controller on the recorded baseline"""
+    from src.models.brain_dynamics import SimpleBrainModel
+    from src.simulation.closed_loop import compute_metrics, run_closed_loop_resumable
+    from src.simulation.result_store import ResultStore
+
+    sim = config['simulation']
+    dt = float(sim['dt'])
+    duration = float(sim['duration'])
+    n_steps = int(duration / dt)
+
+    baseline = load_baseline(output_dir)
+    mean_beta = float(baseline['mean_beta_power'])
+    target = float(config['controller']['target_beta_power']) * mean_beta
+
+    # Longer runs loop the recorded baseline instead of holding its last value
+    drive = np.resize(np.asarray(baseline['beta_power']), n_steps)
+    brain = SimpleBrainModel(drive, dt=dt)
+    controller = build_controller(config, dt)
+
+    ctrl = config['controller']
+    thresholds = [ctrl.get('event_error_threshold'), ctrl.get('event_estimate_threshold')]
+    if any(t is not None for t in thresholds):
+        error_thr, estimate_thr = (None if t is None else float(t) * target
+                                   for t in thresholds)
+        controller.set_event_trigger(error_threshold=error_thr,
+                                     estimate_threshold=estimate_thr,
+                                     max_hold_time=float(ctrl['event_max_hold']))
+
+    noise_std = float(sim.get('measurement_noise') or 0.0) * np.std(drive)
+    kind = str(config['controller']['type']).lower()
+    store_path = output_dir / f'{kind}_results'
+    time_vec, beta, stim = run_closed_loop_resumable(
+        controller, brain, target, store_path, duration_sec=duration, dt=dt,
+        measurement_noise=noise_std, seed=seed,
+        checkpoint_every_sec=float(sim['checkpoint_every']), resume=resume,
+    )
+    metrics = compute_metrics(time_vec, beta, stim, mean_beta, target)
+    if controller.event_trigger is not None:
+        metrics['event_trigger'] = controller.get_trigger_stats()
+
+    store = ResultStore(store_path, mode='w')
+    store.write_summary(controller=kind.upper(), target=target, dt=dt,
+                        params=controller.get_params(), **metrics)
+
+    if plot:
+        import matplotlib
+        matplotlib.use('Agg')
+        from src.visualization.lod_plotting import plot_controller_comparison
+
+        runs = [{'label': kind.upper(), 'path': store.path,
+                 'beta_key': 'beta_power', 'color': 'b'}]
+        baseline_path = output_dir / 'baseline_data.npz'
+        if not baseline_path.exists():
+            baseline_path = output_dir / 'baseline_data'
+        plot_controller_comparison(runs, baseline_path, target=target,
+                                   save_path=output_dir / f'{kind}_results.png',
+                                   max_stim=safety_limits(config)['max_stim'])
+    return metrics
+
+
+def run_ensemble_job(config: Dict[str, Dict[str, Any]], output_dir: Path,
+                     seed: Optional[int] = None,
+                     resume: bool = False) -> Dict[str, Any]:
+    """Vectorized closed-loop evaluation over a virtual patient cohort"""
+    from src.simulation.ensemble import run_ensemble
+
+    ensemble = config['ensemble']
+    sim = config['simulation']
+    return run_ensemble(build_batch_controller_factory(config),
+                        n_patients=int(ensemble['n_patients']),
+                        output_dir=output_dir / 'ensemble',
+                        job_size=int(ensemble['job_size']),
+                        duration_sec=float(sim['duration']),
+                        target_ratio=float(config['controller']['target_beta_power']),
+                        variability=float(ensemble['variability']),
+                        seed=int(ensemble['seed'] if seed is None else seed),
+                        resume=resume,
+                        dt=float(sim['dt']))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='run-dbs-simulation',
+        description='Run adaptive DBS simulations without the notebooks',
+    )
+    parser.add_argument('--config', default='config.ini',
+                        help='configuration file (default: %(default)s)')
+    parser.add_argument('--mode', choices=('baseline', 'closed-loop', 'ensemble'),
+                        default='closed-loop', help='job to run (default: %(default)s)')
+    parser.add_argument('--controller', choices=CONTROLLER_TYPES, type=str.upper,
+                        help='override [controller] type')
+    parser.add_argument('--duration', type=float, help='override [simulation] duration (s)')
+    parser.add_argument('--output-dir', help='override [visualization] output_dir')
+    parser.add_argument('--n-patients', type=int, help='override [ensemble] n_patients')
+    parser.add_argument('--seed', type=int, help='random seed')
+    parser.add_argument('--precision', choices=('float64', 'float32'),
+                        help='override [simulation] precision')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue from the last checkpoint / finished ensemble jobs')
+    parser.add_argument('--plot', action='store_true',
+                        help='save a comparison figure (closed-loop mode)')
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Entry point of ``run-dbs-simulation``"""
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    config = load_config(args.config)
+
+    if args.controller:
+        config['controller']['type'] = args.controller
+    if args.duration is not None:
+        config['simulation']['duration'] = args.duration
+    if args.n_patients is not None:
+        config['ensemble']['n_patients'] = args.n_patients
+    if args.precision:
+        config['simulation']['precision'] = args.precision
+
+    output_dir = Path(args.output_dir or config['visualization']['output_dir'])
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    start = time.perf_counter()
+    try:
+        set_precision(config['simulation']['precision'])
+        if args.mode == 'baseline':
+            run_baseline(config, output_dir, seed=args.seed)
+            result = None
+        elif args.mode == 'closed-loop':
+            result = run_closed_loop_job(config, output_dir, seed=args.seed,
+                                         plot=args.plot, resume=args.resume)
+        else:
+            result = run_ensemble_job(config, output_dir, seed=args.seed,
+                                      resume=args.resume)
+    except (ValueError, FileNotFoundError, ImportError) as e:
+        logger.error("error: %s", e)
+        return 1
+
+    if result is not None:
+        # The metrics are the command's output, not a log message
+        sys.stdout.write(json.dumps(result, indent=2) + '\n')
+    logger.info("Finished %s in %.2f s", args.mode, time.perf_counter() - start)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
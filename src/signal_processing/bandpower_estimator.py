@@ -0,0 +1,560 @@
+"""
+Band Power Estimators
+Streaming beta-band (13-30 Hz) power estimation for closed-loop control
+"""
+
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from scipy import signal
+
+from src.precision import get_complex_dtype, get_dtype
+from src.simulation.checkpoint import Stateful
+
+
+def offline_beta_power(x: np.ndarray, fs: float = 1000.0,
+                       band: Tuple[float, float] = (13.0, 30.0),
+                       smooth_sec: float = 0.5) -> np.ndarray:
+    """
+    Non-causal beta power as computed in notebook 01
+
+    4th-order Butterworth bandpass (filtfilt), squared Hilbert envelope and
+    a centered moving average. Output is in the current precision; below
+    float64 the filter runs as second-order sections, since the 8th-order
+    transfer-function form is unstable in float32.
+    """
+    dtype = get_dtype()
+    x = np.asarray(x, dtype=dtype)
+    nyquist = fs / 2
+    Wn = [band[0] / nyquist, band[1] / nyquist]
+    if dtype is np.float64:
+        b, a = signal.butter(4, Wn, btype='band')
+        beta_filtered = signal.filtfilt(b, a, x)
+    else:
+        sos = signal.butter(4, Wn, btype='band', output='sos').astype(dtype)
+        beta_filtered = signal.sosfiltfilt(sos, x)
+    power = np.abs(signal.hilbert(beta_filtered)) ** 2
+    window_size = int(smooth_sec * fs)
+    kernel = np.full(window_size, 1.0 / window_size, dtype=dtype)
+    return np.convolve(power, kernel, mode='same')
+
+
+class BandPowerEstimator(Stateful, ABC):
+    """
+    Abstract base class for streaming band power estimators
+
+    All estimators must implement:
+    - process(): Consume a chunk of samples, return power per sample
+    - reset(): Clear filter state
+    - ops_per_sample: Multiplications per input sample (embedded cost)
+
+    Filter state is listed in ``STATE_ATTRS`` for get_state()/set_state().
+    Coefficients and state use the precision set by
+    :func:`src.precision.set_precision` when the estimator is created.
+
+    Estimates are scaled like the squared Hilbert envelope, i.e. a sinusoid
+    of amplitude A inside the band gives power A**2.
+
+    Parameters
+    ----------
+    fs : float
+        Sampling rate in Hz
+    band : tuple
+        (low, high) band edges in Hz
+    """
+
+    STATE_ATTRS = ('power',)
+
+    def __init__(self, fs: float = 1000.0,
+                 band: Tuple[float, float] = (13.0, 30.0)):
+        self.fs = fs
+        self.band = band
+        self.dtype = get_dtype()
+        self.power = 0.0
+
+    @abstractmethod
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Consume a chunk of samples
+
+        Parameters
+        ----------
+        samples : np.ndarray
+            New raw samples
+
+        Returns
+        -------
+        np.ndarray
+            Band power estimate after each sample
+        """
+        pass
+
+    @abstractmethod
+    def reset(self):
+        """Reset estimator internal state"""
+        pass
+
+    @property
+    @abstractmethod
+    def ops_per_sample(self) -> float:
+        """Approximate multiplications per input sample"""
+        pass
+
+    def update(self, sample: float) -> float:
+        """
+        Consume one sample
+
+        Returns
+        -------
+        float
+            Current band power estimate
+        """
+        return float(self.process(np.array([sample], dtype=self.dtype))[-1])
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(fs={self.fs}, band={self.band})"
+
+
+class ButterworthHilbertEstimator(BandPowerEstimator):
+    """
+    Causal version of the notebook Butterworth + Hilbert estimator
+
+    Bandpass (SOS, filter state carried between chunks), FIR Hilbert
+    transformer for the analytic signal, squared envelope and a trailing
+    moving average.
+
+    Parameters
+    ----------
+    fs : float
+        Sampling rate in Hz
+    band : tuple
+        (low, high) band edges in Hz
+    order : int
+        Butterworth order (per band edge, as in ``signal.butter``)
+    hilbert_taps : int
+        Odd length of the FIR Hilbert transformer
+    smooth_sec : float
+        Moving-average window in seconds
+    """
+
+    STATE_ATTRS = ('sos_zi', 'hilbert_zi', 'delay_line', 'power_history',
+                   'running_sum', 'power')
+
+    def __init__(self, fs: float = 1000.0,
+                 band: Tuple[float, float] = (13.0, 30.0),
+                 order: int = 4, hilbert_taps: int = 65,
+                 smooth_sec: float = 0.5):
+        super().__init__(fs=fs, band=band)
+        if hilbert_taps % 2 == 0:
+            raise ValueError("hilbert_taps must be odd")
+
+        self.sos = signal.butter(order, band, btype='band', fs=fs,
+                                 output='sos').astype(self.dtype)
+
+        # Windowed ideal Hilbert transformer: h[n] = 2 / (pi n) for odd n
+        n = np.arange(hilbert_taps) - hilbert_taps // 2
+        h = np.zeros(hilbert_taps)
+        odd = n % 2 != 0
+        h[odd] = 2.0 / (np.pi * n[odd])
+        self.hilbert = (h * np.hamming(hilbert_taps)).astype(self.dtype)
+        self.hilbert_delay = hilbert_taps // 2
+
+        self.window = max(int(smooth_sec * fs), 1)
+        self.reset()
+
+    def reset(self):
+        """Reset filter, Hilbert and averaging state"""
+        self.sos_zi = np.zeros((self.sos.shape[0], 2), dtype=self.dtype)
+        self.hilbert_zi = np.zeros(len(self.hilbert) - 1, dtype=self.dtype)
+        self.delay_line = np.zeros(self.hilbert_delay, dtype=self.dtype)
+        self.power_history = np.zeros(self.window, dtype=self.dtype)
+        self.running_sum = 0.0
+        self.power = 0.0
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        samples = np.asarray(samples, dtype=self.dtype)
+        if len(samples) == 0:
+            return np.empty(0, dtype=self.dtype)
+
+        filtered, self.sos_zi = signal.sosfilt(self.sos, samples, zi=self.sos_zi)
+        imag, self.hilbert_zi = signal.lfilter(self.hilbert, self.dtype(1.0), filtered,
+                                               zi=self.hilbert_zi)
+
+        delayed = np.concatenate([self.delay_line, filtered])
+        real = delayed[:len(filtered)]
+        self.delay_line = delayed[len(filtered):]
+
+        inst_power = real * real + imag * imag
+
+        # Trailing moving average over the last `window` samples
+        history = np.concatenate([self.power_history, inst_power])
+        csum = np.cumsum(history[self.window:] - history[:-self.window])
+        smoothed = (self.running_sum + csum) / self.window
+        self.running_sum += csum[-1]
+        self.power_history = history[-self.window:]
+
+        self.power = float(smoothed[-1])
+        return smoothed
+
+    @property
+    def ops_per_sample(self) -> float:
+        return 5 * self.sos.shape[0] + np.count_nonzero(self.hilbert) + 2
+
+
+class SlidingDFTEstimator(BandPowerEstimator):
+    """
+    Sliding DFT over the beta bins
+
+    Keeps the DFT of the last N samples for every bin inside the band and
+    updates it with X_k <- e^{j 2 pi k / N} (X_k + x[n] - x[n-N]), O(bins)
+    per sample. The undamped recursion accumulates rounding error (notably
+    in complex64, where the twiddles are not exactly unit modulus), so X is
+    recomputed exactly from the sample history once every N samples, which
+    keeps the amortized cost O(bins). An optional Hann window is applied in
+    the frequency domain from the two neighbouring bins.
+
+    Parameters
+    ----------
+    fs : float
+        Sampling rate in Hz
+    band : tuple
+        (low, high) band edges in Hz
+    window_sec : float
+        DFT length in seconds (sets bin spacing 1 / window_sec)
+    hann : bool
+        Apply a Hann window via bin convolution
+    """
+
+    STATE_ATTRS = ('X', 'history', 'n', 'power')
+
+    def __init__(self, fs: float = 1000.0,
+                 band: Tuple[float, float] = (13.0, 30.0),
+                 window_sec: float = 0.5, hann: bool = False):
+        super().__init__(fs=fs, band=band)
+        self.N = int(round(window_sec * fs))
+        self.hann = hann
+
+        k = np.arange(self.N // 2 + 1)
+        freqs = k * fs / self.N
+        self.bins = k[(freqs >= band[0]) & (freqs <= band[1])]
+        if len(self.bins) == 0:
+            raise ValueError("No DFT bins inside the band; increase window_sec")
+
+        # Track neighbours too when windowing in the frequency domain
+        self.tracked = (np.arange(self.bins[0] - 1, self.bins[-1] + 2)
+                        if hann else self.bins)
+        self.complex_dtype = get_complex_dtype()
+        self.twiddle = np.exp(2j * np.pi * self.tracked / self.N).astype(self.complex_dtype)
+
+        window_energy = 3 * self.N / 8 if hann else self.N
+        self.scale = 4.0 / (self.N * window_energy)
+        self.reset()
+
+    def reset(self):
+        """Clear the DFT state and sample history"""
+        self.X = np.zeros(len(self.tracked), dtype=self.complex_dtype)
+        self.history = np.zeros(self.N, dtype=self.dtype)
+        self.n = 0
+        self.power = 0.0
+
+    def _band_power(self, X: np.ndarray) -> np.ndarray:
+        if self.hann:
+            X = 0.5 * X[..., 1:-1] - 0.25 * (X[..., :-2] + X[..., 2:])
+        return self.scale * np.sum(X.real**2 + X.imag**2, axis=-1)
+
+    def _resync(self):
+        # X_k = w^n * sum_i history[i] e^{-j 2 pi k i / N} for the ring history
+        spectrum = np.fft.fft(self.history.astype(np.float64))[self.tracked]
+        phase = np.exp(2j * np.pi * self.tracked * self.n / self.N)
+        self.X = (phase * spectrum).astype(self.complex_dtype)
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        samples = np.asarray(samples, dtype=self.dtype)
+        if len(samples) == 0:
+            return np.empty(0, dtype=self.dtype)
+
+        # Resync at every wrap of the history ring, as update() does
+        power = []
+        start = 0
+        while start < len(samples):
+            stop = start + self.N - self.n
+            power.append(self._process_block(samples[start:stop]))
+            start = stop
+        return np.concatenate(power)
+
+    def _process_block(self, samples: np.ndarray) -> np.ndarray:
+        L = len(samples)
+
+        # x[n] - x[n-N] for every new sample; history is a ring indexed by n
+        extended = np.concatenate([np.roll(self.history, -self.n), samples])
+        delta = samples - extended[:L]
+        self.history = np.roll(extended[L:], (self.n + L) % self.N)
+
+        # X[n] = w^n Y[n] with Y[n] = Y[n-1] + w^-(n-1) delta[n]; exponents mod N
+        idx = (self.n + np.arange(L)) % self.N
+        phase = 2j * np.pi * self.tracked / self.N
+        Y0 = self.X * np.exp(-phase * ((self.n - 1) % self.N)).astype(self.complex_dtype)
+        rotate_in = np.exp(-phase * ((idx[:, None] - 1) % self.N)).astype(self.complex_dtype)
+        Y = Y0 + np.cumsum(delta[:, None] * rotate_in, axis=0)
+        X = Y * np.exp(phase * idx[:, None]).astype(self.complex_dtype)
+
+        self.X = X[-1]
+        self.n = (self.n + L) % self.N
+        if self.n == 0:
+            self._resync()
+        power = self._band_power(X)
+        self.power = float(power[-1])
+        return power
+
+    def update(self, sample: float) -> float:
+        old = self.history[self.n]
+        self.history[self.n] = sample
+        self.X = self.twiddle * (self.X + (sample - old))
+        self.n = (self.n + 1) % self.N
+        if self.n == 0:
+            self._resync()
+        self.power = float(self._band_power(self.X))
+        return self.power
+
+    @property
+    def ops_per_sample(self) -> float:
+        # Complex rotation (4) per tracked bin plus |X|^2 (2) per band bin
+        extra = 3 * len(self.bins) if self.hann else 0
+        return 4 * len(self.tracked) + 2 * len(self.bins) + extra + 1
+
+
+class GoertzelEstimator(BandPowerEstimator):
+    """
+    Goertzel filter bank over the beta bins
+
+    Each bin runs the two-term recursion s[n] = x[n] + 2 cos(w) s[n-1] -
+    s[n-2], a single real multiplication per bin and sample. Power is
+    evaluated and held at the end of every block of N samples, so this is
+    the cheapest option when a block-rate update suffices.
+
+    Parameters
+    ----------
+    fs : float
+        Sampling rate in Hz
+    band : tuple
+        (low, high) band edges in Hz
+    block_sec : float
+        Block length in seconds (sets bin spacing and update interval)
+    """
+
+    STATE_ATTRS = ('s1', 's2', 'count', 'power')
+
+    def __init__(self, fs: float = 1000.0,
+                 band: Tuple[float, float] = (13.0, 30.0),
+                 block_sec: float = 0.5):
+        super().__init__(fs=fs, band=band)
+        self.N = int(round(block_sec * fs))
+
+        k = np.arange(self.N // 2 + 1)
+        freqs = k * fs / self.N
+        self.bins = k[(freqs >= band[0]) & (freqs <= band[1])]
+        if len(self.bins) == 0:
+            raise ValueError("No DFT bins inside the band; increase block_sec")
+
+        self.coeff = (2 * np.cos(2 * np.pi * self.bins / self.N)).astype(self.dtype)
+        self.scale = 4.0 / self.N**2
+        self.reset()
+
+    def reset(self):
+        """Clear the recursion state"""
+        self.s1 = np.zeros(len(self.bins), dtype=self.dtype)
+        self.s2 = np.zeros(len(self.bins), dtype=self.dtype)
+        self.count = 0
+        self.power = 0.0
+
+    def _block_power(self, s1: np.ndarray, s2: np.ndarray) -> np.ndarray:
+        return self.scale * np.sum(s1 * s1 + s2 * s2 - self.coeff * s1 * s2, axis=-1)
+
+    def _run(self, x: np.ndarray, s1: np.ndarray, s2: np.ndarray):
+        """Run the recursion on x (..., L) from state (s1, s2); return final state"""
+        last = np.empty(x.shape[:-1] + (len(self.bins),), dtype=self.dtype)
+        prev = np.empty_like(last)
+        one = self.dtype(1.0)
+        for j, c in enumerate(self.coeff):
+            zi = np.stack([c * s1[..., j] - s2[..., j], -s1[..., j]], axis=-1)
+            a = np.array([one, -c, one], dtype=self.dtype)
+            s, _ = signal.lfilter(a[:1], a, x, axis=-1, zi=zi)
+            last[..., j] = s[..., -1]
+            prev[..., j] = s[..., -2] if x.shape[-1] > 1 else s1[..., j]
+        return last, prev
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        samples = np.asarray(samples, dtype=self.dtype)
+        out = np.empty(len(samples), dtype=self.dtype)
+        pos = 0
+
+        # Finish the block in progress
+        head = min(self.N - self.count, len(samples))
+        if head:
+            self.s1, self.s2 = self._run(samples[:head], self.s1, self.s2)
+            self.count += head
+            out[:head] = self.power
+            if self.count == self.N:
+                self.power = float(self._block_power(self.s1, self.s2))
+                out[head - 1] = self.power
+                self.s1[:] = 0.0
+                self.s2[:] = 0.0
+                self.count = 0
+            pos = head
+
+        # Whole blocks in one vectorized pass
+        n_blocks = (len(samples) - pos) // self.N
+        if n_blocks:
+            blocks = samples[pos:pos + n_blocks * self.N].reshape(n_blocks, self.N)
+            zeros = np.zeros((n_blocks, len(self.bins)), dtype=self.dtype)
+            s1, s2 = self._run(blocks, zeros, zeros)
+            powers = self._block_power(s1, s2)
+            held = np.repeat(np.concatenate([[self.power], powers[:-1]]).astype(self.dtype), self.N)
+            held[self.N - 1::self.N] = powers
+            out[pos:pos + n_blocks * self.N] = held
+            self.power = float(powers[-1])
+            pos += n_blocks * self.N
+
+        # Start the next block
+        if pos < len(samples):
+            self.s1, self.s2 = self._run(samples[pos:], self.s1, self.s2)
+            self.count = len(samples) - pos
+            out[pos:] = self.power
+
+        return out
+
+    def update(self, sample: float) -> float:
+        s = sample + self.coeff * self.s1 - self.s2
+        self.s2 = self.s1
+        self.s1 = s
+        self.count += 1
+        if self.count == self.N:
+            self.power = float(self._block_power(self.s1, self.s2))
+            self.s1 = np.zeros(len(self.bins), dtype=self.dtype)
+            self.s2 = np.zeros(len(self.bins), dtype=self.dtype)
+            self.count = 0
+        return self.power
+
+    @property
+    def ops_per_sample(self) -> float:
+        return len(self.bins) * (1 + 3.0 / self.N)
+
+
+def default_estimators(fs: float = 1000.0) -> Dict[str, BandPowerEstimator]:
+    """Estimators compared by :func:`benchmark_estimators`"""
+    return {
+        'butterworth_hilbert': ButterworthHilbertEstimator(fs=fs),
+        'sliding_dft': SlidingDFTEstimator(fs=fs),
+        'sliding_dft_hann': SlidingDFTEstimator(fs=fs, hann=True),
+        'goertzel': GoertzelEstimator(fs=fs),
+    }
+
+
+def benchmark_estimators(x: np.ndarray, fs: float = 1000.0,
+                         estimators: Optional[Dict[str, BandPowerEstimator]] = None,
+                         reference: Optional[np.ndarray] = None,
+                         warmup_sec: float = 1.0,
+                         chunk_size: int = 1000,
+                         max_lag_sec: float = 1.0) -> Dict[str, Dict[str, float]]:
+    """
+    Compare streaming estimators against the offline notebook estimate
+
+    Each estimator processes ``x`` in chunks; its output is compared with
+    the reference after the warm-up, at the lag that best aligns the two
+    (causal estimators trail the centered reference).
+
+    Parameters
+    ----------
+    x : np.ndarray
+        Raw signal (e.g. ``motor_signal`` from baseline_data.npz)
+    fs : float
+        Sampling rate in Hz
+    estimators : dict, optional
+        name -> estimator (default: :func:`default_estimators`)
+    reference : np.ndarray, optional
+        Ground-truth power (default: :func:`offline_beta_power`)
+    warmup_sec : float
+        Initial transient excluded from the comparison
+    chunk_size : int
+        Samples per process() call
+    max_lag_sec : float
+        Largest lag searched for alignment
+
+    Returns
+    -------
+    dict
+        name -> correlation, nrmse, bias, lag_ms, ops_per_sample and
+        us_per_sample
+    """
+    x = np.asarray(x, dtype=float)
+    estimators = estimators or default_estimators(fs)
+    if reference is None:
+        reference = offline_beta_power(x, fs=fs)
+
+    start = int(warmup_sec * fs)
+    max_lag = int(max_lag_sec * fs)
+    results = {}
+
+    for name, estimator in estimators.items():
+        estimator.reset()
+        t0 = time.perf_counter()
+        estimate = np.concatenate([estimator.process(x[i:i + chunk_size])
+                                   for i in range(0, len(x), chunk_size)])
+        elapsed = time.perf_counter() - t0
+
+        best = (-np.inf, 0)
+        for lag in range(0, max_lag + 1, max(int(fs // 100), 1)):
+            est = estimate[start + lag:]
+            ref = reference[start:len(reference) - lag]
+            if len(est) < 2:
+                break
+            corr = np.corrcoef(est, ref)[0, 1]
+            if corr > best[0]:
+                best = (corr, lag)
+
+        corr, lag = best
+        est = estimate[start + lag:]
+        ref = reference[start:len(reference) - lag]
+        results[name] = {
+            'correlation': float(corr),
+            'nrmse': float(np.sqrt(np.mean((est - ref) ** 2)) / np.mean(ref)),
+            'bias': float(np.mean(est) / np.mean(ref) - 1.0),
+            'lag_ms': 1000.0 * lag / fs,
+            'ops_per_sample': float(estimator.ops_per_sample),
+            'us_per_sample': 1e6 * elapsed / max(len(x), 1),
+        }
+
+    return results
+
+
+def select_estimator(results: Dict[str, Dict[str, float]],
+                     min_correlation: float = 0.9,
+                     max_nrmse: Optional[float] = None,
+                     cost_key: str = 'ops_per_sample') -> Optional[str]:
+    """
+    Cheapest estimator meeting the accuracy target
+
+    Parameters
+    ----------
+    results : dict
+        Output of :func:`benchmark_estimators`
+    min_correlation : float
+        Minimum correlation with the reference
+    max_nrmse : float, optional
+        Maximum normalized RMS error
+    cost_key : str
+        'ops_per_sample' (embedded cost) or 'us_per_sample' (host time)
+
+    Returns
+    -------
+    str or None
+        Name of the selected estimator, None if none qualifies
+    """
+    ok = [name for name, r in results.items()
+          if r['correlation'] >= min_correlation
+          and (max_nrmse is None or r['nrmse'] <= max_nrmse)]
+    if not ok:
+        return None
+    return min(ok, key=lambda name: results[name][cost_key])
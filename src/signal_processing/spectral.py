@@ -0,0 +1,269 @@
+"""
+Streaming Spectral Analysis
+Incremental STFT spectrogram and Welch PSD with constant memory
+"""
+
+from typing import Iterator, Optional, Tuple, Union
+
+import numpy as np
+from scipy import fft, signal
+
+from src.precision import get_dtype
+from src.simulation.checkpoint import Stateful
+from src.simulation.result_store import iter_chunks
+
+
+class StreamingSTFT(Stateful):
+    """
+    Incremental short-time Fourier transform
+
+    Accepts arbitrary-length chunks and emits every spectrogram column as
+    soon as its segment is complete. Only the samples of the unfinished
+    segment are kept between calls, so memory does not grow with recording
+    length. The window, scale factors and FFT work buffers are computed once
+    and reused. Output matches ``scipy.signal.spectrogram(mode='psd')`` for
+    the same parameters.
+
+    Parameters
+    ----------
+    fs : float
+        Sampling rate in Hz
+    nperseg : int
+        Segment length
+    noverlap : int, optional
+        Overlap between segments (default: nperseg // 2)
+    window : str or tuple
+        Window spec for ``scipy.signal.get_window``
+    detrend : str or False
+        'constant' removes each segment's mean, False disables detrending
+    scaling : str
+        'density' (V**2/Hz) or 'spectrum' (V**2)
+    workers : int, optional
+        Threads used by ``scipy.fft``
+    """
+
+    STATE_ATTRS = ('pending', 'next_start', 'n_columns')
+
+    def __init__(self, fs: float = 1000.0, nperseg: int = 256,
+                 noverlap: Optional[int] = None,
+                 window: Union[str, tuple] = 'hann',
+                 detrend: Union[str, bool] = 'constant',
+                 scaling: str = 'density',
+                 workers: Optional[int] = None):
+        noverlap = nperseg // 2 if noverlap is None else noverlap
+        if not 0 <= noverlap < nperseg:
+            raise ValueError("noverlap must be in [0, nperseg)")
+        if detrend not in ('constant', False):
+            raise ValueError(f"Unsupported detrend: {detrend}")
+
+        self.fs = fs
+        self.nperseg = nperseg
+        self.noverlap = noverlap
+        self.step = nperseg - noverlap
+        self.detrend = detrend
+        self.workers = workers
+
+        self.dtype = get_dtype()
+        self.window = signal.get_window(window, nperseg).astype(self.dtype)
+        if scaling == 'density':
+            scale = 1.0 / (fs * np.sum(self.window**2))
+        elif scaling == 'spectrum':
+            scale = 1.0 / np.sum(self.window)**2
+        else:
+            raise ValueError(f"Unknown scaling: {scaling}")
+
+        self.freqs = fft.rfftfreq(nperseg, 1.0 / fs)
+        self.scale = np.full(len(self.freqs), scale, dtype=self.dtype)
+        self.scale[1:-1 if nperseg % 2 == 0 else None] *= 2
+
+        self.reset()
+
+    def reset(self):
+        """Discard buffered samples and restart the time axis"""
+        self.pending = np.empty(0, dtype=self.dtype)
+        self.next_start = 0
+        self.n_columns = 0
+
+    def push(self, samples: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Add samples and return the newly completed columns
+
+        Parameters
+        ----------
+        samples : np.ndarray
+            Next chunk of the signal
+
+        Returns
+        -------
+        tuple
+            (times, Sxx) with times of segment centres in seconds and Sxx of
+            shape (len(freqs), n_new_columns)
+        """
+        buffer = np.concatenate([self.pending, np.asarray(samples, dtype=self.dtype)])
+        n_frames = 0 if len(buffer) < self.nperseg else (len(buffer) - self.nperseg) // self.step + 1
+
+        if n_frames == 0:
+            self.pending = buffer
+            return np.empty(0), np.empty((len(self.freqs), 0), dtype=self.dtype)
+
+        frames = np.lib.stride_tricks.sliding_window_view(buffer, self.nperseg)[::self.step][:n_frames]
+        if self.detrend == 'constant':
+            frames = frames - frames.mean(axis=1, keepdims=True)
+        else:
+            frames = frames.copy()
+        frames *= self.window
+
+        spectrum = fft.rfft(frames, axis=1, overwrite_x=True, workers=self.workers)
+        sxx = (spectrum.real**2 + spectrum.imag**2) * self.scale
+
+        starts = self.next_start + np.arange(n_frames) * self.step
+        times = (starts + self.nperseg / 2) / self.fs
+
+        consumed = n_frames * self.step
+        self.pending = buffer[consumed:]
+        self.next_start += consumed
+        self.n_columns += n_frames
+        return times, sxx.T
+
+    def __repr__(self) -> str:
+        return (f"StreamingSTFT(fs={self.fs}, nperseg={self.nperseg}, "
+                f"noverlap={self.noverlap})")
+
+
+class StreamingWelch(Stateful):
+    """
+    Running Welch PSD built from streaming STFT columns
+
+    Without forgetting the estimate equals ``scipy.signal.welch`` over all
+    samples pushed so far. With a forgetting factor lambda each new segment
+    updates psd <- lambda * psd + (1 - lambda) * segment, tracking slow
+    spectral changes in long recordings or the live stream.
+
+    Parameters
+    ----------
+    fs : float
+        Sampling rate in Hz
+    nperseg : int
+        Segment length
+    noverlap : int, optional
+        Overlap between segments (default: nperseg // 2)
+    window : str or tuple
+        Window spec
+    forgetting : float, optional
+        Exponential forgetting factor per segment in (0, 1)
+    **kwargs
+        Passed to :class:`StreamingSTFT`
+    """
+
+    STATE_ATTRS = ('stft', '_sum', '_ema', 'n_segments')
+
+    def __init__(self, fs: float = 1000.0, nperseg: int = 256,
+                 noverlap: Optional[int] = None,
+                 window: Union[str, tuple] = 'hann',
+                 forgetting: Optional[float] = None,
+                 **kwargs):
+        if forgetting is not None and not 0.0 < forgetting < 1.0:
+            raise ValueError("forgetting must be in (0, 1)")
+
+        self.stft = StreamingSTFT(fs=fs, nperseg=nperseg, noverlap=noverlap,
+                                  window=window, **kwargs)
+        self.forgetting = forgetting
+        self.reset()
+
+    def reset(self):
+        """Clear the running average"""
+        self.stft.reset()
+        self._sum = np.zeros(len(self.stft.freqs), dtype=self.stft.dtype)
+        self._ema = None
+        self.n_segments = 0
+
+    @property
+    def freqs(self) -> np.ndarray:
+        """Frequency of each PSD bin (Hz)"""
+        return self.stft.freqs
+
+    def push(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Add samples and return the updated PSD
+
+        Returns
+        -------
+        np.ndarray
+            Current PSD estimate (all zeros before the first full segment)
+        """
+        _, sxx = self.stft.push(samples)
+        n_new = sxx.shape[1]
+        if n_new:
+            if self.forgetting is None:
+                self._sum += sxx.sum(axis=1)
+            else:
+                lam = self.forgetting
+                weights = ((1 - lam) * lam ** np.arange(n_new - 1, -1, -1)).astype(sxx.dtype)
+                if self._ema is None:
+                    # Seed with the first segment so early estimates are unbiased
+                    self._ema = np.zeros(len(self.freqs), dtype=self.stft.dtype)
+                    weights[0] += lam ** n_new
+                else:
+                    self._ema *= lam ** n_new
+                self._ema += sxx @ weights
+            self.n_segments += n_new
+        return self.psd
+
+    @property
+    def psd(self) -> np.ndarray:
+        """Current PSD estimate"""
+        if self.n_segments == 0:
+            return np.zeros(len(self.freqs), dtype=self.stft.dtype)
+        if self.forgetting is None:
+            return self._sum / self.n_segments
+        return self._ema.copy()
+
+    def band_power(self, band: Tuple[float, float] = (13.0, 30.0)) -> float:
+        """Mean PSD inside a band, as in notebook 01's beta_power"""
+        mask = (self.freqs >= band[0]) & (self.freqs <= band[1])
+        return float(np.mean(self.psd[mask]))
+
+    def __repr__(self) -> str:
+        return (f"StreamingWelch(nperseg={self.stft.nperseg}, "
+                f"segments={self.n_segments}, forgetting={self.forgetting})")
+
+
+def iter_spectrogram(x: np.ndarray, fs: float = 1000.0, nperseg: int = 256,
+                     noverlap: Optional[int] = None,
+                     window: Union[str, tuple] = ('tukey', 0.25),
+                     chunk_size: int = 1_048_576,
+                     **kwargs) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Spectrogram of a (memory-mapped) recording, chunk by chunk
+
+    Defaults follow ``scipy.signal.spectrogram``.
+
+    Yields
+    ------
+    tuple
+        (times, Sxx) blocks of completed columns
+    """
+    noverlap = nperseg // 8 if noverlap is None else noverlap
+    stft = StreamingSTFT(fs=fs, nperseg=nperseg, noverlap=noverlap,
+                         window=window, **kwargs)
+    for _, chunk in iter_chunks(x, chunk_size):
+        times, sxx = stft.push(chunk)
+        if len(times):
+            yield times, sxx
+
+
+def welch_chunked(x: np.ndarray, fs: float = 1000.0, nperseg: int = 256,
+                  chunk_size: int = 1_048_576,
+                  **kwargs) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    ``scipy.signal.welch`` for recordings too long to load at once
+
+    Returns
+    -------
+    tuple
+        (freqs, psd)
+    """
+    welch = StreamingWelch(fs=fs, nperseg=nperseg, **kwargs)
+    for _, chunk in iter_chunks(x, chunk_size):
+        welch.push(chunk)
+    return welch.freqs, welch.psd
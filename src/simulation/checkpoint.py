@@ -0,0 +1,169 @@
+"""
+Checkpointing
+Snapshot and restore of closed-loop simulation state
+"""
+
+import hashlib
+import json
+import os
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Tuple, Union
+
+import numpy as np
+
+
+class Stateful:
+    """
+    Mixin giving a class ``get_state()`` / ``set_state()``
+
+    Subclasses list the attributes that make up their dynamic state in
+    ``STATE_ATTRS``; configuration (gains, filter coefficients, patient
+    parameters) is rebuilt by the constructor and not included. Values are
+    copied so a snapshot is not affected by later steps:
+
+    - NumPy arrays are copied
+    - ``np.random.Generator`` is stored as its bit-generator state
+    - ``deque`` is stored as an array and refilled in place
+    - nested :class:`Stateful` objects are stored as their own state dict
+
+    Logging histories (``control_history`` etc.) are deliberately left out
+    so snapshot size does not grow with run length.
+
+    ``get_config()`` returns the complementary configuration. Resumable
+    runners fingerprint it, so a snapshot is never restored into an object
+    configured differently.
+    """
+
+    STATE_ATTRS: Tuple[str, ...] = ()
+
+    def get_state(self) -> Dict[str, Any]:
+        """Copy of the dynamic state"""
+        return {name: _export(getattr(self, name)) for name in self.STATE_ATTRS}
+
+    def get_config(self) -> Dict[str, Any]:
+        """Configuration: public attributes that are not dynamic state or logs"""
+        return {name: value for name, value in vars(self).items()
+                if name not in self.STATE_ATTRS and not name.startswith('_')
+                and not name.endswith('_history')}
+
+    def set_state(self, state: Dict[str, Any]):
+        """Restore a state returned by :meth:`get_state`"""
+        for name in self.STATE_ATTRS:
+            current = getattr(self, name, None)
+            value = state[name]
+            if isinstance(current, Stateful):
+                current.set_state(value)
+            elif isinstance(current, np.random.Generator):
+                current.bit_generator.state = value
+            elif isinstance(current, deque):
+                current.clear()
+                current.extend(np.asarray(value).tolist())
+            elif isinstance(value, np.ndarray):
+                setattr(self, name, value.copy())
+            else:
+                setattr(self, name, value)
+
+
+def _export(value: Any) -> Any:
+    if isinstance(value, Stateful):
+        return value.get_state()
+    if isinstance(value, np.random.Generator):
+        return value.bit_generator.state
+    if isinstance(value, deque):
+        return np.array(value)
+    if isinstance(value, np.ndarray):
+        return value.copy()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _flatten(state: Dict[str, Any], prefix: str, arrays: Dict[str, np.ndarray],
+             values: Dict[str, Any]):
+    for key, value in state.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, np.ndarray):
+            arrays[name] = value
+        elif isinstance(value, dict) and value:
+            _flatten(value, f'{name}/', arrays, values)
+        else:
+            values[name] = value
+
+
+def _unflatten(flat: Dict[str, Any]) -> Dict[str, Any]:
+    state: Dict[str, Any] = {}
+    for name, value in flat.items():
+        *parents, key = name.split('/')
+        node = state
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[key] = value
+    return state
+
+
+def save_checkpoint(path: Union[str, Path], state: Dict[str, Any]):
+    """
+    Write a (nested) state dict to a single ``.npz`` file
+
+    Arrays are stored as npz members and everything else (scalars, RNG
+    states, ``None``) as one JSON member. The file is written next to the
+    target and renamed into place, so a crash never leaves a truncated
+    checkpoint behind.
+
+    Parameters
+    ----------
+    path : str or Path
+        Checkpoint file (``.npz``)
+    state : dict
+        Values from ``get_state()`` calls plus any loop counters
+    """
+    path = Path(path)
+    arrays: Dict[str, np.ndarray] = {}
+    values: Dict[str, Any] = {}
+    _flatten(state, '', arrays, values)
+
+    tmp_path = path.with_name(path.stem + '.tmp.npz')
+    np.savez(tmp_path, __values__=np.array(json.dumps(values)), **arrays)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: Union[str, Path]) -> Dict[str, Any]:
+    """Read a checkpoint written by :func:`save_checkpoint`"""
+    with np.load(path) as data:
+        flat = json.loads(str(data['__values__']))
+        flat.update({key: data[key] for key in data.files if key != '__values__'})
+    return _unflatten(flat)
+
+
+def _canonical(value: Any, digest: 'hashlib._Hash'):
+    if isinstance(value, dict):
+        digest.update(b'{')
+        for key in sorted(value, key=str):
+            digest.update(str(key).encode() + b':')
+            _canonical(value[key], digest)
+        digest.update(b'}')
+    elif isinstance(value, (list, tuple)):
+        digest.update(b'[')
+        for item in value:
+            _canonical(item, digest)
+        digest.update(b']')
+    elif isinstance(value, np.ndarray):
+        digest.update(f'{value.dtype.str}{value.shape}'.encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, np.generic):
+        _canonical(value.item(), digest)
+    else:
+        digest.update(repr(value).encode() + b';')
+
+
+def fingerprint(value: Any) -> str:
+    """
+    Short hash of a configuration (nested dicts, sequences, arrays, scalars)
+
+    Stored next to cached or resumable results so they are only reused for
+    the configuration that produced them.
+    """
+    digest = hashlib.sha1()
+    _canonical(value, digest)
+    return digest.hexdigest()[:16]
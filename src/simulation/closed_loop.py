@@ -0,0 +1,361 @@
+"""
+Closed-Loop Simulation
+Single-run and vectorized closed-loop simulations with performance metrics
+"""
+
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from src.precision import get_dtype
+from .checkpoint import fingerprint, load_checkpoint, save_checkpoint
+from .result_store import ResultStore
+
+
+def run_closed_loop(controller, brain, target: float,
+                    duration_sec: float = 10.0,
+                    dt: float = 0.001,
+                    measurement_noise: float = 0.0,
+                    rng: Optional[np.random.Generator] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Run closed-loop control simulation
+
+    Parameters
+    ----------
+    controller : BaseController
+        Controller with control(measurement, setpoint) and reset();
+        event-triggered execution is honoured if enabled
+    brain : SimpleBrainModel
+        Plant with step(stimulation) and reset()
+    target : float
+        Target beta power
+    duration_sec : float
+        Simulation length in seconds
+    dt : float
+        Time step in seconds
+    measurement_noise : float
+        Standard deviation of additive noise on the beta seen by the
+        controller (as in the ML-enhanced notebook); the returned beta
+        power is the noise-free value
+    rng : np.random.Generator, optional
+        Generator for the measurement noise
+
+    Returns
+    -------
+    tuple
+        (time, beta_power, stimulation) arrays in the current precision
+    """
+    n_steps = int(duration_sec / dt)
+    dtype = get_dtype()
+    if measurement_noise:
+        rng = rng if rng is not None else np.random.default_rng()
+        noise = rng.standard_normal(n_steps).astype(dtype, copy=False) * dtype(measurement_noise)
+    else:
+        noise = np.zeros(n_steps, dtype=dtype)
+
+    time_vec = np.zeros(n_steps, dtype=dtype)
+    beta_vec = np.zeros(n_steps, dtype=dtype)
+    stim_vec = np.zeros(n_steps, dtype=dtype)
+
+    brain.reset()
+    controller.reset()
+
+    for i in range(n_steps):
+        current_beta = brain.step(stim_vec[i - 1] if i > 0 else 0)
+        stim = controller.control(current_beta + noise[i], target)
+
+        time_vec[i] = i * dt
+        beta_vec[i] = current_beta
+        stim_vec[i] = stim
+
+    return time_vec, beta_vec, stim_vec
+
+
+def run_closed_loop_resumable(controller, brain, target: float,
+                              store_path: Union[str, Path],
+                              duration_sec: float = 10.0,
+                              dt: float = 0.001,
+                              measurement_noise: float = 0.0,
+                              seed: Optional[int] = None,
+                              checkpoint_every_sec: float = 60.0,
+                              resume: bool = False) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    :func:`run_closed_loop` writing to a ResultStore with periodic checkpoints
+
+    Traces go straight to memory-mapped arrays in ``store_path``. Every
+    ``checkpoint_every_sec`` of simulated time the arrays are flushed and
+    ``checkpoint.npz`` is rewritten with the controller state, the plant
+    state and the measurement-noise RNG. With ``resume=True`` a run that
+    was interrupted continues from its last checkpoint and produces the
+    same traces as an uninterrupted run. The checkpoint records a
+    fingerprint of the controller and plant configuration and the run
+    settings; resuming with anything different raises ValueError rather
+    than restoring state (such as an LQR gain) from the old run.
+
+    Parameters
+    ----------
+    controller : BaseController
+        Controller supporting get_state()/set_state()
+    brain : SimpleBrainModel
+        Scalar plant supporting get_state()/set_state()
+    target : float
+        Target beta power
+    store_path : str or Path
+        ResultStore directory
+    duration_sec, dt, measurement_noise
+        As in :func:`run_closed_loop`
+    seed : int, optional
+        Seed of the measurement noise
+    checkpoint_every_sec : float
+        Simulated time between checkpoints
+    resume : bool
+        Continue from an existing checkpoint instead of starting over
+
+    Returns
+    -------
+    tuple
+        (time, beta_power, stimulation) memory-mapped arrays
+    """
+    n_steps = int(duration_sec / dt)
+    every = max(int(checkpoint_every_sec / dt), 1)
+    store = ResultStore(store_path, mode='w')
+    checkpoint_path = store.path / 'checkpoint.npz'
+    names = ('time', 'beta_power', 'stimulation')
+    rng = np.random.default_rng(seed)
+    run_key = fingerprint({
+        'controller': type(controller).__name__,
+        'controller_config': controller.get_config(),
+        'brain': type(brain).__name__,
+        'brain_config': brain.get_config(),
+        'target': target,
+        'dt': dt,
+        'measurement_noise': measurement_noise,
+        'seed': seed,
+    })
+
+    if resume and checkpoint_path.exists():
+        state = load_checkpoint(checkpoint_path)
+        if state['n_steps'] != n_steps:
+            raise ValueError("Checkpoint was written for a different run length")
+        if state.get('fingerprint') != run_key:
+            raise ValueError("Checkpoint was written for a different controller, "
+                             "plant or run settings; start over without resume")
+        arrays = [store.open_array(name) for name in names]
+        controller.set_state(state['controller'])
+        brain.set_state(state['brain'])
+        rng.bit_generator.state = state['rng']
+        start, prev_stim = int(state['step']), float(state['prev_stim'])
+    else:
+        arrays = [store.create_array(name, n_steps) for name in names]
+        brain.reset()
+        controller.reset()
+        start, prev_stim = 0, 0.0
+    time_vec, beta_vec, stim_vec = arrays
+    dtype = time_vec.dtype.type
+
+    for seg_start in range(start, n_steps, every):
+        seg_stop = min(seg_start + every, n_steps)
+        if measurement_noise:
+            noise = rng.standard_normal(seg_stop - seg_start).astype(dtype, copy=False) \
+                * dtype(measurement_noise)
+        else:
+            noise = np.zeros(seg_stop - seg_start, dtype=dtype)
+
+        for i in range(seg_start, seg_stop):
+            current_beta = brain.step(prev_stim)
+            prev_stim = controller.control(current_beta + noise[i - seg_start], target)
+
+            time_vec[i] = i * dt
+            beta_vec[i] = current_beta
+            stim_vec[i] = prev_stim
+
+        for array in arrays:
+            array.flush()
+        save_checkpoint(checkpoint_path, {
+            'n_steps': n_steps,
+            'fingerprint': run_key,
+            'step': seg_stop,
+            'prev_stim': float(prev_stim),
+            'controller': controller.get_state(),
+            'brain': brain.get_state(),
+            'rng': rng.bit_generator.state,
+        })
+
+    return tuple(ResultStore(store.path)[name] for name in names)
+
+
+def compute_metrics(time: np.ndarray, beta: np.ndarray, stim: np.ndarray,
+                    mean_beta: float, target: float,
+                    tail_samples: Optional[int] = None,
+                    tolerance: float = 0.1) -> Dict[str, float]:
+    """
+    Performance metrics used throughout the notebooks
+
+    Parameters
+    ----------
+    time, beta, stim : np.ndarray
+        Closed-loop traces
+    mean_beta : float
+        Open-loop mean beta power
+    target : float
+        Target beta power
+    tail_samples : int, optional
+        Samples used for the steady-state mean (default: second half)
+    tolerance : float
+        Settling band as a fraction of the target
+
+    Returns
+    -------
+    dict
+        beta_reduction (%), energy (∫u²dt), mean_stim (mA) and
+        settling_time (s, None if the band is never entered for good)
+    """
+    dt = time[1] - time[0] if len(time) > 1 else 0.001
+    tail_samples = tail_samples or len(beta) // 2
+
+    outside = np.flatnonzero(np.abs(beta - target) >= tolerance * target)
+    if len(outside) == 0:
+        settling_time = 0.0
+    elif outside[-1] == len(beta) - 1:
+        settling_time = None
+    else:
+        settling_time = float(time[outside[-1] + 1])
+
+    return {
+        'beta_reduction': float((1 - np.mean(beta[-tail_samples:]) / mean_beta) * 100),
+        'energy': float(np.sum(stim**2) * dt),
+        'mean_stim': float(np.mean(stim)),
+        'settling_time': settling_time,
+    }
+
+
+def benchmark_event_trigger(make_controller: Callable[[], Any], brain, target: float,
+                            mean_beta: float,
+                            settings: Sequence[Dict[str, float]],
+                            duration_sec: float = 10.0,
+                            dt: float = 0.001,
+                            measurement_noise: float = 0.0,
+                            seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Beta/energy trade-off of event-triggered execution
+
+    Runs the same closed loop once per trigger setting (plus the
+    every-tick reference) with identical measurement noise.
+
+    Parameters
+    ----------
+    make_controller : callable
+        Returns a fresh BaseController
+    brain : SimpleBrainModel
+        Plant (reset before every run)
+    target, mean_beta : float
+        Target and open-loop mean beta power
+    settings : sequence of dict
+        Keyword arguments for ``set_event_trigger``
+    duration_sec, dt, measurement_noise, seed
+        As in :func:`run_closed_loop`
+
+    Returns
+    -------
+    list of dict
+        One row per setting with the trigger settings, compute_metrics()
+        values, get_trigger_stats() values and wall time
+    """
+    rows = []
+    for trigger in [None, *settings]:
+        controller = make_controller()
+        if trigger is not None:
+            controller.set_event_trigger(**trigger)
+
+        start = time.perf_counter()
+        time_vec, beta, stim = run_closed_loop(controller, brain, target,
+                                               duration_sec=duration_sec, dt=dt,
+                                               measurement_noise=measurement_noise,
+                                               rng=np.random.default_rng(seed))
+        wall_time = time.perf_counter() - start
+
+        stats = controller.get_trigger_stats()
+        if trigger is None:
+            stats.update(ticks=len(beta), evaluations=len(beta))
+        rows.append({
+            **(trigger or {}),
+            **compute_metrics(time_vec, beta, stim, mean_beta, target),
+            'evaluations': stats['evaluations'],
+            'skip_ratio': stats['skip_ratio'],
+            'wall_time': wall_time,
+        })
+    return rows
+
+
+# Per-patient metrics returned by simulate_batch
+METRICS = ('beta_reduction', 'energy', 'mean_stim', 'settling_time')
+
+
+def simulate_batch(controller, population, duration_sec: float = 10.0,
+                   target_ratio: float = 0.3,
+                   replicas: Optional[int] = None,
+                   tolerance: float = 0.1) -> Dict[str, np.ndarray]:
+    """
+    Vectorized closed-loop simulation of controller candidates x patients
+
+    Parameters
+    ----------
+    controller : BatchPIDController or BatchLQRController
+        Vectorized control law; its gains broadcast over the leading axis
+    population : PatientPopulation
+        Virtual patients
+    duration_sec : float
+        Simulation length in seconds
+    target_ratio : float
+        Target beta as a fraction of each patient's open-loop beta0
+    replicas : int, optional
+        Number of controller candidates (leading axis)
+    tolerance : float
+        Settling band as a fraction of the target
+
+    Returns
+    -------
+    dict
+        Arrays of shape (replicas, n_patients) (or (n_patients,)) with
+        beta_reduction, energy, mean_stim and settling_time; settling_time
+        equals duration_sec when the band is not held at the end of the run.
+        Sums are accumulated in float64 and returned in the population's
+        precision.
+    """
+    dt = population.dt
+    n_steps = int(round(duration_sec / dt))
+    tail_start = n_steps // 2
+
+    measurement = population.reset(replicas=replicas)
+    controller.reset()
+    target = target_ratio * population.beta0
+
+    shape = population.state_shape
+    beta_tail = np.zeros(shape)
+    stim_sum = np.zeros(shape)
+    stim_sq_sum = np.zeros(shape)
+    last_outside = np.full(shape, -1)
+    band = tolerance * target
+
+    for i in range(n_steps):
+        stim = controller.compute_control(measurement, target)
+        stim_sum += stim
+        stim_sq_sum += stim * stim
+
+        measurement = population.step(stim)
+        beta = population.beta
+
+        if i >= tail_start:
+            beta_tail += beta
+        last_outside[np.abs(beta - target) >= band] = i
+
+    mean_tail = beta_tail / max(n_steps - tail_start, 1)
+    metrics = {
+        'beta_reduction': (1 - mean_tail / population.beta0) * 100,
+        'energy': stim_sq_sum * dt,
+        'mean_stim': stim_sum / n_steps,
+        'settling_time': np.minimum((last_outside + 1) * dt, duration_sec),
+    }
+    return {name: value.astype(population.dtype) for name, value in metrics.items()}
@@ -0,0 +1,437 @@
+"""
+Response Surfaces
+Precomputed controller metrics over gain x patient-parameter grids
+"""
+
+import json
+import os
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from src.controllers.lqr_controller import BatchLQRController
+from src.controllers.pid_controller import BatchPIDController
+from src.models.brain_dynamics import PatientPopulation
+from .closed_loop import METRICS, simulate_batch
+
+
+# Gain axes and the values used for gains left off the grid: the
+# PIDController defaults, and the LQR design for Q = diag(500, 5), R = 0.05
+GAIN_AXES = {
+    'pid': {'kp': 2.0, 'ki': 0.5, 'kd': 0.1},
+    'lqr': {'k_error': -3.163, 'k_derror': -6.194},
+}
+
+PATIENT_AXES = ('beta0', 'stim_gain', 'tau', 'delay_steps')
+
+
+def _shared_drive(n_steps: int, fluctuation: float, fluctuation_tau: float,
+                  dt: float, seed: int) -> np.ndarray:
+    """One open-loop fluctuation trace, shared by every grid point"""
+    source = PatientPopulation(1, fluctuation=fluctuation,
+                               fluctuation_tau=fluctuation_tau, dt=dt, seed=seed)
+    drive = np.empty(n_steps)
+    for i in range(n_steps):
+        source.step(0.0)
+        drive[i] = source.natural_beta[0]
+    return drive
+
+
+def _evaluate_block(gains: Dict[str, np.ndarray], patients: Dict[str, np.ndarray],
+                    config: Dict[str, Any], drive: np.ndarray) -> Dict[str, np.ndarray]:
+    """Metrics of shape (n_gain_points, n_patient_points) (worker task)"""
+    n_patients = len(next(iter(patients.values())))
+    population = PatientPopulation(n_patients, drive=drive, dt=config['dt'],
+                                   **{**config['patient'], **patients})
+    fixed = config['gains']
+    n_gains = len(next(iter(gains.values()))) if gains else 1
+    values = {name: gains.get(name, np.full(n_gains, fixed[name])) for name in fixed}
+
+    if config['kind'] == 'pid':
+        controller = BatchPIDController(values['kp'], values['ki'], values['kd'],
+                                        dt=config['dt'], max_stim=config['max_stim'])
+    else:
+        K = np.column_stack([values['k_error'], values['k_derror']])
+        controller = BatchLQRController(K, dt=config['dt'], max_stim=config['max_stim'])
+
+    metrics = simulate_batch(controller, population, duration_sec=config['duration_sec'],
+                             target_ratio=config['target_ratio'], replicas=n_gains)
+    return {name: metrics[name] for name in METRICS}
+
+
+def _evaluate(gains: Dict[str, np.ndarray], patients: Dict[str, np.ndarray],
+              config: Dict[str, Any], drive: np.ndarray) -> Dict[str, np.ndarray]:
+    """Simulate gain points x patient points, split over a worker pool"""
+    n_gains = len(next(iter(gains.values()))) if gains else 1
+    n_workers = min(config['n_workers'], n_gains)
+    if n_workers <= 1:
+        return _evaluate_block(gains, patients, config, drive)
+
+    bounds = np.linspace(0, n_gains, n_workers + 1).astype(int)
+    chunks = [{name: v[lo:hi] for name, v in gains.items()}
+              for lo, hi in zip(bounds[:-1], bounds[1:])]
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = [executor.submit(_evaluate_block, chunk, patients, config, drive)
+                   for chunk in chunks]
+        results = [f.result() for f in futures]
+    return {name: np.concatenate([r[name] for r in results]) for name in METRICS}
+
+
+def _combos(axes: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Cartesian product of axis values, C order, as one column per axis"""
+    if not axes:
+        return {}
+    grids = np.meshgrid(*axes.values(), indexing='ij')
+    return {name: grid.ravel() for name, grid in zip(axes, grids)}
+
+
+class ResponseSurface:
+    """
+    Controller metrics tabulated on a gain x patient-parameter grid
+
+    The grid is the tensor product of the gain axes (e.g. kp, ki for PID or
+    k_error, k_derror for LQR) and the patient axes (beta0, stim_gain, tau,
+    delay_steps). Gain combinations are simulated as the candidate axis and
+    patient combinations as the patient axis of one :func:`simulate_batch`
+    call, so a grid costs a few vectorized closed loops rather than one
+    simulation per point. All points share the same disturbance trace, which
+    keeps the surface smooth: neighbouring points differ only in their
+    parameters.
+
+    Queries interpolate multilinearly between the 2^d surrounding grid
+    points and take microseconds. Values outside the grid are clamped to
+    its edges. :meth:`refine` inserts midpoints along axes where a metric
+    changes steeply and simulates only the new points.
+
+    Build with :meth:`build`, persist with :meth:`save` / :meth:`load`.
+
+    Parameters
+    ----------
+    axes : dict
+        Axis name -> strictly increasing grid values (at least two each)
+    metrics : dict
+        Metric name -> array of shape ``tuple(len(v) for v in axes.values())``
+    config : dict
+        Simulation settings used to evaluate new points
+    drive : np.ndarray
+        Shared disturbance trace
+    """
+
+    def __init__(self, axes: Dict[str, np.ndarray], metrics: Dict[str, np.ndarray],
+                 config: Dict[str, Any], drive: np.ndarray):
+        self.axes = {name: np.asarray(values, dtype=float) for name, values in axes.items()}
+        for name, values in self.axes.items():
+            if values.ndim != 1 or len(values) < 2 or np.any(np.diff(values) <= 0):
+                raise ValueError(f"Axis '{name}' needs at least two increasing values")
+
+        self.metrics = {name: np.asarray(values) for name, values in metrics.items()}
+        self.config = config
+        self.drive = drive
+        self._prepare()
+
+    def _prepare(self):
+        """Precompute the lookup tables used by :meth:`query_batch`"""
+        shape = self.shape
+        self.names = tuple(self.axes)
+        self._table = np.stack([self.metrics[name].astype(np.float64).ravel()
+                                for name in METRICS])
+        self._strides = np.array([int(np.prod(shape[k + 1:])) for k in range(len(shape))])
+        self._corners = np.array(list(product((0, 1), repeat=len(shape))), dtype=bool)
+        self._offsets = self._corners.astype(int) @ self._strides
+        self._axis_lists = [values.tolist() for values in self.axes.values()]
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return tuple(len(values) for values in self.axes.values())
+
+    @property
+    def gain_axes(self) -> Dict[str, np.ndarray]:
+        return {name: v for name, v in self.axes.items() if name in self.config['gains']}
+
+    @property
+    def patient_axes(self) -> Dict[str, np.ndarray]:
+        return {name: v for name, v in self.axes.items() if name not in self.config['gains']}
+
+    @classmethod
+    def build(cls, kind: str, axes: Dict[str, Sequence[float]],
+              fixed: Optional[Dict[str, float]] = None,
+              duration_sec: float = 10.0,
+              target_ratio: float = 0.3,
+              max_stim: float = 5.0,
+              fluctuation: float = 0.2,
+              fluctuation_tau: float = 0.1,
+              drive: Optional[np.ndarray] = None,
+              dt: float = 0.001,
+              n_workers: int = 1,
+              seed: int = 0,
+              **nominal) -> 'ResponseSurface':
+        """
+        Evaluate every point of a grid
+
+        Parameters
+        ----------
+        kind : str
+            'pid' or 'lqr'
+        axes : dict
+            Grid values per axis; gain axes come from ``GAIN_AXES[kind]``,
+            patient axes from ``PATIENT_AXES``
+        fixed : dict, optional
+            Values of gains that are not on the grid (default:
+            ``GAIN_AXES[kind]``). LQR gains follow u = -K x, so gains that
+            suppress beta are negative
+        duration_sec : float
+            Closed-loop length per evaluation in seconds
+        target_ratio : float
+            Target beta as a fraction of each patient's beta0
+        max_stim : float
+            Stimulation limit in mA
+        fluctuation, fluctuation_tau : float
+            Size and correlation time of the shared synthetic disturbance
+        drive : np.ndarray, optional
+            Recorded beta trace to use as the disturbance instead
+        dt : float
+            Time step in seconds
+        n_workers : int
+            Worker processes; gain points are split between them
+        seed : int
+            Seed for the synthetic disturbance
+        **nominal
+            Values of patient parameters that are not on the grid
+
+        Returns
+        -------
+        ResponseSurface
+        """
+        kind = kind.lower()
+        if kind not in GAIN_AXES:
+            raise ValueError(f"Unknown controller kind: {kind}")
+        unknown = set(axes) - set(GAIN_AXES[kind]) - set(PATIENT_AXES)
+        if unknown:
+            raise ValueError(f"Unknown axes for {kind}: {sorted(unknown)}")
+
+        names = [n for n in GAIN_AXES[kind] if n in axes] + [n for n in PATIENT_AXES if n in axes]
+        if not any(n in PATIENT_AXES for n in names):
+            raise ValueError("At least one patient axis is required")
+        axes = {name: np.asarray(axes[name], dtype=float) for name in names}
+
+        n_steps = int(round(duration_sec / dt))
+        if drive is None:
+            drive = _shared_drive(n_steps, fluctuation, fluctuation_tau, dt, seed)
+
+        config = {
+            'kind': kind,
+            'gains': {**GAIN_AXES[kind], **(fixed or {})},
+            'patient': {**nominal, 'measurement_noise': 0.0},
+            'duration_sec': duration_sec,
+            'target_ratio': target_ratio,
+            'max_stim': max_stim,
+            'dt': dt,
+            'n_workers': n_workers,
+        }
+        drive = np.asarray(drive, dtype=float)
+        gain_axes = {n: v for n, v in axes.items() if n in config['gains']}
+        patient_axes = {n: v for n, v in axes.items() if n not in config['gains']}
+        block = _evaluate(_combos(gain_axes), _combos(patient_axes), config, drive)
+
+        shape = tuple(len(v) for v in axes.values())
+        metrics = {name: block[name].reshape(shape) for name in METRICS}
+        return cls(axes, metrics, config, drive)
+
+    def query(self, **params: float) -> Dict[str, float]:
+        """
+        Interpolated metrics at one point
+
+        Parameters
+        ----------
+        **params : float
+            A value for every axis, e.g. ``query(kp=3.0, ki=1.0, stim_gain=0.2)``
+
+        Returns
+        -------
+        dict
+            beta_reduction, energy, mean_stim and settling_time
+        """
+        missing = set(self.names) - set(params)
+        if missing:
+            raise ValueError(f"Missing values for axes: {sorted(missing)}")
+
+        # Scalar version of query_batch: bisect on lists beats NumPy calls here
+        base = 0
+        weights = [1.0]
+        for name, values, stride in zip(self.names, self._axis_lists, self._strides):
+            x = min(max(float(params[name]), values[0]), values[-1])
+            i = min(bisect_right(values, x) - 1, len(values) - 2)
+            f = (x - values[i]) / (values[i + 1] - values[i])
+            base += i * stride
+            weights = [w * g for w in weights for g in (1.0 - f, f)]
+
+        values = self._table[:, base + self._offsets] @ np.array(weights)
+        return dict(zip(METRICS, values.tolist()))
+
+    def query_batch(self, points: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Interpolated metrics at many points
+
+        Parameters
+        ----------
+        points : np.ndarray
+            Shape (n_points, n_axes), columns in the order of :attr:`names`
+
+        Returns
+        -------
+        dict
+            Metric name -> array of shape (n_points,)
+        """
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        base = np.zeros(len(points), dtype=int)
+        frac = np.empty(points.shape)
+        for k, values in enumerate(self.axes.values()):
+            x = np.clip(points[:, k], values[0], values[-1])
+            i = np.minimum(np.searchsorted(values, x, side='right') - 1, len(values) - 2)
+            frac[:, k] = (x - values[i]) / (values[i + 1] - values[i])
+            base += i * self._strides[k]
+
+        weights = np.where(self._corners[None], frac[:, None, :], 1.0 - frac[:, None, :]).prod(axis=2)
+        corners = self._table[:, base[:, None] + self._offsets[None, :]]
+        values = np.einsum('mnc,nc->mn', corners, weights)
+        return dict(zip(METRICS, values))
+
+    def refine(self, tolerance: float = 0.1,
+               refine_on: Sequence[str] = ('beta_reduction', 'energy'),
+               max_rounds: int = 3,
+               max_points: int = 200_000,
+               log_axes: Sequence[str] = ()) -> int:
+        """
+        Add grid lines where the surface is steep
+
+        An interval of an axis is split at its midpoint when, somewhere on
+        the grid, one of the ``refine_on`` metrics changes across it by more
+        than ``tolerance`` times that metric's range. Only the new points
+        are simulated; existing values are kept.
+
+        Parameters
+        ----------
+        tolerance : float
+            Allowed change per interval as a fraction of the metric range
+        refine_on : sequence of str
+            Metrics that drive refinement
+        max_rounds : int
+            Refinement passes
+        max_points : int
+            Stop before the grid would exceed this many points
+        log_axes : sequence of str
+            Axes split at the geometric rather than arithmetic midpoint
+
+        Returns
+        -------
+        int
+            Number of newly simulated points
+        """
+        n_new = 0
+        for _ in range(max_rounds):
+            new_axes = {}
+            for k, (name, values) in enumerate(self.axes.items()):
+                steep = np.zeros(len(values) - 1, dtype=bool)
+                for metric in refine_on:
+                    surface = self.metrics[metric]
+                    span = np.ptp(surface) or 1.0
+                    change = np.abs(np.diff(surface, axis=k)) / span
+                    other = tuple(j for j in range(surface.ndim) if j != k)
+                    steep |= change.max(axis=other) > tolerance
+
+                lo, hi = values[:-1][steep], values[1:][steep]
+                if name in log_axes and lo.min(initial=1.0) > 0:
+                    mid = np.sqrt(lo * hi)
+                else:
+                    mid = (lo + hi) / 2
+                if name == 'delay_steps':
+                    mid = np.round(mid)
+                new_axes[name] = np.union1d(values, mid)
+
+            new_shape = tuple(len(v) for v in new_axes.values())
+            if new_shape == self.shape or np.prod(new_shape) > max_points:
+                break
+            n_new += self._extend(new_axes)
+        return n_new
+
+    def _extend(self, new_axes: Dict[str, np.ndarray]) -> int:
+        """Move to a finer grid, simulating only points not already known"""
+        shape = tuple(len(v) for v in new_axes.values())
+        positions = [np.searchsorted(new_axes[name], old) for name, old in self.axes.items()]
+        metrics = {}
+        for name in METRICS:
+            metrics[name] = np.full(shape, np.nan, dtype=self.metrics[name].dtype)
+            metrics[name][np.ix_(*positions)] = self.metrics[name]
+
+        gain_names = [n for n in new_axes if n in self.config['gains']]
+        patient_names = [n for n in new_axes if n not in self.config['gains']]
+
+        def split(names):
+            # Flat combo indices of the sub-grid, and which combos are new
+            sub = {n: new_axes[n] for n in names}
+            known = [np.isin(new_axes[n], self.axes[n]) for n in names]
+            old = np.ones(1, dtype=bool)
+            for k in known:
+                old = np.logical_and.outer(old, k).ravel()
+            return _combos(sub), old
+
+        gains, gains_old = split(gain_names)
+        patients, patients_old = split(patient_names)
+        n_gain_points = len(gains_old)
+
+        flat = {name: m.reshape(n_gain_points, -1) for name, m in metrics.items()}
+        blocks = [(~gains_old, np.ones_like(patients_old)), (gains_old, ~patients_old)]
+        n_new = 0
+        for gain_mask, patient_mask in blocks:
+            if not gain_mask.any() or not patient_mask.any():
+                continue
+            block = _evaluate({n: v[gain_mask] for n, v in gains.items()},
+                              {n: v[patient_mask] for n, v in patients.items()},
+                              self.config, self.drive)
+            for name in METRICS:
+                flat[name][np.ix_(gain_mask, patient_mask)] = block[name].reshape(
+                    gain_mask.sum(), patient_mask.sum())
+            n_new += int(gain_mask.sum() * patient_mask.sum())
+
+        self.axes = {name: np.asarray(v, dtype=float) for name, v in new_axes.items()}
+        self.metrics = metrics
+        self._prepare()
+        return n_new
+
+    def save(self, path: Union[str, Path]):
+        """
+        Write axes, metrics, settings and the disturbance to one ``.npz`` file
+
+        Everything is stored at full precision, so :meth:`refine` after
+        :meth:`load` simulates new points on exactly the same disturbance
+        and refines exactly as the original surface would.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {f'axis/{name}': values for name, values in self.axes.items()}
+        arrays.update({f'metric/{name}': values for name, values in self.metrics.items()})
+        config = {**self.config, 'axes': list(self.axes)}
+
+        tmp_path = path.with_name(path.stem + '.tmp.npz')
+        np.savez_compressed(tmp_path, __config__=np.array(json.dumps(config)),
+                            drive=self.drive, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'ResponseSurface':
+        """Read a surface written by :meth:`save`"""
+        with np.load(path) as data:
+            config = json.loads(str(data['__config__']))
+            names = config.pop('axes')
+            axes = {name: data[f'axis/{name}'] for name in names}
+            metrics = {name: data[f'metric/{name}'] for name in METRICS}
+            drive = data['drive']
+        return cls(axes, metrics, config, drive)
+
+    def __repr__(self) -> str:
+        axes = ', '.join(f"{name}={len(v)}" for name, v in self.axes.items())
+        return f"ResponseSurface({self.config['kind']}, {axes})"
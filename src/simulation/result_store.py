@@ -0,0 +1,179 @@
+"""
+Chunked Result Store
+On-disk storage for long simulation runs without holding full arrays in memory
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple, Union
+
+import numpy as np
+
+from src.precision import get_dtype
+
+
+class ResultStore:
+    """
+    Directory of memory-mapped ``.npy`` arrays plus a JSON summary
+
+    Each time series (time, beta_power, stimulation, ...) lives in its own
+    ``<name>.npy`` file that is opened with ``mmap_mode``, so hour-long runs
+    at 1 kHz can be written and read chunk by chunk. Scalar metrics
+    (beta_reduction, energy, dt, ...) go to ``summary.json``.
+
+    Parameters
+    ----------
+    path : str or Path
+        Store directory
+    mode : str
+        'r' to read an existing store, 'w' to create/overwrite arrays
+    """
+
+    SUMMARY_FILE = 'summary.json'
+
+    def __init__(self, path: Union[str, Path], mode: str = 'r'):
+        if mode not in ('r', 'w'):
+            raise ValueError(f"Unknown mode: {mode}")
+
+        self.path = Path(path)
+        self.mode = mode
+
+        if mode == 'w':
+            self.path.mkdir(parents=True, exist_ok=True)
+        elif not self.path.is_dir():
+            raise FileNotFoundError(f"Result store not found: {self.path}")
+
+        self._summary = self._read_summary()
+
+    def _read_summary(self) -> Dict[str, Any]:
+        summary_path = self.path / self.SUMMARY_FILE
+        if summary_path.exists():
+            return json.loads(summary_path.read_text())
+        return {}
+
+    def create_array(self, name: str, length: int,
+                     dtype: Any = None) -> np.memmap:
+        """
+        Allocate a 1-D array on disk and return it as a writable memmap
+
+        Parameters
+        ----------
+        name : str
+            Array name (file stem)
+        length : int
+            Number of samples
+        dtype : numpy dtype, optional
+            Storage type (default: current precision, see
+            :func:`src.precision.set_precision`)
+
+        Returns
+        -------
+        np.memmap
+            Writable view; assign slices to fill it chunk by chunk
+        """
+        if self.mode != 'w':
+            raise PermissionError("Result store opened read-only")
+        return np.lib.format.open_memmap(
+            self.path / f'{name}.npy', mode='w+', dtype=dtype or get_dtype(), shape=(length,)
+        )
+
+    def open_array(self, name: str) -> np.memmap:
+        """
+        Reopen an existing array for writing, e.g. to resume a run
+
+        Returns
+        -------
+        np.memmap
+            Writable view of ``<name>.npy``
+        """
+        if self.mode != 'w':
+            raise PermissionError("Result store opened read-only")
+        return np.load(self.path / f'{name}.npy', mmap_mode='r+')
+
+    def write_summary(self, **values):
+        """Merge scalar values into summary.json"""
+        if self.mode != 'w':
+            raise PermissionError("Result store opened read-only")
+        for key, value in values.items():
+            self._summary[key] = value.item() if isinstance(value, np.generic) else value
+        (self.path / self.SUMMARY_FILE).write_text(json.dumps(self._summary, indent=2))
+
+    @property
+    def summary(self) -> Dict[str, Any]:
+        """Scalar metrics stored with the run"""
+        return dict(self._summary)
+
+    def keys(self) -> List[str]:
+        """Names of stored arrays and summary values"""
+        arrays = sorted(p.stem for p in self.path.glob('*.npy'))
+        return arrays + [k for k in self._summary if k not in arrays]
+
+    def __contains__(self, name: str) -> bool:
+        return (self.path / f'{name}.npy').exists() or name in self._summary
+
+    def __getitem__(self, name: str) -> Any:
+        array_path = self.path / f'{name}.npy'
+        if array_path.exists():
+            return np.load(array_path, mmap_mode='r')
+        if name in self._summary:
+            return self._summary[name]
+        raise KeyError(name)
+
+    @classmethod
+    def from_npz(cls, npz_path: Union[str, Path],
+                 path: Union[str, Path]) -> 'ResultStore':
+        """
+        Convert a notebook-style ``.npz`` result file into a chunked store
+
+        Arrays become ``.npy`` files; 0-d entries go to the summary.
+        """
+        store = cls(path, mode='w')
+        with np.load(npz_path) as data:
+            scalars = {}
+            for key in data.files:
+                value = data[key]
+                if value.ndim == 0:
+                    scalars[key] = value.item()
+                else:
+                    np.save(store.path / f'{key}.npy', value)
+            store.write_summary(**scalars)
+        return cls(path, mode='r')
+
+    def __repr__(self) -> str:
+        return f"ResultStore(path='{self.path}', mode='{self.mode}')"
+
+
+def open_results(path: Union[str, Path]):
+    """
+    Open a result file lazily
+
+    Parameters
+    ----------
+    path : str or Path
+        A ResultStore directory, a ``.npz`` archive or a single ``.npy`` file
+
+    Returns
+    -------
+    mapping
+        Object supporting ``result[key]``; arrays are memory-mapped where the
+        format allows it (npz members are only read when accessed)
+    """
+    path = Path(path)
+    if path.is_dir():
+        return ResultStore(path, mode='r')
+    return np.load(path, mmap_mode='r')
+
+
+def iter_chunks(array: np.ndarray, chunk_size: int = 1_000_000,
+                start: int = 0, stop: int = None) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Iterate over a (memory-mapped) array in contiguous chunks
+
+    Yields
+    ------
+    tuple
+        (offset, chunk) with chunk materialized as an in-memory array
+    """
+    stop = len(array) if stop is None else min(stop, len(array))
+    for offset in range(start, stop, chunk_size):
+        yield offset, np.asarray(array[offset:min(offset + chunk_size, stop)])
@@ -0,0 +1,596 @@
+"""
+Level-of-Detail Plotting
+Min/max decimation pyramids for plotting long closed-loop runs
+"""
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from src.simulation.closed_loop import compute_metrics
+from src.simulation.result_store import iter_chunks, open_results
+
+
+class MinMaxPyramid:
+    """
+    Min/max envelope pyramid for a uniformly sampled time series
+
+    Level 0 stores the minimum and maximum of every ``base_block`` samples,
+    each further level merges ``factor`` buckets of the level below. A view
+    of any width is drawn from the finest level that has at most one bucket
+    per pixel, so peaks are never lost while at most ~2 points per pixel are
+    handed to matplotlib. When zoomed in far enough the raw samples
+    are read straight from the (memory-mapped) source array.
+
+    Parameters
+    ----------
+    levels : list of tuple
+        (mins, maxs) arrays per level, finest first
+    n_samples : int
+        Length of the source series
+    t0 : float
+        Time of the first sample in seconds
+    dt : float
+        Sampling interval in seconds
+    base_block : int
+        Samples per bucket at level 0
+    factor : int
+        Bucket merge factor between consecutive levels
+    source : array-like, optional
+        Original series for full-resolution rendering
+    """
+
+    def __init__(self, levels: List[Tuple[np.ndarray, np.ndarray]],
+                 n_samples: int, t0: float = 0.0, dt: float = 0.001,
+                 base_block: int = 16, factor: int = 4,
+                 source: Optional[np.ndarray] = None):
+        self.levels = levels
+        self.n_samples = int(n_samples)
+        self.t0 = float(t0)
+        self.dt = float(dt)
+        self.base_block = int(base_block)
+        self.factor = int(factor)
+        self.source = source
+
+    @classmethod
+    def build(cls, data: np.ndarray, t0: float = 0.0, dt: float = 0.001,
+              base_block: int = 16, factor: int = 4,
+              chunk_size: int = 1_048_576) -> 'MinMaxPyramid':
+        """
+        Build a pyramid in a single chunked pass over ``data``
+
+        Parameters
+        ----------
+        data : array-like
+            1-D series; a memmap is read chunk by chunk
+        t0, dt : float
+            Time of the first sample and sampling interval (s)
+        base_block : int
+            Samples per bucket at level 0
+        factor : int
+            Merge factor between levels
+        chunk_size : int
+            Samples read per chunk (rounded to a multiple of base_block)
+
+        Returns
+        -------
+        MinMaxPyramid
+        """
+        if base_block < 1 or factor < 2:
+            raise ValueError("base_block must be >= 1 and factor >= 2")
+
+        n = len(data)
+        n_blocks = -(-n // base_block)
+        mins = np.empty(n_blocks, dtype=data.dtype)
+        maxs = np.empty(n_blocks, dtype=data.dtype)
+
+        chunk_size = max(base_block, chunk_size // base_block * base_block)
+        for offset, chunk in iter_chunks(data, chunk_size):
+            b0 = offset // base_block
+            mn, mx = _reduce_minmax(chunk, chunk, base_block)
+            mins[b0:b0 + len(mn)] = mn
+            maxs[b0:b0 + len(mx)] = mx
+
+        levels = [(mins, maxs)]
+        while len(levels[-1][0]) > factor:
+            levels.append(_reduce_minmax(*levels[-1], factor))
+
+        return cls(levels, n, t0=t0, dt=dt, base_block=base_block,
+                   factor=factor, source=data)
+
+    def block_size(self, level: int) -> int:
+        """Number of source samples per bucket at ``level``"""
+        return self.base_block * self.factor ** level
+
+    @property
+    def t_end(self) -> float:
+        """Time of the last sample"""
+        return self.t0 + (self.n_samples - 1) * self.dt
+
+    def _sample_range(self, t_start: Optional[float],
+                      t_end: Optional[float]) -> Tuple[int, int]:
+        i0 = 0 if t_start is None else int(np.floor((t_start - self.t0) / self.dt))
+        i1 = self.n_samples if t_end is None else int(np.ceil((t_end - self.t0) / self.dt)) + 1
+        i0 = int(np.clip(i0, 0, self.n_samples))
+        i1 = int(np.clip(i1, i0, self.n_samples))
+        return i0, i1
+
+    def _select_level(self, span: int, width: int) -> int:
+        for level in range(len(self.levels)):
+            if -(-span // self.block_size(level)) <= width:
+                return level
+        return len(self.levels) - 1
+
+    def _buckets(self, t_start, t_end, width):
+        i0, i1 = self._sample_range(t_start, t_end)
+        level = self._select_level(i1 - i0, width)
+        block = self.block_size(level)
+        b0, b1 = i0 // block, -(-i1 // block)
+        mins, maxs = self.levels[level]
+        t_bucket = self.t0 + np.arange(b0, b1) * block * self.dt
+        return t_bucket, block, mins[b0:b1], maxs[b0:b1]
+
+    def render(self, t_start: Optional[float] = None,
+               t_end: Optional[float] = None,
+               width: int = 1000) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Points needed to draw the series over a view ``width`` pixels wide
+
+        Parameters
+        ----------
+        t_start, t_end : float, optional
+            Visible time range (defaults to the whole series)
+        width : int
+            View width in pixels
+
+        Returns
+        -------
+        tuple
+            (t, y) arrays with at most ~2 points per pixel; min and max of
+            each bucket alternate so the line traces the full envelope
+        """
+        width = max(int(width), 1)
+        i0, i1 = self._sample_range(t_start, t_end)
+        if self.source is not None and i1 - i0 <= 2 * width:
+            t = self.t0 + np.arange(i0, i1) * self.dt
+            return t, np.asarray(self.source[i0:i1])
+
+        t_bucket, block, mins, maxs = self._buckets(t_start, t_end, width)
+        t = np.empty(2 * len(t_bucket))
+        y = np.empty(2 * len(t_bucket), dtype=mins.dtype)
+        t[0::2] = t_bucket
+        t[1::2] = t_bucket + 0.5 * block * self.dt
+        y[0::2] = mins
+        y[1::2] = maxs
+        return t, y
+
+    def envelope(self, t_start: Optional[float] = None,
+                 t_end: Optional[float] = None,
+                 width: int = 1000) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Per-bucket (t, min, max) for ``fill_between`` style plots
+
+        Returns
+        -------
+        tuple
+            (t, lower, upper) arrays with roughly one bucket per pixel
+        """
+        t_bucket, _, mins, maxs = self._buckets(t_start, t_end, max(int(width), 1))
+        return t_bucket, mins, maxs
+
+    def save(self, path: Union[str, Path]):
+        """Save pyramid levels (not the source) to an ``.npz`` file"""
+        arrays = {}
+        for i, (mins, maxs) in enumerate(self.levels):
+            arrays[f'min_{i}'] = mins
+            arrays[f'max_{i}'] = maxs
+        np.savez(path, n_levels=len(self.levels), n_samples=self.n_samples,
+                 t0=self.t0, dt=self.dt, base_block=self.base_block,
+                 factor=self.factor, **arrays)
+
+    @classmethod
+    def load(cls, path: Union[str, Path],
+             source: Optional[np.ndarray] = None) -> 'MinMaxPyramid':
+        """Load a pyramid saved with :meth:`save`"""
+        with np.load(path) as data:
+            levels = [(data[f'min_{i}'], data[f'max_{i}'])
+                      for i in range(int(data['n_levels']))]
+            return cls(levels, int(data['n_samples']), t0=float(data['t0']),
+                       dt=float(data['dt']), base_block=int(data['base_block']),
+                       factor=int(data['factor']), source=source)
+
+    def __repr__(self) -> str:
+        return (f"MinMaxPyramid(n_samples={self.n_samples}, "
+                f"levels={len(self.levels)}, base_block={self.base_block})")
+
+
+class SpectrogramPyramid:
+    """
+    Time-decimation pyramid for spectrogram power matrices
+
+    Each level merges ``factor`` adjacent columns, keeping either the maximum
+    (preserves short bursts) or the mean power per frequency bin.
+
+    Parameters
+    ----------
+    freqs : np.ndarray
+        Frequency of each row (Hz)
+    levels : list of tuple
+        (times, Sxx) per level, finest first; Sxx has shape (freqs, columns)
+    factor : int
+        Column merge factor between levels
+    """
+
+    def __init__(self, freqs: np.ndarray,
+                 levels: List[Tuple[np.ndarray, np.ndarray]],
+                 factor: int = 2):
+        self.freqs = np.asarray(freqs)
+        self.levels = levels
+        self.factor = int(factor)
+
+    @classmethod
+    def build(cls, sxx: np.ndarray, freqs: np.ndarray, times: np.ndarray,
+              factor: int = 2, reduce: str = 'max',
+              chunk_columns: int = 8192) -> 'SpectrogramPyramid':
+        """
+        Build from a (possibly memory-mapped) spectrogram
+
+        Parameters
+        ----------
+        sxx : array-like
+            Power matrix of shape (len(freqs), len(times))
+        freqs, times : np.ndarray
+            Row frequencies and column times as returned by
+            ``scipy.signal.spectrogram``
+        factor : int
+            Column merge factor
+        reduce : str
+            'max' or 'mean'
+        chunk_columns : int
+            Columns read per chunk when building the first reduced level
+        """
+        if reduce not in ('max', 'mean'):
+            raise ValueError(f"Unknown reduction: {reduce}")
+
+        times = np.asarray(times)
+        levels = [(times, sxx)]
+        chunk_columns = max(factor, chunk_columns // factor * factor)
+
+        while len(levels[-1][0]) > factor:
+            prev_times, prev_sxx = levels[-1]
+            n_cols = -(-len(prev_times) // factor)
+            merged = np.empty((sxx.shape[0], n_cols), dtype=sxx.dtype)
+            for c0 in range(0, len(prev_times), chunk_columns):
+                block = np.asarray(prev_sxx[:, c0:c0 + chunk_columns])
+                merged[:, c0 // factor:c0 // factor + -(-block.shape[1] // factor)] = \
+                    _reduce_columns(block, factor, reduce)
+            merged_times = _reduce_columns(prev_times[None, :], factor, 'mean')[0]
+            levels.append((merged_times, merged))
+
+        return cls(freqs, levels, factor=factor)
+
+    def render(self, t_start: Optional[float] = None,
+               t_end: Optional[float] = None, width: int = 1000,
+               f_min: Optional[float] = None,
+               f_max: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Columns needed to draw a view ``width`` pixels wide
+
+        Returns
+        -------
+        tuple
+            (times, freqs, Sxx) restricted to the requested ranges
+        """
+        width = max(int(width), 1)
+        f_mask = np.ones(len(self.freqs), dtype=bool)
+        if f_min is not None:
+            f_mask &= self.freqs >= f_min
+        if f_max is not None:
+            f_mask &= self.freqs <= f_max
+
+        # Finest level with at most one column per pixel
+        chosen = len(self.levels) - 1
+        for level, (times, _) in enumerate(self.levels):
+            lo = 0 if t_start is None else np.searchsorted(times, t_start, 'left')
+            hi = len(times) if t_end is None else np.searchsorted(times, t_end, 'right')
+            if hi - lo <= width:
+                chosen = level
+                break
+
+        times, sxx = self.levels[chosen]
+        lo = 0 if t_start is None else max(np.searchsorted(times, t_start, 'left') - 1, 0)
+        hi = len(times) if t_end is None else np.searchsorted(times, t_end, 'right') + 1
+        return times[lo:hi], self.freqs[f_mask], np.asarray(sxx[f_mask][:, lo:hi])
+
+    def __repr__(self) -> str:
+        return (f"SpectrogramPyramid(freqs={len(self.freqs)}, "
+                f"columns={len(self.levels[0][0])}, levels={len(self.levels)})")
+
+
+def _reduce_minmax(mins: np.ndarray, maxs: np.ndarray,
+                   block: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Min/max over consecutive blocks, padding the tail with edge values"""
+    n_blocks = -(-len(mins) // block)
+    pad = n_blocks * block - len(mins)
+    if pad:
+        mins = np.concatenate([mins, np.full(pad, mins[-1], dtype=mins.dtype)])
+        maxs = np.concatenate([maxs, np.full(pad, maxs[-1], dtype=maxs.dtype)])
+    return (mins.reshape(n_blocks, block).min(axis=1),
+            maxs.reshape(n_blocks, block).max(axis=1))
+
+
+def _reduce_columns(block: np.ndarray, factor: int, reduce: str) -> np.ndarray:
+    """Merge groups of ``factor`` columns; a short tail group is reduced as-is"""
+    n_full = block.shape[1] // factor * factor
+    head = block[:, :n_full].reshape(block.shape[0], -1, factor)
+    head = head.max(axis=2) if reduce == 'max' else head.mean(axis=2)
+    if n_full == block.shape[1]:
+        return head
+    tail = block[:, n_full:]
+    tail = tail.max(axis=1) if reduce == 'max' else tail.mean(axis=1)
+    return np.concatenate([head, tail[:, None]], axis=1)
+
+
+def _timing(results) -> Tuple[float, float]:
+    """(t0, dt) of a result file from its time axis or stored summary"""
+    if 'time' in _keys(results):
+        time = results['time']
+        if len(time) > 1:
+            return float(time[0]), float(time[1] - time[0])
+    if 'dt' in _keys(results):
+        return 0.0, float(results['dt'])
+    return 0.0, 0.001
+
+
+def _keys(results) -> List[str]:
+    return list(results.files) if hasattr(results, 'files') else list(results.keys())
+
+
+def load_pyramid(results_path: Union[str, Path], key: str,
+                 **build_kwargs) -> MinMaxPyramid:
+    """
+    Pyramid for one series of a result file, cached next to chunked stores
+
+    For a :class:`~src.simulation.result_store.ResultStore` directory the
+    pyramid is saved as ``<key>.lod.npz`` and reused while it is newer than
+    the series; ``.npz`` archives are decimated in memory.
+    """
+    results_path = Path(results_path)
+    results = open_results(results_path)
+    data = results[key]
+    t0, dt = _timing(results)
+
+    if not results_path.is_dir():
+        return MinMaxPyramid.build(data, t0=t0, dt=dt, **build_kwargs)
+
+    cache = results_path / f'{key}.lod.npz'
+    series = results_path / f'{key}.npy'
+    if cache.exists() and cache.stat().st_mtime >= series.stat().st_mtime:
+        return MinMaxPyramid.load(cache, source=data)
+
+    pyramid = MinMaxPyramid.build(data, t0=t0, dt=dt, **build_kwargs)
+    try:
+        pyramid.save(cache)
+    except OSError:
+        pass
+    return pyramid
+
+
+def run_metrics(results, beta_key: str, mean_beta: float,
+                target: float) -> Dict[str, Any]:
+    """
+    :func:`~src.simulation.closed_loop.compute_metrics` for a result file
+
+    Uses the stored time axis when present, so the figure reports the same
+    numbers as the run's own metrics.
+    """
+    beta = results[beta_key]
+    if 'time' in _keys(results):
+        time = results['time']
+    else:
+        t0, dt = _timing(results)
+        time = t0 + np.arange(len(beta)) * dt
+    return compute_metrics(time, beta, results['stimulation'], mean_beta, target)
+
+
+def plot_lod(ax, pyramid: MinMaxPyramid, *args, width: Optional[int] = None,
+             **kwargs):
+    """
+    Plot a pyramid as a line that re-decimates when the x-limits change
+
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+        Target axes
+    pyramid : MinMaxPyramid
+        Series to draw
+    width : int, optional
+        Render width in pixels (defaults to the axes' pixel width)
+    *args, **kwargs
+        Passed to ``ax.plot``
+
+    Returns
+    -------
+    matplotlib.lines.Line2D
+    """
+    def _width():
+        return width or max(int(ax.bbox.width), 100)
+
+    t, y = pyramid.render(width=_width())
+    line, = ax.plot(t, y, *args, **kwargs)
+
+    def _on_xlim(axes):
+        lo, hi = axes.get_xlim()
+        line.set_data(*pyramid.render(lo, hi, _width()))
+
+    ax.callbacks.connect('xlim_changed', _on_xlim)
+    return line
+
+
+def fill_lod(ax, pyramid: MinMaxPyramid, width: Optional[int] = None,
+             **kwargs):
+    """
+    ``fill_between(t, 0, y)`` using the upper envelope of a pyramid
+
+    Drawn as a single polygon whose vertices are replaced when the x-limits
+    change, so panning does not add artists or re-trigger autoscaling.
+    """
+    def _verts(lo=None, hi=None):
+        t, _, upper = pyramid.envelope(lo, hi, width or max(int(ax.bbox.width), 100))
+        if len(t) == 0:
+            return np.empty((0, 2))
+        block = t[1] - t[0] if len(t) > 1 else pyramid.dt
+        edges = np.repeat(np.append(t, t[-1] + block), 2)[1:-1]
+        x = np.concatenate([[edges[0]], edges, [edges[-1]]])
+        y = np.concatenate([[0.0], np.repeat(upper, 2), [0.0]])
+        return np.column_stack([x, y])
+
+    patch, = ax.fill(*_verts().T, **kwargs)
+
+    def _on_xlim(axes):
+        lo, hi = axes.get_xlim()
+        patch.set_xy(_verts(lo, hi))
+
+    ax.callbacks.connect('xlim_changed', _on_xlim)
+    return patch
+
+
+def plot_controller_comparison(runs: Sequence[Dict[str, Any]],
+                               baseline_path: Union[str, Path],
+                               target: Optional[float] = None,
+                               save_path: Optional[Union[str, Path]] = None,
+                               dpi: int = 300,
+                               max_stim: float = 5.0):
+    """
+    Side-by-side controller comparison figure rendered from pyramids
+
+    Series in :class:`~src.simulation.result_store.ResultStore` directories
+    are memory-mapped and decimated chunk by chunk, without loading the full
+    arrays. ``.npz`` archives cannot be memory-mapped, so each series plotted
+    from one is read into memory whole. The metrics panel uses
+    :func:`~src.simulation.closed_loop.compute_metrics`, which reads the beta
+    and stimulation traces of every run once.
+
+    Parameters
+    ----------
+    runs : sequence of dict
+        One entry per controller with keys 'label', 'path', 'beta_key' and
+        'color'
+    baseline_path : str or Path
+        Open-loop baseline (``baseline_data.npz`` or a chunked store)
+    target : float, optional
+        Target beta power (defaults to 30% of the baseline mean)
+    save_path : str or Path, optional
+        Where to save the figure
+    dpi : int
+        Output resolution
+
+    Returns
+    -------
+    tuple
+        (figure, metrics) where metrics maps label -> run_metrics dict
+    """
+    import matplotlib.pyplot as plt
+
+    baseline = open_results(baseline_path)
+    mean_beta = float(baseline['mean_beta_power'])
+    if target is None:
+        target = mean_beta * 0.3
+
+    n_runs = len(runs)
+    fig, axes = plt.subplots(3, n_runs, figsize=(8 * n_runs, 12), squeeze=False)
+    fig.set_dpi(dpi)
+    column_px = fig.get_figwidth() * dpi / n_runs
+
+    baseline_lod = load_pyramid(baseline_path, 'beta_power')
+    metrics = {}
+
+    for col, run in enumerate(runs):
+        label, color = run['label'], run.get('color', 'b')
+        results = open_results(run['path'])
+        metrics[label] = run_metrics(results, run['beta_key'], mean_beta, target)
+
+        beta_lod = load_pyramid(run['path'], run['beta_key'])
+        stim_lod = load_pyramid(run['path'], 'stimulation')
+
+        ax = axes[0, col]
+        plot_lod(ax, baseline_lod, color='gray', alpha=0.5, linewidth=1,
+                 label='Open-Loop', width=column_px)
+        plot_lod(ax, beta_lod, color=color, linewidth=1, label=label,
+                 width=column_px)
+        ax.axhline(target, color='g', linestyle='--', label='Target')
+        ax.set_title(f'{label} Controller', fontsize=14, fontweight='bold')
+        ax.set_xlabel('Time (s)')
+        ax.set_ylabel('Beta Power')
+        ax.legend()
+        ax.grid(True, alpha=0.3)
+
+        ax = axes[1, col]
+        plot_lod(ax, stim_lod, color=color, linewidth=1, width=column_px)
+        fill_lod(ax, stim_lod, alpha=0.3, color=color, width=column_px)
+        ax.axhline(max_stim, color='r', linestyle='--', label='Max Limit')
+        ax.set_title(f'{label} Stimulation', fontsize=14, fontweight='bold')
+        ax.set_xlabel('Time (s)')
+        ax.set_ylabel('Stimulation (mA)')
+        ax.legend()
+        ax.grid(True, alpha=0.3)
+
+    names = ['Beta\nReduction (%)', 'Energy\nConsumption', 'Mean\nStim (mA)']
+    x = np.arange(len(names))
+    bar_width = 0.8 / n_runs
+    ax = axes[2, 0]
+    for i, run in enumerate(runs):
+        m = metrics[run['label']]
+        values = [m['beta_reduction'], m['energy'] / 10, m['mean_stim']]
+        ax.bar(x + (i - (n_runs - 1) / 2) * bar_width, values, bar_width,
+               label=run['label'], color=run.get('color', 'b'), alpha=0.7)
+    ax.set_title('Performance Comparison', fontsize=14, fontweight='bold')
+    ax.set_ylabel('Value')
+    ax.set_xticks(x)
+    ax.set_xticklabels(names)
+    ax.legend()
+    ax.grid(True, alpha=0.3, axis='y')
+
+    if n_runs > 1:
+        ax = axes[2, 1]
+        ax.axis('off')
+        labels = [run['label'] for run in runs]
+        table_data = [['Metric'] + labels]
+        for name, key in [('Beta Reduction', 'beta_reduction'),
+                          ('Energy', 'energy'), ('Mean Stim', 'mean_stim')]:
+            table_data.append([name] + [f"{metrics[l][key]:.2f}" for l in labels])
+        table = ax.table(cellText=table_data, cellLoc='center', loc='center')
+        table.auto_set_font_size(False)
+        table.set_fontsize(11)
+        table.scale(1, 2)
+        for i in range(len(labels) + 1):
+            table[(0, i)].set_facecolor('#4CAF50')
+            table[(0, i)].set_text_props(weight='bold', color='white')
+    for col in range(2, n_runs):
+        axes[2, col].axis('off')
+
+    fig.tight_layout()
+    if save_path is not None:
+        fig.savefig(save_path, dpi=dpi, bbox_inches='tight')
+    return fig, metrics
+
+
+def plot_pid_vs_lqr(pid_path: Union[str, Path], lqr_path: Union[str, Path],
+                    baseline_path: Union[str, Path], **kwargs):
+    """Regenerate the PID vs LQR comparison figure from result files"""
+    runs = [
+        {'label': 'PID', 'path': pid_path, 'beta_key': 'beta_power', 'color': 'b'},
+        {'label': 'LQR', 'path': lqr_path, 'beta_key': 'beta_power', 'color': 'r'},
+    ]
+    return plot_controller_comparison(runs, baseline_path, **kwargs)
+
+
+def plot_ml_vs_lqr(ml_path: Union[str, Path], lqr_path: Union[str, Path],
+                   baseline_path: Union[str, Path], **kwargs):
+    """Regenerate the ML-enhanced vs LQR comparison figure from result files"""
+    runs = [
+        {'label': 'LQR', 'path': lqr_path, 'beta_key': 'beta_power', 'color': 'r'},
+        {'label': 'ML-Enhanced', 'path': ml_path, 'beta_key': 'beta_true', 'color': 'g'},
+    ]
+    return plot_controller_comparison(runs, baseline_path, **kwargs)
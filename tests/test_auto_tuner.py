@@ -0,0 +1,90 @@
+"""
+Tests for the successive-halving auto-tuner and its evaluation cache
+"""
+
+import numpy as np
+import pytest
+
+from src.controllers.auto_tuner import PID_BOUNDS, AutoTuner
+from src.models.brain_dynamics import PatientPopulation
+from src.simulation.closed_loop import METRICS
+
+
+CANDIDATES = np.array([[2.0, 0.5, 0.01], [5.0, 1.0, 0.0]])
+
+
+def make_tuner(**kwargs) -> AutoTuner:
+    kwargs.setdefault('n_patients', 4)
+    return AutoTuner(duration_sec=0.2, n_workers=1, **kwargs)
+
+
+class ToyTuner(AutoTuner):
+    """Tuner whose cost is the distance to a known optimum"""
+
+    OPTIMUM = np.array([4.0, 2.0, 0.1])
+
+    def evaluate(self, kind, candidates, duration_sec=None):
+        candidates = np.atleast_2d(candidates)
+        costs = np.sum(((candidates - self.OPTIMUM) / [20.0, 10.0, 0.5])**2, axis=1)
+        metrics = {name: np.zeros(len(candidates)) for name in METRICS}
+        return costs, metrics
+
+
+def test_cache_hit_for_same_setup(tmp_path):
+    cache_path = tmp_path / 'cache.json'
+    first = make_tuner(cache_path=cache_path)
+    costs, _ = first.evaluate('pid', CANDIDATES)
+    assert first.n_evaluations == 2
+
+    second = make_tuner(cache_path=cache_path)
+    cached, _ = second.evaluate('pid', CANDIDATES)
+    assert second.n_evaluations == 0
+    assert second.cache_hits == 2
+    np.testing.assert_array_equal(cached, costs)
+
+
+@pytest.mark.parametrize('change', [
+    {'target_ratio': 0.5},
+    {'max_stim': 3.0},
+    {'seed': 1},
+    {'n_patients': 5},
+], ids=['target', 'max_stim', 'cohort', 'size'])
+def test_cache_miss_for_changed_setup(tmp_path, change):
+    cache_path = tmp_path / 'cache.json'
+    make_tuner(cache_path=cache_path).evaluate('pid', CANDIDATES)
+
+    changed = make_tuner(cache_path=cache_path, **change)
+    changed.evaluate('pid', CANDIDATES)
+    assert changed.cache_hits == 0
+    assert changed.n_evaluations == 2
+
+
+def test_lqr_cache_depends_on_plant(tmp_path):
+    cache_path = tmp_path / 'cache.json'
+    weights = np.array([[100.0, 1.0, 0.1]])
+    A = np.array([[0.0, 1.0], [-1e4, -40.0]])
+    B = np.array([[0.0], [-10.0]])
+    make_tuner(cache_path=cache_path).evaluate('lqr', weights)
+
+    changed = make_tuner(cache_path=cache_path, A=A, B=B)
+    changed.evaluate('lqr', weights)
+    assert changed.cache_hits == 0
+
+
+def test_successive_halving_keeps_best_candidate():
+    tuner = ToyTuner(population=PatientPopulation(1), duration_sec=9.0, n_workers=1)
+    result = tuner.tune('pid', PID_BOUNDS, n_candidates=27, eta=3,
+                        initial=[ToyTuner.OPTIMUM])
+
+    assert [rung['n_candidates'] for rung in result['rungs']] == [28, 10, 4]
+    np.testing.assert_allclose(list(result['params'].values()), ToyTuner.OPTIMUM)
+    assert result['cost'] == 0.0
+
+
+def test_sample_noise_is_independent_of_parameters():
+    population = PatientPopulation.sample(64, seed=0)
+    # Parameters and noise come from separate streams spawned from the seed
+    assert population.seed != 0
+    noise = np.random.default_rng(population.seed).standard_normal(64)
+    log_beta0 = np.log(population.beta0) / 0.3
+    assert abs(np.corrcoef(noise, log_beta0)[0, 1]) < 0.5
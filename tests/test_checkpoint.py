@@ -0,0 +1,98 @@
+"""
+Tests for checkpointed closed-loop runs and resumable ensembles
+"""
+
+import numpy as np
+import pytest
+
+from src.controllers.lqr_controller import LQRController
+from src.controllers.pid_controller import BatchPIDController, PIDController
+from src.models.brain_dynamics import SimpleBrainModel
+from src.simulation.checkpoint import load_checkpoint
+from src.simulation.closed_loop import run_closed_loop_resumable
+from src.simulation.ensemble import run_ensemble
+
+
+class Interrupted(Exception):
+    pass
+
+
+def run(store_path, controller=None, **kwargs):
+    rng = np.random.default_rng(1)
+    baseline = 1.0 + 0.3 * np.abs(np.convolve(rng.standard_normal(600), np.ones(20) / 20, 'same'))
+    brain = SimpleBrainModel(baseline)
+    controller = controller or PIDController(kp=2.0, ki=0.5, kd=0.01)
+    return run_closed_loop_resumable(controller, brain, target=0.3, store_path=store_path,
+                                     duration_sec=0.5, measurement_noise=0.01, seed=7,
+                                     checkpoint_every_sec=0.1, **kwargs)
+
+
+def run_interrupted(store_path, monkeypatch, at_step: int = 250):
+    step = SimpleBrainModel.step
+    calls = {'n': 0}
+
+    def failing_step(self, stimulation):
+        calls['n'] += 1
+        if calls['n'] > at_step:
+            raise Interrupted
+        return step(self, stimulation)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(SimpleBrainModel, 'step', failing_step)
+        with pytest.raises(Interrupted):
+            run(store_path)
+
+
+def test_resumed_run_is_bit_identical(tmp_path, monkeypatch):
+    reference = [np.array(a) for a in run(tmp_path / 'reference')]
+
+    run_interrupted(tmp_path / 'resumed', monkeypatch)
+    assert load_checkpoint(tmp_path / 'resumed' / 'checkpoint.npz')['step'] == 200
+    resumed = run(tmp_path / 'resumed', resume=True)
+    for value, ref in zip(resumed, reference):
+        np.testing.assert_array_equal(value, ref)
+
+
+def test_resume_with_other_controller_raises(tmp_path, monkeypatch):
+    run_interrupted(tmp_path / 'run', monkeypatch)
+    with pytest.raises(ValueError, match='different controller'):
+        run(tmp_path / 'run', controller=PIDController(kp=3.0, ki=0.5, kd=0.01),
+            resume=True)
+    with pytest.raises(ValueError, match='different controller'):
+        run(tmp_path / 'run', controller=LQRController([[-3.163, -6.194]]), resume=True)
+
+
+def test_without_resume_starts_over(tmp_path, monkeypatch):
+    run_interrupted(tmp_path / 'run', monkeypatch)
+    # A different controller is fine when not resuming
+    run(tmp_path / 'run', controller=PIDController(kp=3.0, ki=0.5, kd=0.01))
+
+
+def pid_factory(kp):
+    return lambda dt: BatchPIDController([kp], [0.5], [0.0], dt=dt)
+
+
+def ensemble(output_dir, kp=2.0, **kwargs):
+    return run_ensemble(pid_factory(kp), n_patients=10, output_dir=output_dir,
+                        job_size=4, duration_sec=0.3, **kwargs)
+
+
+def test_ensemble_resume_skips_matching_jobs(tmp_path):
+    first = ensemble(tmp_path)
+    assert first['n_resumed'] == 0
+
+    (tmp_path / 'job_0001.npz').unlink()
+    resumed = ensemble(tmp_path, resume=True)
+    assert resumed['n_resumed'] == 2
+    for name in ('beta_reduction', 'energy'):
+        assert resumed[name] == first[name]
+
+
+def test_ensemble_reruns_jobs_with_changed_config(tmp_path):
+    ensemble(tmp_path)
+    changed = ensemble(tmp_path, kp=4.0, resume=True)
+    assert changed['n_resumed'] == 0
+    assert ensemble(tmp_path, kp=4.0, resume=True)['n_resumed'] == 3
+
+    cohort = ensemble(tmp_path, kp=4.0, variability=0.1, resume=True)
+    assert cohort['n_resumed'] == 0
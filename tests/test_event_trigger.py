@@ -0,0 +1,89 @@
+"""
+Tests for event-triggered controller execution
+"""
+
+import numpy as np
+import pytest
+
+from src.controllers.lqr_controller import LQRController
+from src.controllers.pid_controller import PIDController
+
+
+DT = 0.001
+
+
+@pytest.fixture
+def measurements() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    t = np.arange(2000) * DT
+    return 1.0 + 0.3 * np.sin(2 * np.pi * 2 * t) + 0.05 * rng.standard_normal(len(t))
+
+
+@pytest.mark.parametrize('make_controller', [
+    lambda: PIDController(kp=2.0, ki=0.5, kd=0.01, max_rate=50.0),
+    lambda: LQRController([[-3.163, -6.194]], max_rate=50.0),
+], ids=['pid', 'lqr'])
+def test_without_trigger_control_equals_compute_control(make_controller, measurements):
+    triggered, plain = make_controller(), make_controller()
+    for m in measurements:
+        assert triggered.control(m, 0.5) == plain.compute_control(m, 0.5)
+    assert triggered.get_trigger_stats()['ticks'] == 0
+
+
+def test_trigger_stats_count_skips_and_max_hold():
+    controller = PIDController(kp=1.0, ki=0.0, kd=0.0)
+    controller.set_event_trigger(error_threshold=1.0, max_hold_time=0.01)
+    for _ in range(100):
+        controller.control(0.6, 0.5)
+
+    stats = controller.get_trigger_stats()
+    # Evaluated on the first tick and then forced every 10 ticks
+    assert stats['ticks'] == 100
+    assert stats['evaluations'] == 10
+    assert stats['skipped'] == 90
+    assert stats['skip_ratio'] == pytest.approx(0.9)
+    assert stats['triggers'] == {'initial': 1, 'error': 0, 'estimate': 0, 'max_hold': 9}
+    assert len(controller.control_history) == 100
+
+
+def test_error_and_estimate_triggers():
+    controller = PIDController(kp=1.0, ki=0.0, kd=0.0)
+    controller.set_event_trigger(error_threshold=0.2, estimate_threshold=0.05,
+                                 max_hold_time=1.0)
+    controller.control(0.6, 0.5)
+    controller.control(0.61, 0.5)
+    controller.control(0.7, 0.5)
+    controller.control(0.9, 0.5)
+    assert controller.get_trigger_stats()['triggers'] == {
+        'initial': 1, 'error': 1, 'estimate': 1, 'max_hold': 0}
+
+
+def test_pid_integral_and_derivative_use_elapsed_time():
+    hold = 10
+    controller = PIDController(kp=0.0, ki=1.0, kd=0.0, anti_windup=False)
+    controller.set_event_trigger(error_threshold=1.0, max_hold_time=hold * DT)
+    for _ in range(hold + 1):
+        controller.control(0.6, 0.5)
+    # The initial evaluation integrates one tick, the forced one the whole hold
+    assert controller.integral == pytest.approx(0.1 * (1 + hold) * DT)
+
+    derivative = PIDController(kp=0.0, ki=0.0, kd=1.0)
+    derivative.set_event_trigger(error_threshold=1.0, estimate_threshold=0.005,
+                                 max_hold_time=1.0)
+    for _ in range(hold):
+        derivative.control(0.5, 0.5)
+    control = derivative.control(0.51, 0.5)
+    # Error rose by 0.01 over the held interval, not over a single tick
+    assert control == pytest.approx(0.01 / (hold * DT))
+
+
+def test_rate_limit_is_per_tick_after_a_hold():
+    max_rate = 10.0
+    controller = PIDController(kp=100.0, ki=0.0, kd=0.0, max_rate=max_rate)
+    controller.set_event_trigger(error_threshold=0.05, max_hold_time=1.0)
+
+    outputs = [controller.control(0.5, 0.5) for _ in range(50)]
+    outputs += [controller.control(0.6, 0.5) for _ in range(50)]
+    steps = np.abs(np.diff(outputs))
+    assert np.max(steps) <= max_rate * DT + 1e-12
+    assert outputs[-1] > outputs[50]
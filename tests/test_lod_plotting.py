@@ -0,0 +1,80 @@
+"""
+Tests for min/max decimation pyramids
+"""
+
+import numpy as np
+import pytest
+
+from src.simulation.closed_loop import compute_metrics
+from src.visualization.lod_plotting import MinMaxPyramid, SpectrogramPyramid, fill_lod, run_metrics
+
+
+@pytest.fixture
+def pyramid() -> MinMaxPyramid:
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal(1_000_000)
+    data[123_457] = 50.0
+    return MinMaxPyramid.build(data, chunk_size=65536)
+
+
+@pytest.mark.parametrize('width', [100, 500, 1000, 1920])
+def test_render_is_bounded_by_width(pyramid, width):
+    t, y = pyramid.render(width=width)
+    # One bucket per pixel plus at most one partial bucket at the edge
+    assert len(t) <= 2 * (width + 1)
+    assert y.max() == 50.0
+
+
+def test_render_zoomed_view(pyramid):
+    t, y = pyramid.render(10.0, 20.0, width=500)
+    assert len(t) <= 2 * (500 + 2)
+    assert t[0] <= 10.0 and t[-1] >= 20.0 - pyramid.block_size(0) * pyramid.dt
+
+
+def test_render_returns_raw_samples_when_zoomed_in(pyramid):
+    t, y = pyramid.render(123.4, 123.5, width=500)
+    np.testing.assert_array_equal(y, pyramid.source[123_400:123_501])
+
+
+@pytest.fixture
+def spectrogram() -> SpectrogramPyramid:
+    times = np.arange(20_000) * 0.05
+    freqs = np.arange(0, 50, 2.0)
+    sxx = np.random.default_rng(1).random((len(freqs), len(times)))
+    return SpectrogramPyramid.build(sxx, freqs, times, factor=2)
+
+
+@pytest.mark.parametrize('width', [100, 500, 1000, 1920])
+def test_spectrogram_render_is_bounded_by_width(spectrogram, width):
+    times, _, sxx = spectrogram.render(width=width)
+    assert len(times) <= width
+    # The finest level within the bound: one level finer would exceed it
+    assert 2 * len(times) > width
+    assert sxx.shape == (len(spectrogram.freqs), len(times))
+
+
+def test_fill_lod_handles_views_outside_the_data(pyramid):
+    matplotlib = pytest.importorskip('matplotlib')
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots()
+    patch = fill_lod(ax, pyramid, width=200)
+    ax.set_xlim(2000, 3000)
+    assert len(patch.get_xy()) <= 1
+    ax.set_xlim(0, 100)
+    assert len(patch.get_xy()) > 0
+    plt.close(fig)
+
+
+def test_run_metrics_matches_compute_metrics(tmp_path):
+    rng = np.random.default_rng(2)
+    time = np.arange(20_000) * 0.001
+    beta = 1.0 + 0.1 * rng.standard_normal(len(time))
+    stim = rng.uniform(0, 3, len(time))
+    path = tmp_path / 'run.npz'
+    np.savez(path, time=time, beta_power=beta, stimulation=stim)
+
+    with np.load(path) as results:
+        metrics = run_metrics(results, 'beta_power', mean_beta=2.0, target=0.6)
+    assert metrics == compute_metrics(time, beta, stim, 2.0, 0.6)
@@ -0,0 +1,187 @@
+"""
+Tests for the global float32/float64 precision setting
+"""
+
+import numpy as np
+import pytest
+
+from src.controllers.lqr_controller import BatchLQRController, LQRController
+from src.controllers.pid_controller import BatchPIDController, PIDController
+from src.models.brain_dynamics import PatientPopulation, SimpleBrainModel
+from src.models.system_identification import OnlineBetaIdentifier
+from src.precision import get_dtype, set_precision, use_precision
+from src.signal_processing.bandpower_estimator import (
+    SlidingDFTEstimator, default_estimators, offline_beta_power)
+from src.signal_processing.spectral import StreamingWelch
+from src.simulation.closed_loop import run_closed_loop, simulate_batch
+from src.simulation.result_store import ResultStore
+
+
+FS = 1000.0
+TOLERANCE = 1e-3
+
+
+def rel_error(value: np.ndarray, reference: np.ndarray) -> float:
+    scale = np.max(np.abs(reference)) or 1.0
+    return float(np.max(np.abs(np.asarray(value, dtype=np.float64) - reference)) / scale)
+
+
+@pytest.fixture
+def signal() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    t = np.arange(int(3 * FS)) / FS
+    return (np.sin(2 * np.pi * 20 * t) * (1 + 0.5 * np.sin(2 * np.pi * 0.5 * t))
+            + 0.5 * rng.standard_normal(len(t)))
+
+
+@pytest.fixture
+def baseline_beta() -> np.ndarray:
+    rng = np.random.default_rng(1)
+    return 1.0 + 0.3 * np.abs(np.convolve(rng.standard_normal(3000), np.ones(50) / 50, 'same'))
+
+
+def run_in(precision, fn):
+    with use_precision(precision):
+        return fn()
+
+
+def test_default_is_float64():
+    assert get_dtype() is np.float64
+
+
+def test_set_precision_rejects_unsupported():
+    with pytest.raises(ValueError):
+        set_precision('float16')
+    assert get_dtype() is np.float64
+
+
+def test_use_precision_restores_previous():
+    with use_precision('float32') as dtype:
+        assert dtype is np.float32
+        assert get_dtype() is np.float32
+    assert get_dtype() is np.float64
+
+
+def test_ensemble_metrics_match_float64():
+    def run():
+        population = PatientPopulation.sample(32, seed=0, delay_steps=3)
+        controller = BatchPIDController([2.0, 8.0], [0.5, 2.0], [0.0, 0.01])
+        return simulate_batch(controller, population, duration_sec=2.0, replicas=2)
+
+    reference = run_in('float64', run)
+    reduced = run_in('float32', run)
+    for name, value in reduced.items():
+        assert value.dtype == np.float32, name
+        assert rel_error(value, reference[name]) <= TOLERANCE, name
+
+
+def test_batch_controllers_keep_precision():
+    with use_precision('float32'):
+        population = PatientPopulation.sample(8, seed=0)
+        measurement = population.reset(replicas=2)
+        pid = BatchPIDController([1.0, 2.0], [0.1, 0.2], [0.0, 0.0])
+        lqr = BatchLQRController([[-3.0, -6.0], [-1.0, -2.0]])
+        for controller in (pid, lqr):
+            control = controller.compute_control(measurement, 0.3 * population.beta0)
+            assert control.dtype == np.float32
+        assert population.step(control).dtype == np.float32
+
+
+@pytest.mark.parametrize('make_controller', [
+    lambda: PIDController(kp=2.0, ki=0.5, kd=0.01),
+    lambda: LQRController([[-3.163, -6.194]], max_rate=50.0),
+], ids=['pid', 'lqr'])
+def test_closed_loop_matches_float64(make_controller, baseline_beta):
+    def run():
+        brain = SimpleBrainModel(baseline_beta)
+        return run_closed_loop(make_controller(), brain, target=0.5, duration_sec=2.0,
+                               measurement_noise=0.01, rng=np.random.default_rng(2))
+
+    reference = run_in('float64', run)
+    reduced = run_in('float32', run)
+    for value, ref in zip(reduced, reference):
+        assert value.dtype == np.float32
+        assert rel_error(value, ref) <= TOLERANCE
+
+
+def test_lqr_controller_computes_in_precision():
+    with use_precision('float32'):
+        controller = LQRController([[-3.163, -6.194]])
+        control = controller.compute_control(np.float32(1.2), 0.5)
+    assert controller.K.dtype == np.float32
+    assert controller.x.dtype == np.float32
+    assert np.asarray(control).dtype == np.float32
+
+
+def test_offline_beta_power_matches_float64(signal):
+    reference = run_in('float64', lambda: offline_beta_power(signal, fs=FS))
+    reduced = run_in('float32', lambda: offline_beta_power(signal.astype(np.float32), fs=FS))
+    assert reduced.dtype == np.float32
+    assert rel_error(reduced, reference) <= TOLERANCE
+
+
+@pytest.mark.parametrize('name', sorted(default_estimators(fs=FS)))
+def test_streaming_estimators_match_float64(name, signal):
+    reference = run_in('float64', lambda: default_estimators(fs=FS)[name].process(signal))
+    reduced = run_in('float32', lambda: default_estimators(fs=FS)[name].process(
+        signal.astype(np.float32)))
+    assert reduced.dtype == np.float32
+    assert rel_error(reduced, reference) <= TOLERANCE
+
+
+def test_welch_psd_matches_float64(signal):
+    def run():
+        welch = StreamingWelch(fs=FS, forgetting=0.9)
+        welch.push(signal[:1000].astype(get_dtype()))
+        return welch.push(signal[1000:].astype(get_dtype()))
+
+    reference = run_in('float64', run)
+    reduced = run_in('float32', run)
+    assert reduced.dtype == np.float32
+    assert rel_error(reduced, reference) <= TOLERANCE
+
+
+def test_online_identification_matches_float64():
+    rng = np.random.default_rng(3)
+    stim = np.repeat(rng.uniform(0, 3, 40), 50)
+
+    def run():
+        population = PatientPopulation(1, fluctuation=0.05, tau=0.02, seed=4)
+        identifier = OnlineBetaIdentifier(dt=population.dt)
+        population.reset()
+        for u in stim:
+            identifier.update(u, population.step(u)[0])
+        return identifier
+
+    reference = run_in('float64', run)
+    reduced = run_in('float32', run)
+    assert reduced.rls.theta.dtype == np.float32
+    assert reduced.rls.P.dtype == np.float32
+    # RLS is sensitive to rounding, so allow more than for the feed-forward paths
+    assert rel_error(reduced.theta, reference.theta) <= 2e-3
+    gain = reference.physical_parameters()['static_gain']
+    assert reduced.physical_parameters()['static_gain'] == pytest.approx(gain, rel=1e-2)
+
+
+def test_result_store_uses_precision(tmp_path):
+    with use_precision('float32'):
+        array = ResultStore(tmp_path / 'run', mode='w').create_array('beta_power', 16)
+    assert array.dtype == np.float32
+
+
+def test_float64_is_unchanged_by_default(baseline_beta):
+    time_vec, beta, stim = run_closed_loop(PIDController(), SimpleBrainModel(baseline_beta),
+                                           target=0.5, duration_sec=0.5)
+    assert beta.dtype == stim.dtype == np.float64
+
+
+def test_sliding_dft_update_does_not_drift_in_float32():
+    # 200 s through update(): the undamped recursion drifted ~1% by here
+    t = np.arange(200_000) / FS
+    tone = np.sin(2 * np.pi * 20 * t)
+    with use_precision('float32'):
+        estimator = SlidingDFTEstimator(fs=FS)
+        power = [estimator.update(sample) for sample in tone.astype(np.float32)]
+        batch = SlidingDFTEstimator(fs=FS).process(tone.astype(np.float32))
+    assert power[-1] == pytest.approx(1.0, abs=TOLERANCE)
+    assert batch[-1] == pytest.approx(1.0, abs=TOLERANCE)
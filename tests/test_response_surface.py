@@ -0,0 +1,50 @@
+"""
+Tests for controller response surfaces
+"""
+
+import numpy as np
+import pytest
+
+from src.simulation.closed_loop import METRICS
+from src.simulation.response_surface import ResponseSurface
+
+
+@pytest.fixture(scope='module')
+def surface() -> ResponseSurface:
+    return ResponseSurface.build('pid', {'kp': [0.5, 2.0, 8.0], 'stim_gain': [0.1, 0.4]},
+                                 duration_sec=0.5, seed=0)
+
+
+def test_query_at_nodes_returns_stored_values(surface):
+    for i, kp in enumerate(surface.axes['kp']):
+        for j, stim_gain in enumerate(surface.axes['stim_gain']):
+            values = surface.query(kp=kp, stim_gain=stim_gain)
+            for name in METRICS:
+                assert values[name] == surface.metrics[name][i, j]
+
+
+def test_query_batch_matches_query(surface):
+    rng = np.random.default_rng(0)
+    points = np.column_stack([rng.uniform(0, 10, 50), rng.uniform(0.0, 0.5, 50)])
+    batch = surface.query_batch(points)
+    for n, (kp, stim_gain) in enumerate(points):
+        single = surface.query(kp=kp, stim_gain=stim_gain)
+        for name in METRICS:
+            assert batch[name][n] == pytest.approx(single[name], rel=1e-12, abs=1e-12)
+
+
+def test_refine_after_save_and_load_matches(surface, tmp_path):
+    path = tmp_path / 'surface.npz'
+    surface.save(path)
+    loaded = ResponseSurface.load(path)
+    np.testing.assert_array_equal(loaded.drive, surface.drive)
+
+    direct = ResponseSurface(surface.axes, surface.metrics, surface.config, surface.drive)
+    n_direct = direct.refine(tolerance=0.05, max_rounds=1)
+    n_loaded = loaded.refine(tolerance=0.05, max_rounds=1)
+
+    assert n_direct > 0 and n_loaded == n_direct
+    for name, values in direct.axes.items():
+        np.testing.assert_array_equal(loaded.axes[name], values)
+    for name in METRICS:
+        np.testing.assert_array_equal(loaded.metrics[name], direct.metrics[name])
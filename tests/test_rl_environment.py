@@ -0,0 +1,104 @@
+"""
+Tests for the batched beta-control environment
+"""
+
+import importlib.util
+
+import numpy as np
+import pytest
+
+from src.controllers.rl_environment import BatchBetaEnv, BetaControlVecEnv, make_vec_env
+from src.models.brain_dynamics import PatientPopulation
+
+
+N_ENVS = 8
+
+
+def make_env(**kwargs) -> BatchBetaEnv:
+    population = PatientPopulation.sample(N_ENVS, seed=0)
+    kwargs.setdefault('episode_steps', 20)
+    return BatchBetaEnv(population, seed=1, **kwargs)
+
+
+def rollout(env: BatchBetaEnv, n_steps: int = 20):
+    actions = np.linspace(0.0, 4.0, N_ENVS)
+    steps = [env.step(actions) for _ in range(n_steps)]
+    return np.stack([s[0] for s in steps]), np.stack([s[1] for s in steps])
+
+
+def test_reset_and_step_shapes():
+    env = make_env(n_history=3)
+    obs = env.reset()
+    assert obs.shape == (N_ENVS, 5) and obs.dtype == np.float32
+    np.testing.assert_allclose(obs[:, -2], 0.3)
+
+    obs, reward, done, info = env.step(np.ones((N_ENVS, 1)))
+    assert obs.shape == (N_ENVS, 5) and obs.dtype == np.float32
+    assert reward.shape == (N_ENVS,) and reward.dtype == np.float32
+    assert done.shape == (N_ENVS,) and not done.any()
+    assert info['stimulation'].shape == info['beta'].shape == (N_ENVS,)
+    assert np.all(reward <= 0)
+
+
+def test_actions_are_clipped_to_limits():
+    env = make_env(min_stim=0.5, max_stim=3.0)
+    _, _, _, info = env.step(np.array([-10.0, 0.0, 1.0, 2.0, 3.0, 4.0, 100.0, np.inf]))
+    np.testing.assert_array_equal(info['stimulation'], [0.5, 0.5, 1.0, 2.0, 3.0, 3.0, 3.0, 3.0])
+
+
+def test_rate_limit_applies_per_plant_step():
+    env = make_env(max_rate=100.0, action_repeat=5)
+    _, _, _, info = env.step(np.full(N_ENVS, 5.0))
+    np.testing.assert_allclose(info['stimulation'], 5 * 100.0 * env.dt)
+
+
+def test_episode_ends_after_episode_steps():
+    env = make_env(episode_steps=3)
+    dones = [env.step(np.zeros(N_ENVS))[2] for _ in range(3)]
+    assert not dones[0].any() and not dones[1].any() and dones[2].all()
+
+
+def test_seeded_episodes_are_deterministic():
+    first, second = make_env(), make_env()
+    np.testing.assert_array_equal(first.reset(), second.reset())
+    obs_a, reward_a = rollout(first)
+    obs_b, reward_b = rollout(second)
+    np.testing.assert_array_equal(obs_a, obs_b)
+    np.testing.assert_array_equal(reward_a, reward_b)
+
+    # A new episode draws new disturbances; reseeding replays the sequence
+    # (construction and the explicit reset above used the first two seeds)
+    first.reset()
+    obs_c, _ = rollout(first)
+    assert not np.array_equal(obs_c, obs_a)
+    first.seed(1)
+    for _ in range(3):
+        first.reset()
+    np.testing.assert_array_equal(rollout(first)[0], obs_c)
+
+
+@pytest.mark.skipif(importlib.util.find_spec('stable_baselines3') is not None,
+                    reason='stable-baselines3 installed')
+def test_vec_env_requires_ml_extra():
+    with pytest.raises(ImportError, match="'ml' extra"):
+        BetaControlVecEnv(make_env())
+
+
+def test_vec_env_auto_resets_on_done():
+    pytest.importorskip('stable_baselines3')
+    venv = make_vec_env(n_envs=N_ENVS, seed=0, episode_steps=3)
+    first = venv.reset()
+    actions = np.zeros((N_ENVS, 1))
+    for _ in range(2):
+        venv.step_async(actions)
+        _, _, done, infos = venv.step_wait()
+        assert not done.any() and infos[0] == {}
+
+    venv.step_async(actions)
+    obs, _, done, infos = venv.step_wait()
+    assert done.all()
+    assert infos[0]['episode']['l'] == 3
+    assert infos[0]['terminal_observation'].shape == first[0].shape
+    # The returned observation is the first of the next episode
+    assert venv.env.step_idx == 0
+    np.testing.assert_allclose(obs[:, -1], 0.0)
@@ -0,0 +1,127 @@
+"""
+Tests for the run-dbs-simulation command-line interface
+"""
+
+import importlib.util
+import json
+import logging
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.controllers.pid_controller import PIDController
+from src.scripts.run_simulation import DEFAULT_CONFIG, build_controller, load_config, main
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture
+def output_dir(tmp_path) -> Path:
+    beta = 1.0 + 0.1 * np.random.default_rng(0).random(2000)
+    np.savez(tmp_path / 'baseline_data.npz', beta_power=beta, mean_beta_power=beta.mean())
+    return tmp_path
+
+
+@pytest.fixture
+def config_path(tmp_path) -> Path:
+    path = tmp_path / 'config.ini'
+    path.write_text(
+        "[simulation]\n"
+        "duration = 0.3  # seconds\n"
+        "precision = 'float32'\n"
+        "[controller]\n"
+        "type = LQR\n"
+        "event_error_threshold = none\n"
+        "[pid_params]\n"
+        "kp = 3\n"
+        "[safety]\n"
+        "max_rate = 50.0\n"
+        "[visualization]\n"
+        "save_figures = no\n"
+    )
+    return path
+
+
+def test_defaults_without_config_file(tmp_path):
+    config = load_config(str(tmp_path / 'missing.ini'))
+    assert config == DEFAULT_CONFIG
+    assert config['simulation'] is not DEFAULT_CONFIG['simulation']
+
+
+def test_config_values_are_parsed(config_path):
+    config = load_config(str(config_path))
+    assert config['simulation']['duration'] == 0.3
+    assert config['simulation']['precision'] == 'float32'
+    assert config['simulation']['dt'] == 0.001
+    assert config['controller']['type'] == 'LQR'
+    assert config['controller']['event_error_threshold'] is None
+    assert config['pid_params']['kp'] == 3
+    assert config['pid_params']['ki'] == 0.5
+    assert config['visualization']['save_figures'] is False
+
+
+def test_safety_section_reaches_controller(config_path):
+    config = load_config(str(config_path))
+    config['controller']['type'] = 'PID'
+    controller = build_controller(config, dt=0.001)
+    assert isinstance(controller, PIDController)
+    assert controller.kp == 3.0
+    assert controller.max_rate == 50.0
+    assert controller.max_stim == 5.0
+
+
+def test_command_line_overrides_config(config_path, output_dir, capsys):
+    code = main(['--config', str(config_path), '--output-dir', str(output_dir),
+                 '--controller', 'pid', '--duration', '0.2', '--precision', 'float64'])
+    assert code == 0
+    metrics = json.loads(capsys.readouterr().out)
+    assert set(metrics) >= {'beta_reduction', 'energy', 'mean_stim', 'settling_time'}
+
+    summary = json.loads((output_dir / 'pid_results' / 'summary.json').read_text())
+    assert summary['controller'] == 'PID'
+    assert summary['params']['kp'] == 3
+    assert np.load(output_dir / 'pid_results' / 'beta_power.npy', mmap_mode='r').shape == (200,)
+
+
+def test_missing_baseline_is_reported(tmp_path, caplog):
+    with caplog.at_level(logging.ERROR):
+        assert main(['--config', 'missing.ini', '--output-dir', str(tmp_path)]) == 1
+    assert 'run with --mode baseline first' in caplog.text
+
+
+@pytest.mark.skipif(importlib.util.find_spec('torch') is not None, reason='torch installed')
+def test_ml_mode_without_torch_is_reported(output_dir, caplog):
+    with caplog.at_level(logging.ERROR):
+        code = main(['--config', 'missing.ini', '--output-dir', str(output_dir),
+                     '--controller', 'ML', '--duration', '0.1'])
+    assert code == 1
+    assert 'requires PyTorch' in caplog.text
+
+
+@pytest.mark.skipif(importlib.util.find_spec('tvb') is not None, reason='TVB installed')
+def test_baseline_mode_without_tvb_is_reported(tmp_path, caplog):
+    with caplog.at_level(logging.ERROR):
+        code = main(['--config', 'missing.ini', '--output-dir', str(tmp_path),
+                     '--mode', 'baseline', '--duration', '0.1'])
+    assert code == 1
+    assert 'requires TVB' in caplog.text
+
+
+def test_pid_run_loads_no_heavy_dependencies(output_dir):
+    script = (
+        "import sys\n"
+        "from src.scripts.run_simulation import main\n"
+        f"code = main(['--config', 'missing.ini', '--output-dir', {str(output_dir)!r},"
+        " '--duration', '0.1'])\n"
+        "heavy = [m for m in ('scipy', 'torch', 'matplotlib', 'tvb') if m in sys.modules]\n"
+        "print('HEAVY', heavy, code)\n"
+    )
+    env = {**os.environ, 'PYTHONPATH': str(REPO_ROOT)}
+    result = subprocess.run([sys.executable, '-c', script], cwd=output_dir, env=env,
+                            capture_output=True, text=True, check=True)
+    assert "HEAVY [] 0" in result.stdout
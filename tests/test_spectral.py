@@ -0,0 +1,87 @@
+"""
+Equivalence tests for the streaming STFT and Welch estimators
+"""
+
+import numpy as np
+import pytest
+from scipy import signal
+
+from src.signal_processing.spectral import (StreamingSTFT, StreamingWelch, iter_spectrogram,
+                                            welch_chunked)
+
+
+FS = 1000.0
+NPERSEG = 256
+TOLERANCE = 1e-12
+
+
+@pytest.fixture(scope='module')
+def x() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    t = np.arange(20_000) / FS
+    return np.sin(2 * np.pi * 20 * t) + 0.5 * rng.standard_normal(len(t))
+
+
+def push_in_chunks(estimator, x, chunk_size):
+    return [estimator.push(x[i:i + chunk_size]) for i in range(0, len(x), chunk_size)]
+
+
+# Hops are 128, 56 and 256; 77 and 1000 divide none of them
+@pytest.mark.parametrize('chunk_size', [1, 77, 128, 1000, 20_000])
+@pytest.mark.parametrize('noverlap', [None, 200, 0])
+def test_stft_matches_scipy_spectrogram(x, chunk_size, noverlap):
+    stft = StreamingSTFT(fs=FS, nperseg=NPERSEG, noverlap=noverlap)
+    blocks = push_in_chunks(stft, x, chunk_size)
+    times = np.concatenate([t for t, _ in blocks])
+    sxx = np.concatenate([s for _, s in blocks], axis=1)
+
+    # StreamingSTFT defaults to half overlap, scipy.signal.spectrogram to 1/8
+    f_ref, t_ref, s_ref = signal.spectrogram(x, fs=FS, nperseg=NPERSEG,
+                                             noverlap=stft.noverlap, window='hann', mode='psd')
+    np.testing.assert_allclose(stft.freqs, f_ref)
+    np.testing.assert_allclose(times, t_ref)
+    np.testing.assert_allclose(sxx, s_ref, rtol=TOLERANCE, atol=TOLERANCE * s_ref.max())
+
+
+@pytest.mark.parametrize('scaling', ['density', 'spectrum'])
+def test_stft_scaling_matches_scipy(x, scaling):
+    _, sxx = StreamingSTFT(fs=FS, nperseg=NPERSEG, scaling=scaling).push(x)
+    _, _, s_ref = signal.spectrogram(x, fs=FS, nperseg=NPERSEG, noverlap=NPERSEG // 2,
+                                     window='hann', scaling=scaling)
+    np.testing.assert_allclose(sxx, s_ref, rtol=TOLERANCE, atol=TOLERANCE * s_ref.max())
+
+
+@pytest.mark.parametrize('chunk_size', [1, 77, 128, 5000])
+def test_welch_matches_scipy(x, chunk_size):
+    welch = StreamingWelch(fs=FS, nperseg=NPERSEG)
+    psd = push_in_chunks(welch, x, chunk_size)[-1]
+
+    f_ref, p_ref = signal.welch(x, fs=FS, nperseg=NPERSEG)
+    np.testing.assert_allclose(welch.freqs, f_ref)
+    np.testing.assert_allclose(psd, p_ref, rtol=TOLERANCE, atol=TOLERANCE * p_ref.max())
+
+
+def test_welch_forgetting_follows_recent_segments(x):
+    welch = StreamingWelch(fs=FS, nperseg=NPERSEG, forgetting=0.5)
+    welch.push(x)
+    welch.push(np.zeros(20 * NPERSEG))
+    assert np.max(welch.psd) < 1e-3 * np.max(signal.welch(x, fs=FS, nperseg=NPERSEG)[1])
+
+
+@pytest.mark.parametrize('chunk_size', [999, 4096])
+def test_iter_spectrogram_matches_scipy(x, chunk_size):
+    blocks = list(iter_spectrogram(x, fs=FS, nperseg=NPERSEG, chunk_size=chunk_size))
+    times = np.concatenate([t for t, _ in blocks])
+    sxx = np.concatenate([s for _, s in blocks], axis=1)
+
+    _, t_ref, s_ref = signal.spectrogram(x, fs=FS, nperseg=NPERSEG)
+    np.testing.assert_allclose(times, t_ref)
+    np.testing.assert_allclose(sxx, s_ref, rtol=TOLERANCE, atol=TOLERANCE * s_ref.max())
+
+
+@pytest.mark.parametrize('chunk_size', [999, 4096])
+def test_welch_chunked_matches_scipy(x, chunk_size):
+    freqs, psd = welch_chunked(x, fs=FS, nperseg=NPERSEG, chunk_size=chunk_size)
+    f_ref, p_ref = signal.welch(x, fs=FS, nperseg=NPERSEG)
+    np.testing.assert_allclose(freqs, f_ref)
+    np.testing.assert_allclose(psd, p_ref, rtol=TOLERANCE, atol=TOLERANCE * p_ref.max())
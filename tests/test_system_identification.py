@@ -0,0 +1,110 @@
+"""
+Tests for ARX identification and its state-space conversion
+"""
+
+import numpy as np
+import pytest
+
+from src.controllers.lqr_controller import LQRController, beta_state_space
+from src.models.brain_dynamics import PatientPopulation
+from src.models.system_identification import OnlineBetaIdentifier, arx_to_state_space
+
+
+DT = 0.001
+
+
+def tustin_arx(A: np.ndarray, B: np.ndarray, dt: float = DT) -> np.ndarray:
+    """ARX coefficients whose Tustin image is the companion-form (A, B)"""
+    eye = np.eye(2)
+    Ad = np.linalg.solve(eye - 0.5 * dt * A, eye + 0.5 * dt * A)
+    poly = np.poly(np.linalg.eigvals(Ad)).real
+    a1, a2 = -poly[1], -poly[2]
+    static_gain = -B[1, 0] / A[1, 0]
+    return np.array([a1, a2, static_gain * (1 - a1 - a2), 0.0])
+
+
+def test_continuous_model_is_in_lqr_coordinates():
+    theta = np.array([1.6, -0.62, -0.004, 0.02])
+    _, _, A, B = arx_to_state_space(theta, DT)
+    np.testing.assert_array_equal(A[0], [0.0, 1.0])
+    assert B[0, 0] == 0.0
+
+
+def test_recovers_damped_oscillator():
+    A_ref, B_ref = beta_state_space()
+    _, _, A, B = arx_to_state_space(tustin_arx(A_ref, B_ref), DT)
+    np.testing.assert_allclose(A, A_ref, rtol=1e-6)
+    np.testing.assert_allclose(B, B_ref, rtol=1e-6)
+
+
+def test_identified_model_matches_plant():
+    rng = np.random.default_rng(0)
+    stim = np.repeat(rng.uniform(0, 3, 60), 50)
+    population = PatientPopulation(1, fluctuation=0.0, tau=0.02)
+    identifier = OnlineBetaIdentifier(dt=DT)
+    population.reset()
+    for u in stim:
+        identifier.update(u, population.step(u)[0])
+
+    A, B = identifier.state_space()
+    np.testing.assert_array_equal(A[0], [0.0, 1.0])
+    # First-order plant: the slow pole is 1/tau, the static gain -beta0 * stim_gain
+    assert np.max(np.linalg.eigvals(A).real) == pytest.approx(-1 / 0.02, rel=0.05)
+    assert -B[1, 0] / A[1, 0] == pytest.approx(-0.25, rel=0.05)
+
+
+def identify_noisy_plant(amplitude: float, seed: int) -> OnlineBetaIdentifier:
+    rng = np.random.default_rng(seed)
+    stim = np.repeat(rng.uniform(0, amplitude, 60), 50)
+    population = PatientPopulation(1, fluctuation=0.05, tau=0.02, seed=seed)
+    identifier = OnlineBetaIdentifier(dt=DT)
+    population.reset()
+    for u in stim:
+        identifier.update(u, population.step(u)[0])
+    return identifier
+
+
+def make_lqr() -> LQRController:
+    return LQRController.from_weights(Q=np.diag([100.0, 1.0]), R=[[0.1]])
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_weak_excitation_is_rejected(seed):
+    # With the OU disturbance on, tiny stimulation can fit b > 0
+    identifier = identify_noisy_plant(amplitude=0.01, seed=seed)
+    assert identifier.check_model() == 'insufficient excitation'
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_excited_noisy_plant_is_accepted(seed):
+    identifier = identify_noisy_plant(amplitude=3.0, seed=seed)
+    assert identifier.check_model() is None
+
+    controller = make_lqr()
+    K = controller.update_model(*identifier.state_space())
+    assert controller.model_rejection is None
+    # Stimulation must rise with beta error, as with the nominal design
+    assert np.all(K < 0)
+
+
+@pytest.mark.parametrize('theta, reason', [
+    ([1.8, -0.81, 0.002, 0.0], 'stimulation does not reduce beta'),
+    ([2.1, -1.0, -0.002, 0.0], 'unstable poles'),
+])
+def test_invalid_estimates_are_reported(theta, reason):
+    identifier = OnlineBetaIdentifier(dt=DT)
+    identifier.rls.theta = np.array(theta)
+    identifier.stim_var = 1.0
+    assert identifier.check_model() == reason
+
+
+def test_update_model_keeps_gain_for_wrong_sign_plant():
+    controller = make_lqr()
+    K = controller.K.copy()
+    A, B = beta_state_space()
+    np.testing.assert_array_equal(controller.update_model(A, -B), K)
+    assert controller.model_rejection == 'stimulation does not reduce beta'
+    np.testing.assert_array_equal(controller.K, K)
+
+    controller.update_model(A, B)
+    assert controller.model_rejection is None
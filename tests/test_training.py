@@ -0,0 +1,36 @@
+"""
+Tests for LSTM training checkpoints and resume
+"""
+
+import pytest
+
+torch = pytest.importorskip('torch')
+
+from src.models.training import generate_training_data, train_lstm  # noqa: E402
+
+
+@pytest.fixture
+def data():
+    return generate_training_data(n_patients=6, duration_sec=0.2, patients_per_job=3,
+                                  n_workers=1, seed=0)
+
+
+def train(data, **kwargs):
+    noisy, clean = data
+    return train_lstm(noisy, clean, seq_length=20, batch_size=64, accumulation_steps=4,
+                      num_workers=0, num_threads=1, device='cpu', checkpoint_every=1,
+                      verbose=False, **kwargs)
+
+
+def test_resume_continues_interrupted_training(data, tmp_path):
+    reference, reference_history = train(data, epochs=2)
+
+    train(data, epochs=1, checkpoint_dir=tmp_path)
+    assert (tmp_path / 'checkpoint.pt').exists()
+    resumed, history = train(data, epochs=2, checkpoint_dir=tmp_path, resume=True)
+
+    assert len(history['train_loss']) == 2
+    assert history['train_loss'] == pytest.approx(reference_history['train_loss'])
+    for name, value in reference.state_dict().items():
+        assert torch.allclose(resumed.state_dict()[name], value), name
+    assert (tmp_path / 'lstm_model.pth').exists()
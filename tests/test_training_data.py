@@ -0,0 +1,34 @@
+"""
+Tests for simulated LSTM training data
+"""
+
+import numpy as np
+
+from src.models.training_data import generate_training_data
+
+
+def generate(**kwargs):
+    kwargs.setdefault('n_workers', 1)
+    return generate_training_data(n_patients=10, duration_sec=0.3, patients_per_job=4,
+                                  hold_sec=0.05, **kwargs)
+
+
+def test_shapes_and_dtype():
+    noisy, clean = generate()
+    assert noisy.shape == clean.shape == (10, 300)
+    assert noisy.dtype == clean.dtype == np.float32
+    assert not np.array_equal(noisy, clean)
+
+
+def test_deterministic_for_seed():
+    first = generate(seed=3)
+    np.testing.assert_array_equal(first[0], generate(seed=3)[0])
+    np.testing.assert_array_equal(first[1], generate(seed=3)[1])
+    assert not np.array_equal(first[1], generate(seed=4)[1])
+
+
+def test_independent_of_worker_count():
+    serial = generate(seed=1)
+    parallel = generate(seed=1, n_workers=2)
+    np.testing.assert_array_equal(serial[0], parallel[0])
+